@@ -4,44 +4,87 @@ Run: uvicorn space_app:app --host 0.0.0.0 --port 7860
 """
 from __future__ import annotations
 
-import io
+import asyncio
 import os
 from contextlib import asynccontextmanager
-from pathlib import Path
 
-from fastapi import FastAPI, File, HTTPException, UploadFile
+from fastapi import FastAPI, File, Form, HTTPException, Request, UploadFile
 from fastapi.middleware.cors import CORSMiddleware
-from fastapi.responses import JSONResponse
+from fastapi.responses import PlainTextResponse
 
 import app as ml_app
-from fashion_ml.config import VIT_MODEL_PATH
-from fashion_ml.image_ops import detect_color
-from fashion_ml.model_loader import build_classification_response, models
+from fashion_ml.artifacts import add_artifact_routes
+from fashion_ml.backends import EmbeddingsUnavailable
+from fashion_ml.config import MAX_BATCH_UPLOAD_BYTES, MAX_UPLOAD_BYTES, PROFILING_ENABLED
+from fashion_ml.executors import ExecutorSaturated, image_executor, model_executor
+from fashion_ml.fast_json import FastJSONResponse
+from fashion_ml.model_loader import models
+from fashion_ml.pipeline import (
+    BatchTooLarge,
+    ModelNotReady,
+    classify_batch_async,
+    classify_image_async,
+    embed_batch_async,
+    embed_image_async,
+    remove_items,
+    runtime_info,
+    similar_items,
+)
+from fashion_ml.profiling import PROFILE_ID_HEADER, profile_classify, profile_requested
+from fashion_ml.readiness import readiness, start_background
+from fashion_ml.registry import ADMIN_TOKEN_HEADER, SwapInProgress, UnknownVersion, admin_authorized, registry
+from fashion_ml.telemetry import PROMETHEUS_CONTENT_TYPE, MetricsMiddleware, render_prometheus
+from fashion_ml.uploads import (
+    MULTIPART_SLACK,
+    SpooledUpload,
+    UnsupportedImage,
+    UploadLimitMiddleware,
+    UploadTooLarge,
+)
+from fashion_ml.vector_index import UnknownItem
 
 ALLOWED_ORIGINS = [o.strip() for o in os.environ.get("CORS_ORIGINS", "*").split(",") if o.strip()] or ["*"]
 
 
-def _vit_name() -> str:
-    return Path(VIT_MODEL_PATH).name
+def _models_loading() -> FastJSONResponse:
+    return FastJSONResponse(
+        status_code=503,
+        content={"error": "Models still loading", "loading": True},
+    )
+
 
+def _read_upload(imagen: UploadFile) -> SpooledUpload:
+    """Wrap Starlette's spooled file part (no ``bytes`` copy); 400/413 on empty or oversize parts."""
+    try:
+        upload = SpooledUpload.from_file(imagen.file, imagen.filename or "")
+    except UploadTooLarge as e:
+        raise HTTPException(status_code=413, detail="File too large") from e
+    if not upload:
+        raise HTTPException(status_code=400, detail="No image provided")
+    return upload
 
-def _classify_vit(image_bytes: bytes) -> dict:
-    from PIL import Image
 
-    image = Image.open(io.BytesIO(image_bytes)).convert("RGB")
-    color = detect_color(image)
-    if models.vit is None:
-        return JSONResponse(
-            status_code=503,
-            content={"error": "Models still loading", "loading": True},
-        )
-    probs, _ = models.predict_vit(image)
-    return build_classification_response(probs, color, "vision_transformer", _vit_name())
+async def _classify_vit(upload: SpooledUpload, request: Request) -> dict:
+    try:
+        if PROFILING_ENABLED and profile_requested(request.headers):
+            body, profile_id = await model_executor.run(profile_classify, upload)
+            return FastJSONResponse(body, headers={PROFILE_ID_HEADER: profile_id})
+        return FastJSONResponse(await classify_image_async(upload))
+    except ModelNotReady:
+        return _models_loading()
+    except UploadTooLarge as e:
+        raise HTTPException(status_code=413, detail=str(e)) from e
+    except UnsupportedImage as e:
+        raise HTTPException(status_code=400, detail=str(e)) from e
+    except ExecutorSaturated as e:
+        raise HTTPException(status_code=503, detail=str(e)) from e
 
 
 @asynccontextmanager
 async def lifespan(_: FastAPI):
-    ml_app.load_model()
+    # Bind the port right away; the model loads and warms in the background (see /ready).
+    start_background(ml_app.load_model)
+    registry.start_watching()
     yield
 
 
@@ -49,6 +92,7 @@ app = FastAPI(
     title="Fashion AI ML",
     description="ViT garment classification (best_model_17_marzo.keras)",
     lifespan=lifespan,
+    default_response_class=FastJSONResponse,
 )
 app.add_middleware(
     CORSMiddleware,
@@ -57,6 +101,16 @@ app.add_middleware(
     allow_methods=["*"],
     allow_headers=["*"],
 )
+app.add_middleware(
+    UploadLimitMiddleware,
+    default_limit=MAX_UPLOAD_BYTES + MULTIPART_SLACK,
+    limits={
+        "/classify-batch": MAX_BATCH_UPLOAD_BYTES + MULTIPART_SLACK,
+        "/embed-batch": MAX_BATCH_UPLOAD_BYTES + MULTIPART_SLACK,
+    },
+)
+app.add_middleware(MetricsMiddleware)
+add_artifact_routes(app)
 
 
 @app.get("/")
@@ -65,15 +119,23 @@ def root():
         "message": "Fashion AI ML API",
         "docs": "/docs",
         "health": "/health",
+        "ready": "/ready",
         "classify": "POST /classify (ViT)",
         "classify_vit": "POST /classify-vit (ViT)",
+        "classify_batch": "POST /classify-batch (ViT, N imagen parts)",
     }
 
 
+@app.get("/metrics/prom", response_class=PlainTextResponse)
+def prometheus_metrics():
+    """Stage latency histograms and request counters (Prometheus text format)."""
+    return PlainTextResponse(render_prometheus(), media_type=PROMETHEUS_CONTENT_TYPE)
+
+
 @app.get("/health")
 def health():
-    vit_p = Path(VIT_MODEL_PATH)
-    vit_ok = models.vit is not None
+    vit_p = models.model_path
+    vit_ok = models.is_loaded
     return {
         "status": "OK",
         "model_loaded": vit_ok,
@@ -84,18 +146,57 @@ def health():
         "vit_model_file_exists": vit_p.is_file(),
         "vit_model_path": str(vit_p.resolve()) if vit_p.is_file() else None,
         "classes_count": len(ml_app.class_names) if ml_app.class_names else 0,
+        "readiness": readiness.snapshot(),
+        "runtime": runtime_info(),
     }
 
 
+@app.get("/ready")
+def ready():
+    """200 once the model is loaded and warm, 503 (with the startup state) before that."""
+    snapshot = readiness.snapshot()
+    return FastJSONResponse(snapshot, status_code=200 if snapshot["ready"] else 503)
+
+
+@app.get("/admin/models")
+def admin_models(request: Request):
+    """Registry versions, the one being served and the last hot swap."""
+    if not admin_authorized(request.headers.get(ADMIN_TOKEN_HEADER)):
+        raise HTTPException(status_code=403, detail="Forbidden")
+    return registry.status()
+
+
+@app.post("/admin/models/activate")
+async def admin_activate_model(request: Request):
+    """``{"version": ...}``: load + warm it in the background and swap it in (202); ``"wait": true`` blocks."""
+    if not admin_authorized(request.headers.get(ADMIN_TOKEN_HEADER)):
+        raise HTTPException(status_code=403, detail="Forbidden")
+    try:
+        payload = await request.json()
+    except ValueError:
+        payload = {}
+    if not isinstance(payload, dict):
+        payload = {}
+    try:
+        swap = registry.activate(payload.get("version"))
+    except UnknownVersion as e:
+        raise HTTPException(status_code=404, detail=str(e)) from e
+    except SwapInProgress as e:
+        raise HTTPException(status_code=409, detail=str(e)) from e
+    if payload.get("wait"):
+        await asyncio.to_thread(swap.join)
+        status = registry.status()
+        return FastJSONResponse(status, status_code=200 if status["last_swap"]["state"] == "swapped" else 500)
+    return FastJSONResponse(registry.status(), status_code=202)
+
+
 @app.post("/classify")
-async def classify(imagen: UploadFile = File(..., alias="imagen")):
+async def classify(request: Request, imagen: UploadFile = File(..., alias="imagen")):
     if not imagen.filename or not ml_app.allowed_file(imagen.filename):
         raise HTTPException(status_code=400, detail="Invalid or missing image file")
-    contents = await imagen.read()
-    if not contents:
-        raise HTTPException(status_code=400, detail="No image provided")
+    upload = _read_upload(imagen)
     try:
-        return _classify_vit(contents)
+        return await _classify_vit(upload, request)
     except HTTPException:
         raise
     except Exception as e:
@@ -103,14 +204,12 @@ async def classify(imagen: UploadFile = File(..., alias="imagen")):
 
 
 @app.post("/classify-vit")
-async def classify_vit(imagen: UploadFile = File(..., alias="imagen")):
+async def classify_vit(request: Request, imagen: UploadFile = File(..., alias="imagen")):
     if not imagen.filename or not ml_app.allowed_file(imagen.filename):
         raise HTTPException(status_code=400, detail="Invalid or missing image file")
-    contents = await imagen.read()
-    if not contents:
-        raise HTTPException(status_code=400, detail="No image provided")
+    upload = _read_upload(imagen)
     try:
-        return _classify_vit(contents)
+        return await _classify_vit(upload, request)
     except HTTPException:
         raise
     except Exception as e:
@@ -118,5 +217,126 @@ async def classify_vit(imagen: UploadFile = File(..., alias="imagen")):
 
 
 @app.post("/predict")
-async def predict(imagen: UploadFile = File(..., alias="imagen")):
-    return await classify_vit(imagen)
+async def predict(request: Request, imagen: UploadFile = File(..., alias="imagen")):
+    return await classify_vit(request, imagen)
+
+
+@app.post("/classify-batch")
+async def classify_batch_route(imagen: list[UploadFile] = File(..., alias="imagen")):
+    items = []
+    total = 0
+    for f in imagen:
+        upload = SpooledUpload.from_file(f.file, f.filename or "", limit=None)
+        total += len(upload)
+        if total > MAX_BATCH_UPLOAD_BYTES:
+            raise HTTPException(status_code=413, detail="Batch too large")
+        items.append((f.filename or "", upload))
+    try:
+        return FastJSONResponse(await classify_batch_async(items))
+    except BatchTooLarge as e:
+        raise HTTPException(status_code=413, detail=str(e)) from e
+    except ExecutorSaturated as e:
+        raise HTTPException(status_code=503, detail=str(e)) from e
+    except ModelNotReady:
+        return _models_loading()
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e)) from e
+
+
+@app.post("/embed")
+async def embed(
+    request: Request,
+    imagen: UploadFile = File(..., alias="imagen"),
+    user_id: str | None = Form(None),
+    item_id: str | None = Form(None),
+):
+    if user_id and not admin_authorized(request.headers.get(ADMIN_TOKEN_HEADER)):
+        raise HTTPException(status_code=403, detail="Forbidden")
+    if not imagen.filename or not ml_app.allowed_file(imagen.filename):
+        raise HTTPException(status_code=400, detail="Invalid or missing image file")
+    upload = _read_upload(imagen)
+    try:
+        return FastJSONResponse(await embed_image_async(upload, imagen.filename, user_id, item_id))
+    except ModelNotReady:
+        return _models_loading()
+    except UploadTooLarge as e:
+        raise HTTPException(status_code=413, detail=str(e)) from e
+    except (UnsupportedImage, ValueError) as e:
+        raise HTTPException(status_code=400, detail=str(e)) from e
+    except EmbeddingsUnavailable as e:
+        raise HTTPException(status_code=501, detail=str(e)) from e
+    except ExecutorSaturated as e:
+        raise HTTPException(status_code=503, detail=str(e)) from e
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e)) from e
+
+
+@app.post("/embed-batch")
+async def embed_batch_route(
+    request: Request,
+    imagen: list[UploadFile] = File(..., alias="imagen"),
+    user_id: str | None = Form(None),
+    item_id: list[str] | None = Form(None),
+):
+    if user_id and not admin_authorized(request.headers.get(ADMIN_TOKEN_HEADER)):
+        raise HTTPException(status_code=403, detail="Forbidden")
+    items = []
+    total = 0
+    for f in imagen:
+        upload = SpooledUpload.from_file(f.file, f.filename or "", limit=None)
+        total += len(upload)
+        if total > MAX_BATCH_UPLOAD_BYTES:
+            raise HTTPException(status_code=413, detail="Batch too large")
+        items.append((f.filename or "", upload))
+    try:
+        return FastJSONResponse(await embed_batch_async(items, user_id, item_id))
+    except BatchTooLarge as e:
+        raise HTTPException(status_code=413, detail=str(e)) from e
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e)) from e
+    except EmbeddingsUnavailable as e:
+        raise HTTPException(status_code=501, detail=str(e)) from e
+    except ExecutorSaturated as e:
+        raise HTTPException(status_code=503, detail=str(e)) from e
+    except ModelNotReady:
+        return _models_loading()
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e)) from e
+
+
+async def _json_object(request: Request) -> dict:
+    try:
+        payload = await request.json()
+    except ValueError:
+        payload = None
+    if not isinstance(payload, dict):
+        raise HTTPException(status_code=400, detail="JSON object body required")
+    return payload
+
+
+@app.post("/index/similar")
+async def index_similar(request: Request):
+    if not admin_authorized(request.headers.get(ADMIN_TOKEN_HEADER)):
+        raise HTTPException(status_code=403, detail="Forbidden")
+    payload = await _json_object(request)
+    try:
+        return FastJSONResponse(await image_executor.run(similar_items, payload))
+    except UnknownItem as e:
+        raise HTTPException(status_code=404, detail=str(e)) from e
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e)) from e
+    except ExecutorSaturated as e:
+        raise HTTPException(status_code=503, detail=str(e)) from e
+
+
+@app.delete("/index/items")
+async def index_remove_items(request: Request):
+    if not admin_authorized(request.headers.get(ADMIN_TOKEN_HEADER)):
+        raise HTTPException(status_code=403, detail="Forbidden")
+    payload = await _json_object(request)
+    try:
+        return FastJSONResponse(await image_executor.run(remove_items, payload))
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e)) from e
+    except ExecutorSaturated as e:
+        raise HTTPException(status_code=503, detail=str(e)) from e
@@ -6,17 +6,18 @@ import sys
 import threading
 from pathlib import Path
 
-import requests
 _ML_DIR = os.path.dirname(os.path.abspath(__file__))
 _SRC = os.path.join(_ML_DIR, "src")
 if _SRC not in sys.path:
     sys.path.insert(0, _SRC)
 
 from fashion_ml import labels
-from fashion_ml.config import VIT_MODEL_PATH
-from fashion_ml.flask_app import app
+from fashion_ml.backends import exported_path
+from fashion_ml.config import INFERENCE_BACKEND, STUB_MODEL_LATENCY_MS, VIT_MODEL_PATH, VIT_SHA256
 from fashion_ml.image_ops import allowed_file, detect_color, logits_to_probs, preprocess_image
 from fashion_ml.model_loader import models
+from fashion_ml.readiness import run_startup
+from fashion_ml.registry import registry
 
 # --- Legacy attributes (space_app.py, tests) ---
 model = None
@@ -35,18 +36,38 @@ def preprocess_image_vit(image):
 def load_model():
     """Load ViT weights into process memory (call once)."""
     global model, vit_model, vit_input_size, KERAS_HUB_AVAILABLE
-    models.load_classification_model(VIT_MODEL_PATH)
+    models.load_classification_model(registry.boot_path(VIT_MODEL_PATH))
     model = models.vit
     vit_model = models.vit
     vit_input_size = models.vit_input_size
     KERAS_HUB_AVAILABLE = models.keras_hub_available
 
 
-def _load_models_background():
-    _ensure_vit_model_available()
+def __getattr__(name: str):
+    # The Flask app (and flask / werkzeug) is imported on first use: space_app imports this module
+    # for load_model() and the legacy attributes only.
+    if name == "app":
+        from fashion_ml.flask_app import app
+
+        return app
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+
+
+def _download_model() -> None:
+    if STUB_MODEL_LATENCY_MS is not None:
+        print("[model] stub model requested, skipping weights download", flush=True)
+    elif registry.boot_path(VIT_MODEL_PATH) != Path(VIT_MODEL_PATH):
+        print(f"[model] registry version {registry.pinned()} pinned, skipping release download", flush=True)
+    elif INFERENCE_BACKEND in ("tflite", "onnx") and exported_path(VIT_MODEL_PATH, INFERENCE_BACKEND).is_file():
+        print(f"[model] {INFERENCE_BACKEND} export present, skipping .keras download", flush=True)
+    else:
+        _ensure_vit_model_available()
     _log_model_diagnostics()
-    load_model()
-    if models.vit is not None:
+
+
+def _load_models_background():
+    """Readiness-tracked download -> load -> warm-up (runs in a background thread)."""
+    if run_startup(load_model, download=_download_model):
         print("✅ ViT listo para clasificar.", flush=True)
     else:
         print("❌ ViT no está listo (revisa ML_VIT_PATH y logs).", flush=True)
@@ -114,17 +135,18 @@ def _headers_for_github(token: str) -> dict[str, str]:
 
 
 def _download_model_direct(url: str, dest: Path, token: str) -> None:
-    with requests.get(url, headers=_headers_for_github(token), stream=True, timeout=120) as r:
-        r.raise_for_status()
-        with dest.open("wb") as f:
-            for chunk in r.iter_content(chunk_size=1024 * 1024):
-                if chunk:
-                    f.write(chunk)
+    from fashion_ml.download import download_file
+
+    download_file(url, dest, sha256=VIT_SHA256 or None, headers=_headers_for_github(token))
 
 
 def _download_model_via_api(repo: str, tag: str, asset_name: str, dest: Path, token: str) -> None:
     if not token:
         raise RuntimeError("GITHUB_TOKEN requerido para fallback API en releases privados")
+    import requests
+
+    from fashion_ml.download import download_file
+
     release_url = f"https://api.github.com/repos/{repo}/releases/tags/{tag}"
     release = requests.get(release_url, headers=_headers_for_github(token), timeout=30)
     release.raise_for_status()
@@ -135,12 +157,7 @@ def _download_model_via_api(repo: str, tag: str, asset_name: str, dest: Path, to
     asset_api_url = asset["url"]
     headers = _headers_for_github(token)
     headers["Accept"] = "application/octet-stream"
-    with requests.get(asset_api_url, headers=headers, stream=True, timeout=120) as r:
-        r.raise_for_status()
-        with dest.open("wb") as f:
-            for chunk in r.iter_content(chunk_size=1024 * 1024):
-                if chunk:
-                    f.write(chunk)
+    download_file(asset_api_url, dest, sha256=VIT_SHA256 or None, headers=headers)
 
 
 def _ensure_vit_model_available() -> None:
@@ -159,30 +176,31 @@ def _ensure_vit_model_available() -> None:
     print(f"[model] download_url={direct_url}", flush=True)
     print(f"[model] local_path={target}", flush=True)
 
-    # Skip download if we already have non-empty, non-LFS file.
+    from fashion_ml.download import restore_from_cache, verify_file
+
+    # Skip download if we already have non-empty, non-LFS file (matching ML_VIT_SHA256 when pinned).
     if target.is_file() and target.stat().st_size > 0 and not _is_git_lfs_pointer(target):
-        print(f"[model] file already present, skipping download ({target.stat().st_size} bytes)", flush=True)
+        if not VIT_SHA256 or verify_file(target, VIT_SHA256):
+            print(f"[model] file already present, skipping download ({target.stat().st_size} bytes)", flush=True)
+            return
+        print("[model] existing file does not match ML_VIT_SHA256, downloading again", flush=True)
+    if VIT_SHA256 and restore_from_cache(VIT_SHA256, target):
+        print(f"[model] restored from model cache (sha256 {VIT_SHA256[:12]})", flush=True)
         return
 
-    tmp = target.with_suffix(target.suffix + ".part")
-    if tmp.exists():
-        tmp.unlink()
-
+    # Interrupted downloads leave <target>.part + .part.json and resume from there.
     try:
         print("[model] downloading from GitHub release direct URL...", flush=True)
-        _download_model_direct(direct_url, tmp, token)
+        _download_model_direct(direct_url, target, token)
     except Exception as direct_err:
         print(f"[model] direct download failed: {direct_err}", flush=True)
         try:
             print("[model] trying GitHub API asset download fallback...", flush=True)
-            _download_model_via_api(repo, tag, asset_name, tmp, token)
+            _download_model_via_api(repo, tag, asset_name, target, token)
         except Exception as api_err:
-            if tmp.exists():
-                tmp.unlink()
             print(f"[model] ERROR: failed to download model via direct URL and API fallback: {api_err}", flush=True)
             return
 
-    tmp.replace(target)
     exists = target.exists()
     size = target.stat().st_size if exists else 0
     print(f"[model] download complete: exists={exists}", flush=True)
@@ -197,6 +215,9 @@ if __name__ == "__main__":
     print("Fashion AI ML Service", flush=True)
     print(f"Loading ViT model from {VIT_MODEL_PATH}", flush=True)
     print(f"Binding to http://0.0.0.0:{port} (models loading in background)...", flush=True)
-    t = threading.Thread(target=_load_models_background, daemon=True)
-    t.start()
+    from fashion_ml.flask_app import app
+
+    # _load_models_background already runs run_startup; start_background would run it twice.
+    threading.Thread(target=_load_models_background, name="model-startup", daemon=True).start()
+    registry.start_watching()
     app.run(host="0.0.0.0", port=port, debug=False, use_reloader=False)
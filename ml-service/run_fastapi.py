@@ -1,5 +1,5 @@
 #!/usr/bin/env python3
-"""Run FastAPI server (optional). Loads models at startup. Port: PORT or 6001."""
+"""Run FastAPI server (optional). Loads models in the background after binding (see /ready). Port: PORT or 6001."""
 
 from __future__ import annotations
 
@@ -14,10 +14,13 @@ if _SRC not in sys.path:
 from fashion_ml.config import VIT_MODEL_PATH
 from fashion_ml.model_loader import models
 from fashion_ml.fastapi_app import app as fastapi_app
+from fashion_ml.readiness import start_background
+from fashion_ml.registry import registry
 
 
 def main():
-    models.load_classification_model(VIT_MODEL_PATH)
+    start_background(lambda: models.load_classification_model(registry.boot_path(VIT_MODEL_PATH)))
+    registry.start_watching()
     import uvicorn
 
     port = int(os.environ.get("PORT", 6001))
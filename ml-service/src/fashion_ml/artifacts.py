@@ -0,0 +1,143 @@
+"""Static model artifacts (metrics JSON, confusion matrices, training curves) served from memory.
+
+Each file is read once and kept until its mtime or size changes. JSON is re-serialized
+compactly and gzip-compressed ahead of time; PNGs are served as stored (already compressed).
+Responses carry a strong ETag per representation (the gzip body has its own), ``Cache-Control``
+and ``Vary: Accept-Encoding``; a matching ``If-None-Match`` gets an empty 304.
+"""
+
+from __future__ import annotations
+
+import gzip
+import hashlib
+import json
+import threading
+from email.utils import formatdate
+from pathlib import Path
+
+from fashion_ml.config import ARTIFACT_MAX_AGE_S, ML_SERVICE_ROOT
+
+# URL path -> file under ML_SERVICE_ROOT (same routes in the Flask, FastAPI and HF Space apps)
+ARTIFACT_ROUTES = {
+    "/confusion-matrix": "confusion_matrix.png",
+    "/confusion-matrix-vit": "confusion_matrix_vit.png",
+    "/confusion-matrix-vit-real": "vit_real_pictures/confusion_matrix_vit_real_picture.png",
+    "/data-audit": "data_audit.png",
+    "/training-curves-vit": "training_curves_vit.png",
+    "/metrics": "model_metrics.json",
+    "/metrics-vit": "model_metrics_vit.json",
+}
+_CONTENT_TYPES = {".png": "image/png", ".json": "application/json"}
+
+
+class Artifact:
+    __slots__ = ("body", "gzip_body", "etag", "gzip_etag", "content_type", "last_modified", "mtime_ns", "size")
+
+    def __init__(self, path: Path, mtime_ns: int, size: int) -> None:
+        raw = path.read_bytes()
+        self.content_type = _CONTENT_TYPES.get(path.suffix.lower(), "application/octet-stream")
+        if self.content_type == "application/json":
+            self.body = json.dumps(json.loads(raw), ensure_ascii=False, separators=(",", ":")).encode("utf-8")
+            self.gzip_body: bytes | None = gzip.compress(self.body, compresslevel=6, mtime=0)
+        else:
+            self.body = raw
+            self.gzip_body = None
+        digest = hashlib.sha256(self.body).hexdigest()[:32]
+        self.etag = f'"{digest}"'
+        self.gzip_etag = f'"{digest}-gz"'
+        self.last_modified = formatdate(mtime_ns / 1e9, usegmt=True)
+        self.mtime_ns = mtime_ns
+        self.size = size
+
+
+class ArtifactCache:
+    """``relpath -> Artifact`` under ``root``, rebuilt when the file's mtime or size changes."""
+
+    def __init__(self, root: Path = ML_SERVICE_ROOT) -> None:
+        self.root = Path(root)
+        self._lock = threading.Lock()
+        self._entries: dict[str, Artifact] = {}
+        self.hits = 0
+        self.loads = 0
+
+    def get(self, relpath: str) -> Artifact | None:
+        """The current artifact, or ``None`` when the file does not exist (or is unreadable JSON)."""
+        path = self.root / relpath
+        try:
+            st = path.stat()
+        except OSError:
+            with self._lock:
+                self._entries.pop(relpath, None)
+            return None
+        with self._lock:
+            cached = self._entries.get(relpath)
+            if cached is not None and (cached.mtime_ns, cached.size) == (st.st_mtime_ns, st.st_size):
+                self.hits += 1
+                return cached
+        try:
+            artifact = Artifact(path, st.st_mtime_ns, st.st_size)
+        except (OSError, ValueError) as e:
+            print(f"⚠️  Could not load artifact {relpath}: {e}", flush=True)
+            return None
+        with self._lock:
+            self._entries[relpath] = artifact
+            self.loads += 1
+        return artifact
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {"entries": len(self._entries), "hits": self.hits, "loads": self.loads}
+
+
+def _etag_matches(if_none_match: str | None, etag: str) -> bool:
+    """Weak comparison, as RFC 9110 prescribes for ``If-None-Match``."""
+    if not if_none_match:
+        return False
+    if if_none_match.strip() == "*":
+        return True
+    tags = (t.strip() for t in if_none_match.split(","))
+    return any((t[2:] if t.startswith("W/") else t) == etag for t in tags)
+
+
+def conditional_response(
+    artifact: Artifact, if_none_match: str | None, accept_encoding: str | None
+) -> tuple[int, bytes, dict[str, str]]:
+    """``(status, body, headers)`` for a GET: 200 with the best encoding, or an empty 304."""
+    use_gzip = artifact.gzip_body is not None and "gzip" in (accept_encoding or "").lower()
+    etag = artifact.gzip_etag if use_gzip else artifact.etag
+    headers = {
+        "ETag": etag,
+        "Cache-Control": f"public, max-age={ARTIFACT_MAX_AGE_S}",
+        "Last-Modified": artifact.last_modified,
+        "Vary": "Accept-Encoding",
+    }
+    if _etag_matches(if_none_match, etag):
+        return 304, b"", headers
+    headers["Content-Type"] = artifact.content_type
+    if use_gzip:
+        headers["Content-Encoding"] = "gzip"
+        return 200, artifact.gzip_body, headers
+    return 200, artifact.body, headers
+
+
+artifacts = ArtifactCache()
+
+
+def add_artifact_routes(app) -> None:
+    """Register every ``ARTIFACT_ROUTES`` path on a FastAPI / Starlette app (the Flask app declares them itself)."""
+    from starlette.responses import JSONResponse, Response
+
+    def endpoint_for(relpath: str):
+        def serve(request):
+            artifact = artifacts.get(relpath)
+            if artifact is None:
+                return JSONResponse({"error": "Not found"}, status_code=404)
+            status, body, headers = conditional_response(
+                artifact, request.headers.get("if-none-match"), request.headers.get("accept-encoding")
+            )
+            return Response(body, status_code=status, headers=headers)
+
+        return serve
+
+    for path, relpath in ARTIFACT_ROUTES.items():
+        app.add_route(path, endpoint_for(relpath), methods=["GET"], include_in_schema=False)
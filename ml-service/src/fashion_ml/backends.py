@@ -0,0 +1,214 @@
+"""Inference backends behind one ``predict(batch) -> logits`` API: Keras, TFLite, ONNX Runtime.
+
+``embed(batch)`` returns penultimate-layer features where the backend can expose them (Keras and
+the load-test stub); exported TFLite / ONNX graphs only carry the logits output.
+
+TFLite and ONNX artifacts are produced offline by ``python -m fashion_ml.export`` and live next
+to the ``.keras`` file (same stem, ``.tflite`` / ``.onnx``). Neither needs keras-hub at runtime,
+and the ONNX backend does not import TensorFlow at all.
+"""
+
+from __future__ import annotations
+
+import time
+from pathlib import Path
+from typing import Any
+
+import numpy as np
+
+BACKEND_KINDS = ("keras", "tflite", "onnx")
+EXPORT_SUFFIXES = {"tflite": ".tflite", "onnx": ".onnx"}
+QUANTIZATION_VARIANTS = ("int8", "float16")
+
+
+def exported_path(keras_path: Path, kind: str) -> Path:
+    """Where the ``kind`` export of ``keras_path`` lives (``best_model_17_marzo.tflite`` ...)."""
+    return Path(keras_path).with_suffix(EXPORT_SUFFIXES[kind])
+
+
+def quantized_path(keras_path: Path, variant: str) -> Path:
+    """``best_model_17_marzo.int8.tflite`` / ``best_model_17_marzo.float16.tflite``."""
+    return Path(keras_path).with_suffix(f".{variant}.tflite")
+
+
+def quantization_report_path(keras_path: Path, variant: str) -> Path:
+    """Validation report written by ``python -m fashion_ml.quantize`` next to the artifact."""
+    return Path(keras_path).with_suffix(f".{variant}.report.json")
+
+
+class EmbeddingsUnavailable(RuntimeError):
+    """The serving backend cannot produce embeddings; apps answer 501."""
+
+
+class InferenceBackend:
+    """Runs a preprocessed ``(N, H, W, 3)`` float32 batch and returns raw ``(N, K)`` logits.
+
+    Not thread-safe; ``MLModels`` serializes calls (or gives each ``ReplicaPool`` slot its own).
+    """
+
+    name = "base"
+
+    def __init__(self, input_size: int, source: Path | None = None) -> None:
+        self.input_size = int(input_size)
+        self.source = source
+        self.details: dict = {}
+
+    def predict(self, batch: np.ndarray) -> np.ndarray:
+        raise NotImplementedError
+
+    def embed(self, batch: np.ndarray) -> np.ndarray:
+        """``(N, D)`` penultimate-layer features for the same input as ``predict``."""
+        raise EmbeddingsUnavailable(f"the {self.name} backend does not expose embeddings")
+
+    def info(self) -> dict:
+        return {
+            "backend": self.name,
+            "path": self.name,
+            "input_size": self.input_size,
+            "source": self.source.name if self.source else None,
+            **self.details,
+        }
+
+
+class KerasBackend(InferenceBackend):
+    """The loaded Keras model, via ``model.predict`` or an attached ``CompiledPredictor``."""
+
+    name = "keras"
+
+    def __init__(self, model: Any, input_size: int, source: Path | None = None) -> None:
+        super().__init__(input_size, source)
+        self.model = model
+        self.compiled: Any = None
+        self._embedder: Any = None
+
+    def predict(self, batch: np.ndarray) -> np.ndarray:
+        if self.compiled is not None:
+            return self.compiled.predict(batch)
+        return self.model.predict(batch, verbose=0)
+
+    def embed(self, batch: np.ndarray) -> np.ndarray:
+        if self._embedder is None:
+            from fashion_ml.serving import embedding_fn
+
+            self._embedder = embedding_fn(self.model) or False
+        if self._embedder is False:
+            raise EmbeddingsUnavailable("the model has no Dense classification head to take features from")
+        return np.asarray(self._embedder(batch), dtype=np.float32).reshape(batch.shape[0], -1)
+
+    def info(self) -> dict:
+        out = super().info()
+        compiled = self.compiled
+        out["path"] = "compiled" if compiled is not None else "keras"
+        out["batch_sizes"] = list(compiled.batch_sizes) if compiled is not None else None
+        out["warmup_seconds"] = compiled.warmup_seconds if compiled is not None else None
+        out["warmup_by_batch"] = compiled.warmup_by_batch if compiled is not None else None
+        return out
+
+
+class StubBackend(InferenceBackend):
+    """Load-test stand-in: logits derived from per-channel means after ``latency_ms`` of sleep.
+
+    Sleeping releases the GIL like a real forward pass, so server concurrency behaves
+    realistically without TensorFlow or weights (``ML_STUB_MODEL_MS``).
+    """
+
+    name = "stub"
+
+    def __init__(self, input_size: int = 224, latency_ms: float = 20.0) -> None:
+        super().__init__(input_size, None)
+        self.latency_s = max(0.0, float(latency_ms)) / 1000.0
+        self.details = {"latency_ms": float(latency_ms)}
+
+    def predict(self, batch: np.ndarray) -> np.ndarray:
+        if self.latency_s:
+            time.sleep(self.latency_s)
+        means = batch.reshape(batch.shape[0], -1, batch.shape[-1]).mean(axis=1) / 255.0
+        return np.concatenate([means, means[:, :1] * np.arange(1, 8, dtype=np.float32)], axis=1)
+
+    def embed(self, batch: np.ndarray) -> np.ndarray:
+        """Channel means over a 4 x 4 grid (48 values): similar images get similar vectors."""
+        if self.latency_s:
+            time.sleep(self.latency_s)
+        n, h, w, c = batch.shape
+        grid = batch[:, : h - h % 4, : w - w % 4].reshape(n, 4, h // 4, 4, w // 4, c).mean(axis=(2, 4))
+        return (grid.reshape(n, -1) / 255.0).astype(np.float32)
+
+
+def _tflite_interpreter_class():
+    """Prefer the standalone LiteRT / tflite-runtime wheels; fall back to TensorFlow's copy."""
+    try:
+        from ai_edge_litert.interpreter import Interpreter
+
+        return Interpreter
+    except ImportError:
+        pass
+    try:
+        from tflite_runtime.interpreter import Interpreter
+
+        return Interpreter
+    except ImportError:
+        pass
+    import tensorflow as tf
+
+    return tf.lite.Interpreter
+
+
+class TFLiteBackend(InferenceBackend):
+    name = "tflite"
+
+    def __init__(self, path: Path, num_threads: int | None = None) -> None:
+        interpreter_cls = _tflite_interpreter_class()
+        self._interp = interpreter_cls(model_path=str(path), num_threads=num_threads)
+        self._input = self._interp.get_input_details()[0]
+        self._output_index = self._interp.get_output_details()[0]["index"]
+        self._batch: int | None = None
+        self.num_threads = num_threads
+        super().__init__(int(self._input["shape"][1]), Path(path))
+
+    def _resize(self, n: int) -> None:
+        if n == self._batch:
+            return
+        self._interp.resize_tensor_input(self._input["index"], [n, self.input_size, self.input_size, 3])
+        self._interp.allocate_tensors()
+        self._batch = n
+
+    def predict(self, batch: np.ndarray) -> np.ndarray:
+        self._resize(batch.shape[0])
+        self._interp.set_tensor(self._input["index"], np.ascontiguousarray(batch, dtype=np.float32))
+        self._interp.invoke()
+        return self._interp.get_tensor(self._output_index).copy()
+
+    def info(self) -> dict:
+        return {**super().info(), "num_threads": self.num_threads}
+
+
+class OnnxBackend(InferenceBackend):
+    name = "onnx"
+
+    def __init__(self, path: Path, num_threads: int | None = None) -> None:
+        import onnxruntime as ort
+
+        opts = ort.SessionOptions()
+        if num_threads:
+            opts.intra_op_num_threads = int(num_threads)
+        self._session = ort.InferenceSession(str(path), sess_options=opts, providers=["CPUExecutionProvider"])
+        inp = self._session.get_inputs()[0]
+        self._input_name = inp.name
+        size = inp.shape[1] if isinstance(inp.shape[1], int) else 224
+        self.num_threads = num_threads
+        super().__init__(size, Path(path))
+
+    def predict(self, batch: np.ndarray) -> np.ndarray:
+        feed = {self._input_name: np.ascontiguousarray(batch, dtype=np.float32)}
+        return self._session.run(None, feed)[0]
+
+    def info(self) -> dict:
+        return {**super().info(), "num_threads": self.num_threads}
+
+
+def load_exported_backend(kind: str, path: Path, num_threads: int | None = None) -> InferenceBackend:
+    if kind == "tflite":
+        return TFLiteBackend(path, num_threads=num_threads)
+    if kind == "onnx":
+        return OnnxBackend(path, num_threads=num_threads)
+    raise ValueError(f"Unknown exported backend: {kind}")
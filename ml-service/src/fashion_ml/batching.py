@@ -0,0 +1,126 @@
+"""Dynamic micro-batching: coalesce concurrent single-image requests into one forward pass."""
+
+from __future__ import annotations
+
+import queue
+import threading
+import time
+from concurrent.futures import Future
+from typing import Any, Callable
+
+import numpy as np
+
+
+class MicroBatcher:
+    """Queues ``(1, H, W, C)`` tensors and flushes them as one ``(N, H, W, C)`` batch.
+
+    A flush happens when ``max_batch_size`` items are pending or ``max_wait_ms`` has passed
+    since the first item of the batch arrived; an item that finds nothing else queued is flushed
+    at once, so a lone request never pays the wait. Under load, requests queue up while a batch
+    runs and the next collect picks them all up. ``run_batch(batch, context)`` receives the stacked
+    batch and must return one row per input; row ``i`` resolves the future of the ``i``-th caller.
+    ``context`` is what callers passed to ``submit`` (the model snapshot); items submitted with
+    different contexts are flushed together but never share a ``run_batch`` call.
+    ``workers`` threads drain the queue; with one worker ``run_batch`` never runs concurrently
+    with itself, with more (one per model replica) several batches can be in flight.
+    """
+
+    def __init__(
+        self,
+        run_batch: Callable[[np.ndarray, Any], np.ndarray],
+        max_batch_size: int = 8,
+        max_wait_ms: float = 10.0,
+        name: str = "vit-batcher",
+        workers: int = 1,
+    ) -> None:
+        self._run_batch = run_batch
+        self.max_batch_size = max(1, int(max_batch_size))
+        self.max_wait_s = max(0.0, float(max_wait_ms)) / 1000.0
+        self._name = name
+        self.workers = max(1, int(workers))
+        self._queue: queue.Queue[tuple[np.ndarray, Any, Future]] = queue.Queue()
+        self._threads: list[threading.Thread] = []
+        self._start_lock = threading.Lock()
+        self._stats_lock = threading.Lock()
+        self.batches = 0
+        self.items = 0
+        self.max_seen_batch = 0
+
+    def _ensure_worker(self) -> None:
+        if len(self._threads) == self.workers and all(t.is_alive() for t in self._threads):
+            return
+        with self._start_lock:
+            self._threads = [t for t in self._threads if t.is_alive()]
+            while len(self._threads) < self.workers:
+                t = threading.Thread(target=self._loop, name=f"{self._name}-{len(self._threads)}", daemon=True)
+                t.start()
+                self._threads.append(t)
+
+    def submit(self, arr: np.ndarray, context: Any = None) -> Future:
+        """Enqueue one preprocessed tensor (leading batch dim of 1); returns a Future of its row."""
+        fut: Future = Future()
+        self._ensure_worker()
+        self._queue.put((arr, context, fut))
+        return fut
+
+    def predict(self, arr: np.ndarray, context: Any = None) -> np.ndarray:
+        return self.submit(arr, context).result()
+
+    def _collect(self) -> list[tuple[np.ndarray, Any, Future]]:
+        pending = [self._queue.get()]
+        deadline = time.monotonic() + self.max_wait_s
+        while len(pending) < self.max_batch_size:
+            try:
+                pending.append(self._queue.get_nowait())
+                continue
+            except queue.Empty:
+                pass
+            remaining = deadline - time.monotonic()
+            if len(pending) == 1 or remaining <= 0:
+                break  # nothing else queued: run the lone request now instead of waiting for company
+            try:
+                pending.append(self._queue.get(timeout=remaining))
+            except queue.Empty:
+                break
+        return pending
+
+    def _loop(self) -> None:
+        while True:
+            pending = self._collect()
+            groups: dict[int, list[tuple[np.ndarray, Any, Future]]] = {}
+            for item in pending:
+                if item[2].set_running_or_notify_cancel():
+                    groups.setdefault(id(item[1]), []).append(item)
+            for live in groups.values():
+                self._run(live)
+
+    def _run(self, live: list[tuple[np.ndarray, Any, Future]]) -> None:
+        """One ``run_batch`` call for items sharing a context."""
+        try:
+            batch = np.concatenate([a for a, _, _ in live], axis=0)
+            out = np.asarray(self._run_batch(batch, live[0][1]))
+            if out.shape[0] != len(live):
+                raise RuntimeError(f"batch output has {out.shape[0]} rows for {len(live)} inputs")
+        except BaseException as e:
+            for _, _, f in live:
+                f.set_exception(e)
+            return
+        with self._stats_lock:
+            self.batches += 1
+            self.items += len(live)
+            self.max_seen_batch = max(self.max_seen_batch, len(live))
+        for i, (_, _, f) in enumerate(live):
+            f.set_result(out[i])
+
+    def stats(self) -> dict:
+        return {
+            "enabled": True,
+            "max_batch_size": self.max_batch_size,
+            "max_wait_ms": self.max_wait_s * 1000.0,
+            "workers": self.workers,
+            "batches": self.batches,
+            "items": self.items,
+            "avg_batch_size": (self.items / self.batches) if self.batches else 0.0,
+            "max_seen_batch": self.max_seen_batch,
+            "queue_depth": self._queue.qsize(),
+        }
@@ -0,0 +1,290 @@
+"""Offline microbenchmarks for the image_ops / model_loader hot paths.
+
+Usage (from ml-service/)::
+
+    PYTHONPATH=src python -m fashion_ml.bench --out bench.json
+    PYTHONPATH=src python -m fashion_ml.bench --quick --compare bench.json   # ratios vs a baseline
+
+Synthetic garment-like images (JPEG / PNG / WebP, 0.3-12 MP, with and without alpha) are
+generated in memory, so no dataset or real weights are needed. ``predict_vit`` runs against a
+tiny stand-in Keras model with the same input/output contract as the ViT (skipped when Keras
+is not installed). Results are JSON: one entry per benchmark with min / median / p95 / mean
+milliseconds, plus environment metadata to compare commits.
+"""
+
+from __future__ import annotations
+
+import argparse
+import io
+import json
+import os
+import platform
+import subprocess
+import sys
+import time
+from pathlib import Path
+from typing import Callable
+
+import numpy as np
+from PIL import Image
+
+from fashion_ml.config import BATCHING_ENABLED, COLOR_MODE, IMG_SIZE
+from fashion_ml.image_ops import DecodedImage, detect_color, logits_to_probs, preprocess_image
+
+# (label, width, height): 0.3 MP webcam, 2 MP downscaled upload, 12 MP phone photo
+SIZES = (("0.3MP", 640, 480), ("2MP", 1632, 1224), ("12MP", 4000, 3000))
+QUICK_SIZES = SIZES[:2]
+# (format, alpha): JPEG has no alpha; PNG / WebP are benchmarked both ways
+FORMATS = (("JPEG", False), ("PNG", False), ("PNG", True), ("WEBP", False), ("WEBP", True))
+
+
+def synthetic_image(width: int, height: int, alpha: bool = False, seed: int = 0) -> Image.Image:
+    """Light background gradient, a colored garment-shaped ellipse and sensor-like noise."""
+    rng = np.random.default_rng(seed)
+    y, x = np.mgrid[0:height, 0:width].astype(np.float32)
+    bg = 225 + 20 * (y / height)[..., None] * np.array([1.0, 0.9, 0.8], dtype=np.float32)
+    cx, cy, rx, ry = width / 2, height / 2, width * 0.28, height * 0.38
+    inside = ((x - cx) / rx) ** 2 + ((y - cy) / ry) ** 2 <= 1.0
+    garment = np.array(rng.integers(20, 230, size=3), dtype=np.float32)
+    shade = (0.75 + 0.25 * np.cos(x / max(width, 1) * 6.0))[..., None]
+    img = np.where(inside[..., None], garment * shade, bg)
+    img += rng.normal(0, 4, size=img.shape).astype(np.float32)
+    rgb = np.clip(img, 0, 255).astype(np.uint8)
+    if not alpha:
+        return Image.fromarray(rgb, "RGB")
+    a = np.where(inside, 255, 0).astype(np.uint8)
+    return Image.fromarray(np.dstack([rgb, a]), "RGBA")
+
+
+def encode(image: Image.Image, fmt: str) -> bytes:
+    buf = io.BytesIO()
+    kwargs = {"quality": 90} if fmt in ("JPEG", "WEBP") else {}
+    image.save(buf, fmt, **kwargs)
+    return buf.getvalue()
+
+
+def time_call(fn: Callable[[], object], repeat: int, warmup: int = 1) -> dict:
+    for _ in range(warmup):
+        fn()
+    samples = []
+    for _ in range(repeat):
+        t0 = time.perf_counter()
+        fn()
+        samples.append((time.perf_counter() - t0) * 1000.0)
+    arr = np.asarray(samples)
+    return {
+        "repeat": repeat,
+        "min_ms": round(float(arr.min()), 4),
+        "median_ms": round(float(np.median(arr)), 4),
+        "p95_ms": round(float(np.percentile(arr, 95)), 4),
+        "mean_ms": round(float(arr.mean()), 4),
+    }
+
+
+def tiny_keras_model(input_size: int = IMG_SIZE):
+    """Stand-in for the ViT: ``(N, S, S, 3)`` raw pixels in, ``(N, 10)`` logits out."""
+    import keras
+
+    inputs = keras.Input((input_size, input_size, 3))
+    x = keras.layers.Rescaling(1.0 / 255)(inputs)
+    x = keras.layers.Conv2D(8, 7, strides=4, activation="relu")(x)
+    x = keras.layers.Conv2D(16, 3, strides=2, activation="relu")(x)
+    x = keras.layers.GlobalAveragePooling2D()(x)
+    outputs = keras.layers.Dense(10)(x)
+    return keras.Model(inputs, outputs, name="bench_stand_in")
+
+
+def bench_image_ops(sizes, repeat: int) -> list[dict]:
+    results = []
+    for label, width, height in sizes:
+        for fmt, alpha in FORMATS:
+            src = synthetic_image(width, height, alpha=alpha, seed=width)
+            raw = encode(src, fmt)
+            case = {"size": label, "width": width, "height": height, "format": fmt, "alpha": alpha, "bytes": len(raw)}
+            rgb = DecodedImage.from_bytes(raw).image
+            # detect_color sees the upload's own mode so the alpha-mask branch is exercised
+            native = Image.open(io.BytesIO(raw))
+            native.load()
+            n = max(2, repeat // 4) if width * height > 4_000_000 else repeat
+            results.append({"name": "decode", **case, **time_call(lambda: DecodedImage.from_bytes(raw), n)})
+            results.append(
+                {"name": "preprocess_image", **case, **time_call(lambda: preprocess_image(rgb, normalize=False), n)}
+            )
+            for engine in ("kmeans", "fast"):
+                results.append(
+                    {
+                        "name": f"detect_color[{engine}]",
+                        **case,
+                        **time_call(lambda: detect_color(DecodedImage(native), mode=engine), n),
+                    }
+                )
+            print(f"[bench] image_ops {label} {fmt}{'+alpha' if alpha else ''} done", flush=True)
+    return results
+
+
+def check_response_parity() -> None:
+    """Both response builders must agree with each other and with the original ``argsort`` top-3, ties included."""
+    from fashion_ml.labels import CLASS_NAMES
+    from fashion_ml.model_loader import build_classification_response, build_classification_responses
+
+    rng = np.random.default_rng(0)
+    rows = [logits_to_probs(rng.normal(size=10).astype(np.float32)) for _ in range(32)]
+    rows.append(np.array([0.3, 0.3, 0.1, 0.1, 0.05, 0.05, 0.04, 0.03, 0.02, 0.01], dtype=np.float32))
+    rows.append(np.array([0.3, 0.3, 0.1, 0.1] + [0.2 / 6] * 6, dtype=np.float32))
+    rows.append(np.full(10, 0.1, dtype=np.float32))
+    probs = np.stack(rows)
+    batch = build_classification_responses(probs, ["azul"] * len(rows), "vision_transformer", "bench.keras")
+    for i, p in enumerate(probs):
+        single = build_classification_response(p, "azul", "vision_transformer", "bench.keras")
+        if single != batch[i]:
+            raise AssertionError(f"row {i}: single and batch response builders disagree")
+        expected = [CLASS_NAMES[j] for j in np.argsort(p)[-3:][::-1]]
+        got = [entry["clase_nombre"] for entry in single["top3"]]
+        if single["clase"] != int(np.argmax(p)) or got != expected:
+            raise AssertionError(f"row {i}: top3 {got} != original ranking {expected}")
+
+
+def bench_response(repeat: int) -> list[dict]:
+    from fashion_ml.model_loader import build_classification_response
+
+    check_response_parity()
+    rng = np.random.default_rng(0)
+    logits = rng.normal(size=10).astype(np.float32)
+    probs = logits_to_probs(logits)
+    return [
+        {"name": "logits_to_probs", **time_call(lambda: logits_to_probs(logits), repeat * 20)},
+        {
+            "name": "build_classification_response",
+            **time_call(
+                lambda: build_classification_response(probs, "azul", "vision_transformer", "bench.keras"),
+                repeat * 20,
+            ),
+        },
+    ]
+
+
+def bench_predict(repeat: int, batch_sizes=(1, 8)) -> list[dict]:
+    try:
+        model = tiny_keras_model()
+    except Exception as e:
+        print(f"[bench] predict_vit skipped: {e}", flush=True)
+        return [{"name": "predict_vit", "skipped": str(e)}]
+
+    from fashion_ml.backends import KerasBackend
+    from fashion_ml.model_loader import MLModels
+
+    m = MLModels()
+    m.vit = model
+    m.use_backend(KerasBackend(model, IMG_SIZE))
+    image = synthetic_image(640, 480, seed=1)
+    results = [
+        {
+            "name": "predict_vit",
+            "batching": BATCHING_ENABLED,
+            "model": "stand-in",
+            **time_call(lambda: m.predict_vit(image), repeat, warmup=3),
+        }
+    ]
+    for n in batch_sizes:
+        batch = np.concatenate([preprocess_image(image, normalize=False)] * n, axis=0)
+        results.append(
+            {
+                "name": "predict_vit_batch",
+                "batch_size": n,
+                "model": "stand-in",
+                **time_call(lambda: m.predict_vit_batch(batch), repeat, warmup=3),
+            }
+        )
+    return results
+
+
+def _key(entry: dict) -> str:
+    parts = [entry["name"]]
+    for k in ("size", "format", "alpha", "batch_size"):
+        if k in entry:
+            parts.append(f"{k}={entry[k]}")
+    return " ".join(parts)
+
+
+def _git_commit() -> str | None:
+    try:
+        out = subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"],
+            capture_output=True,
+            text=True,
+            timeout=5,
+            cwd=str(Path(__file__).resolve().parent),
+        )
+        return out.stdout.strip() or None
+    except Exception:
+        return None
+
+
+def environment() -> dict:
+    import PIL
+
+    return {
+        "commit": _git_commit(),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "cpu_count": os.cpu_count(),
+        "numpy": np.__version__,
+        "pillow": PIL.__version__,
+        "color_mode": COLOR_MODE,
+        "batching": BATCHING_ENABLED,
+        "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S%z"),
+    }
+
+
+def compare(current: dict, baseline: dict) -> list[tuple[str, float, float, float]]:
+    """``(benchmark, baseline_ms, current_ms, ratio)`` for benchmarks present in both reports."""
+    base = {_key(e): e for e in baseline.get("results", []) if "median_ms" in e}
+    rows = []
+    for e in current["results"]:
+        b = base.get(_key(e))
+        if b is None or "median_ms" not in e or not b["median_ms"]:
+            continue
+        rows.append((_key(e), b["median_ms"], e["median_ms"], e["median_ms"] / b["median_ms"]))
+    return rows
+
+
+def main(argv: list[str] | None = None) -> int:
+    parser = argparse.ArgumentParser(description="Offline microbenchmarks for image_ops / model_loader.")
+    parser.add_argument("--out", type=Path, default=None, help="write the JSON report here (default: stdout)")
+    parser.add_argument("--repeat", type=int, default=10)
+    parser.add_argument("--quick", action="store_true", help="skip 12 MP images and use fewer repeats")
+    parser.add_argument("--skip-predict", action="store_true", help="do not build the stand-in Keras model")
+    parser.add_argument("--compare", type=Path, default=None, help="baseline JSON report to compare medians with")
+    parser.add_argument(
+        "--fail-above", type=float, default=None, help="exit 1 when any median is this many times the baseline"
+    )
+    args = parser.parse_args(argv)
+
+    repeat = max(2, args.repeat // 2 if args.quick else args.repeat)
+    results = bench_image_ops(QUICK_SIZES if args.quick else SIZES, repeat)
+    results += bench_response(repeat)
+    if not args.skip_predict:
+        results += bench_predict(repeat)
+    report = {"environment": environment(), "results": results}
+
+    text = json.dumps(report, indent=2)
+    if args.out:
+        args.out.write_text(text, encoding="utf-8")
+        print(f"[bench] wrote {args.out}", flush=True)
+    else:
+        print(text)
+
+    if args.compare:
+        rows = compare(report, json.loads(args.compare.read_text(encoding="utf-8")))
+        worst = 0.0
+        for key, before, after, ratio in rows:
+            worst = max(worst, ratio)
+            print(f"{ratio:6.2f}x  {before:10.3f} -> {after:10.3f} ms  {key}")
+        if args.fail_above is not None and worst > args.fail_above:
+            print(f"[bench] regression: worst ratio {worst:.2f}x > {args.fail_above}", flush=True)
+            return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
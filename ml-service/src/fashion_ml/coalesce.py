@@ -0,0 +1,130 @@
+"""Single-flight coalescing of identical concurrent classify requests.
+
+The Mirror page and upload retries often send the same image several times within a second.
+Requests are keyed like the result cache (upload SHA-256 + model identity + color mode); while
+one is in flight, later copies wait for its result instead of queueing their own decode, color
+detection and forward pass. Waiters get the leader's body (shared, treat it as read-only) or
+its exception. Only ordinary exceptions are shared: if the leader is cancelled or interrupted
+(``CancelledError``, ``KeyboardInterrupt``), its waiters retry and one of them leads. Sync
+callers (threaded Flask) block on a ``concurrent.futures.Future``; async callers await the
+same future through ``asyncio.wrap_future``, so both kinds share one table.
+"""
+
+from __future__ import annotations
+
+import asyncio
+import threading
+from concurrent.futures import Future
+from typing import Any, Awaitable, Callable
+
+from fashion_ml.config import COALESCE_ENABLED
+from fashion_ml.telemetry import coalesced_total
+
+# Set on the shared future when the leader died of a non-``Exception``: waiters rejoin the key.
+_RETRY = object()
+
+
+class SingleFlight:
+    """``key -> Future`` of the call currently running for that key."""
+
+    def __init__(self, enabled: bool = COALESCE_ENABLED) -> None:
+        self.enabled = enabled
+        self._lock = threading.Lock()
+        self._calls: dict[str, Future] = {}
+        self.leaders = 0
+        self.coalesced = 0
+        self.coalesced_errors = 0
+
+    def _join(self, key: str) -> tuple[Future, bool]:
+        """The in-flight future for ``key`` and whether the caller leads (must run the call)."""
+        with self._lock:
+            fut = self._calls.get(key)
+            if fut is not None:
+                self.coalesced += 1
+                return fut, False
+            fut = self._calls[key] = Future()
+            self.leaders += 1
+            return fut, True
+
+    def _finish(self, key: str, fut: Future, result: Any = None, error: BaseException | None = None) -> None:
+        with self._lock:
+            self._calls.pop(key, None)
+        if error is not None:
+            fut.set_exception(error)
+        else:
+            fut.set_result(result)
+
+    def _waited(self, fut: Future) -> None:
+        if fut.exception() is None and fut.result() is _RETRY:
+            return
+        failed = fut.exception() is not None
+        coalesced_total.inc("error" if failed else "ok")
+        if failed:
+            with self._lock:
+                self.coalesced_errors += 1
+
+    def do(self, key: str | None, fn: Callable[..., Any], *args: Any) -> Any:
+        """``fn(*args)``, unless a call for ``key`` is already running: then its outcome."""
+        if not self.enabled or key is None:
+            return fn(*args)
+        while True:
+            fut, leader = self._join(key)
+            if leader:
+                break
+            try:
+                result = fut.result()
+            finally:
+                self._waited(fut)
+            if result is not _RETRY:
+                return result
+        try:
+            result = fn(*args)
+        except Exception as e:
+            self._finish(key, fut, error=e)
+            raise
+        except BaseException:
+            self._finish(key, fut, _RETRY)
+            raise
+        self._finish(key, fut, result)
+        return result
+
+    async def do_async(self, key: str | None, fn: Callable[..., Awaitable[Any]], *args: Any) -> Any:
+        """``await fn(*args)`` with the same coalescing as ``do`` (and the same table)."""
+        if not self.enabled or key is None:
+            return await fn(*args)
+        while True:
+            fut, leader = self._join(key)
+            if leader:
+                break
+            try:
+                # shield: a waiter that disconnects must not cancel the leader's future
+                result = await asyncio.shield(asyncio.wrap_future(fut))
+            finally:
+                if fut.done():
+                    self._waited(fut)
+            if result is not _RETRY:
+                return result
+        try:
+            result = await fn(*args)
+        except Exception as e:
+            self._finish(key, fut, error=e)
+            raise
+        except BaseException:
+            # cancelled/interrupted: not the waiters' failure, let them retry instead
+            self._finish(key, fut, _RETRY)
+            raise
+        self._finish(key, fut, result)
+        return result
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                "enabled": self.enabled,
+                "in_flight": len(self._calls),
+                "leaders": self.leaders,
+                "coalesced": self.coalesced,
+                "coalesced_errors": self.coalesced_errors,
+            }
+
+
+in_flight = SingleFlight()
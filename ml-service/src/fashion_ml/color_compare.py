@@ -0,0 +1,87 @@
+"""Compare detect_color engines on a local image folder.
+
+Usage (from ml-service/)::
+
+    PYTHONPATH=src python -m fashion_ml.color_compare path/to/images [--json report.json]
+
+Prints per-engine timings, label agreement between "kmeans" and "fast", and the
+disagreeing files so the fast engine can be reviewed before switching ML_COLOR_MODE.
+"""
+
+from __future__ import annotations
+
+import argparse
+import json
+import sys
+import time
+from collections import Counter
+from pathlib import Path
+
+from PIL import Image
+
+from fashion_ml.config import ALLOWED_EXTENSIONS
+from fashion_ml.image_ops import detect_color
+
+ENGINES = ("kmeans", "fast")
+
+
+def _iter_images(folder: Path):
+    for p in sorted(folder.rglob("*")):
+        if p.is_file() and p.suffix.lower().lstrip(".") in ALLOWED_EXTENSIONS:
+            yield p
+
+
+def compare(folder: Path) -> dict:
+    rows = []
+    totals = {e: 0.0 for e in ENGINES}
+    for path in _iter_images(folder):
+        try:
+            with Image.open(path) as im:
+                image = im.convert("RGB")
+        except Exception as e:
+            print(f"skip {path}: {e}", file=sys.stderr)
+            continue
+        row = {"file": str(path.relative_to(folder))}
+        for engine in ENGINES:
+            t0 = time.perf_counter()
+            row[engine] = detect_color(image, mode=engine)
+            dt = time.perf_counter() - t0
+            totals[engine] += dt
+            row[f"{engine}_ms"] = round(dt * 1000.0, 3)
+        rows.append(row)
+
+    n = len(rows)
+    agree = sum(1 for r in rows if r["kmeans"] == r["fast"])
+    return {
+        "images": n,
+        "agreement": (agree / n) if n else None,
+        "mean_ms": {e: (totals[e] * 1000.0 / n) if n else None for e in ENGINES},
+        "confusions": Counter(f"{r['kmeans']} -> {r['fast']}" for r in rows if r["kmeans"] != r["fast"]).most_common(),
+        "disagreements": [r for r in rows if r["kmeans"] != r["fast"]],
+    }
+
+
+def main(argv: list[str] | None = None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("folder", type=Path)
+    parser.add_argument("--json", type=Path, default=None, help="write the full report here")
+    args = parser.parse_args(argv)
+
+    if not args.folder.is_dir():
+        parser.error(f"not a directory: {args.folder}")
+    report = compare(args.folder)
+    if args.json:
+        args.json.write_text(json.dumps(report, indent=2, ensure_ascii=False), encoding="utf-8")
+
+    print(f"images: {report['images']}")
+    if report["images"]:
+        print(f"agreement: {report['agreement']:.1%}")
+        for engine, ms in report["mean_ms"].items():
+            print(f"{engine:>7}: {ms:.2f} ms/image")
+        for pair, count in report["confusions"][:15]:
+            print(f"  {count:4d}  {pair}")
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
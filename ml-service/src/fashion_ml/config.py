@@ -5,6 +5,14 @@ from __future__ import annotations
 import os
 from pathlib import Path
 
+
+def _env_flag(name: str, default: bool) -> bool:
+    raw = os.environ.get(name, "").strip().lower()
+    if not raw:
+        return default
+    return raw not in ("0", "false", "no", "off")
+
+
 # ml-service/ root (parent of src/). Override when the package is vendored (e.g. HF Space Docker).
 _default_root = Path(__file__).resolve().parent.parent.parent
 _env_root = os.environ.get("FASHION_ML_ROOT", "").strip()
@@ -19,9 +27,97 @@ DEFAULT_VIT_FILENAME = "best_model_17_marzo.keras"
 
 # Max upload body (align with backend multer 10MB)
 MAX_UPLOAD_BYTES = int(os.environ.get("ML_MAX_UPLOAD_MB", "12")) * 1024 * 1024
+# Decompression-bomb guard: uploads whose header declares more pixels are rejected before decode
+MAX_IMAGE_PIXELS = int(float(os.environ.get("ML_MAX_IMAGE_MPIX", "50")) * 1_000_000)
+
+# POST /classify-batch: file count and total body cap (a multiple of the single-upload cap)
+MAX_BATCH_FILES = max(1, int(os.environ.get("ML_MAX_BATCH_FILES", "32")))
+MAX_BATCH_UPLOAD_BYTES = MAX_UPLOAD_BYTES * max(1, int(os.environ.get("ML_BATCH_UPLOAD_FACTOR", "4")))
+BATCH_DECODE_WORKERS = max(1, int(os.environ.get("ML_BATCH_DECODE_WORKERS", str(min(4, os.cpu_count() or 1)))))
 
 IMG_SIZE = 224
 
+# Classification result cache keyed by upload bytes + model file identity (ML_RESULT_CACHE_SIZE=0 disables).
+# ML_RESULT_CACHE_DIR adds an on-disk tier shared by worker processes on the same host.
+RESULT_CACHE_SIZE = max(0, int(os.environ.get("ML_RESULT_CACHE_SIZE", "512")))
+RESULT_CACHE_TTL_S = max(0.0, float(os.environ.get("ML_RESULT_CACHE_TTL_S", "3600")))
+RESULT_CACHE_DIR = os.environ.get("ML_RESULT_CACHE_DIR", "").strip()
+RESULT_CACHE_DISK_MAX_BYTES = int(float(os.environ.get("ML_RESULT_CACHE_DISK_MAX_MB", "64")) * 1024 * 1024)
+
+# Single-flight: identical uploads (same key as the result cache) arriving while one is being classified wait
+# for its result instead of running decode + inference again (ML_COALESCE=0 disables).
+COALESCE_ENABLED = _env_flag("ML_COALESCE", True)
+
+# Near-duplicate lookup by 64-bit dHash before inference (opt-in: ML_PHASH_INDEX=1)
+PHASH_INDEX_ENABLED = _env_flag("ML_PHASH_INDEX", False)
+PHASH_MAX_DISTANCE = max(0, int(os.environ.get("ML_PHASH_MAX_DISTANCE", "4")))
+PHASH_INDEX_SIZE = max(1, int(os.environ.get("ML_PHASH_INDEX_SIZE", "4096")))
+PHASH_MAX_COLOR_DELTA = max(0, int(os.environ.get("ML_PHASH_MAX_COLOR_DELTA", "24")))
+
+# detect_color engine: "kmeans" (legacy 400px + sklearn KMeans) or "fast" (vectorized palette binning)
+COLOR_MODE = os.environ.get("ML_COLOR_MODE", "kmeans").strip().lower() or "kmeans"
+COLOR_FAST_SIZE = max(32, int(os.environ.get("ML_COLOR_FAST_SIZE", "96")))
+
+# Dynamic micro-batching in front of the ViT forward pass (ML_BATCHING=0 disables). A request that finds the
+# queue empty runs at once; ML_BATCH_MAX_WAIT_MS only applies while other requests are already waiting.
+BATCHING_ENABLED = _env_flag("ML_BATCHING", True)
+BATCH_MAX_SIZE = max(1, int(os.environ.get("ML_BATCH_MAX_SIZE", "8")))
+BATCH_MAX_WAIT_MS = max(0.0, float(os.environ.get("ML_BATCH_MAX_WAIT_MS", "10")))
+
+# Inference backend: "keras" (.keras via TensorFlow), "tflite" or "onnx" (exports next to the .keras file,
+# built with `python -m fashion_ml.export`). Falls back to keras when the export is missing.
+INFERENCE_BACKEND = os.environ.get("ML_INFERENCE_BACKEND", "keras").strip().lower() or "keras"
+
+# Quantized ViT (TFLite): "none", "int8" (dynamic-range) or "float16" weights. Only enabled when the
+# validation report from `python -m fashion_ml.quantize` shows top-1 agreement >= ML_QUANT_MIN_AGREEMENT.
+VIT_QUANTIZATION = os.environ.get("ML_VIT_QUANTIZATION", "none").strip().lower() or "none"
+QUANT_MIN_AGREEMENT = float(os.environ.get("ML_QUANT_MIN_AGREEMENT", "0.98"))
+# Optional: image folder used to build + validate the quantized model at load time when it is missing.
+QUANT_CALIBRATION_DIR = os.environ.get("ML_QUANT_CALIBRATION_DIR", "").strip()
+
+# Model replica pool: N independent replicas checked out per forward pass instead of one global lock.
+# Each replica gets ML_VIT_THREADS_PER_REPLICA intra-op threads (default: cores / replicas).
+VIT_REPLICAS = max(1, int(os.environ.get("ML_VIT_REPLICAS", "1")))
+VIT_THREADS_PER_REPLICA = max(
+    1, int(os.environ.get("ML_VIT_THREADS_PER_REPLICA", "0") or 0) or (os.cpu_count() or 1) // VIT_REPLICAS
+)
+
+# Async apps (FastAPI / HF Space): bounded pools for image work (decode, color, preprocessing) and model
+# work (forward pass). With micro-batching the model pool needs several threads per replica so concurrent
+# requests can coalesce. ML_EXECUTOR_MAX_PENDING > 0 answers 503 once that many requests are in flight.
+IMAGE_EXECUTOR_WORKERS = max(1, int(os.environ.get("ML_IMAGE_WORKERS", str(BATCH_DECODE_WORKERS))))
+MODEL_EXECUTOR_WORKERS = max(
+    1, int(os.environ.get("ML_MODEL_WORKERS", str(VIT_REPLICAS * (BATCH_MAX_SIZE if BATCHING_ENABLED else 1))))
+)
+EXECUTOR_MAX_PENDING = max(0, int(os.environ.get("ML_EXECUTOR_MAX_PENDING", "0")))
+
+# Load-testing only: ML_STUB_MODEL_MS=<ms> serves a stub backend (deterministic logits, fixed forward
+# latency, no TensorFlow, no weights download) instead of the ViT. Unset in production.
+_stub_ms = os.environ.get("ML_STUB_MODEL_MS", "").strip()
+STUB_MODEL_LATENCY_MS = max(0.0, float(_stub_ms)) if _stub_ms else None
+
+# Opt-in per-request profiling: with ML_PROFILING=1, classify requests sent with "X-Profile: 1" run under
+# cProfile (decode / color / preprocessing) and a TensorFlow profiler trace (forward pass). Runs are written
+# to ML_PROFILE_DIR; the oldest are deleted beyond ML_PROFILE_MAX_RUNS runs or ML_PROFILE_MAX_MB on disk.
+PROFILING_ENABLED = _env_flag("ML_PROFILING", False)
+PROFILE_DIR = Path(os.environ.get("ML_PROFILE_DIR", "").strip() or ML_SERVICE_ROOT / "temp" / "profiles")
+PROFILE_MAX_RUNS = max(1, int(os.environ.get("ML_PROFILE_MAX_RUNS", "20")))
+PROFILE_MAX_BYTES = int(float(os.environ.get("ML_PROFILE_MAX_MB", "256")) * 1024 * 1024)
+
+# Record the load_model variant that worked (and the custom objects the .keras references) in
+# <model>.load.json so later boots skip the keras-hub sweep and failed attempts (ML_LOAD_MANIFEST=0 disables).
+LOAD_MANIFEST_ENABLED = _env_flag("ML_LOAD_MANIFEST", True)
+
+# Metrics JSON / confusion-matrix PNGs are kept in memory and revalidated by ETag; browsers and the
+# backend proxy may reuse a copy for ML_ARTIFACT_MAX_AGE_S seconds before asking again (If-None-Match -> 304).
+ARTIFACT_MAX_AGE_S = max(0, int(os.environ.get("ML_ARTIFACT_MAX_AGE_S", "300")))
+
+# ViT serving path (keras backend): "keras" (model.predict per call) or "compiled" (traced tf.function per batch size)
+VIT_SERVING = os.environ.get("ML_VIT_SERVING", "keras").strip().lower() or "keras"
+VIT_COMPILED_BATCH_SIZES = tuple(
+    sorted({max(1, int(b)) for b in os.environ.get("ML_VIT_COMPILED_BATCH_SIZES", "1,2,4,8").split(",") if b.strip()})
+) or (1,)
+
 ALLOWED_EXTENSIONS = frozenset(
     {"png", "jpg", "jpeg", "gif", "webp", "heic", "heif", "bmp", "tiff", "tif"}
 )
@@ -40,3 +136,26 @@ def resolve_classification_model_path() -> Path:
 
 # Kept name for imports across Flask/FastAPI/space_app; always points to best_model_17_marzo.keras.
 VIT_MODEL_PATH = resolve_classification_model_path()
+
+# Model download (app.py): pinned SHA-256 of the release asset (checked after download and for an existing
+# file), parallel HTTP Range segments, and a content-addressed cache (<dir>/sha256/<digest>) kept across restarts.
+VIT_SHA256 = os.environ.get("ML_VIT_SHA256", "").strip().lower()
+DOWNLOAD_SEGMENTS = max(1, int(os.environ.get("ML_DOWNLOAD_SEGMENTS", "4")))
+MODEL_CACHE_DIR = Path(os.environ.get("ML_MODEL_CACHE_DIR", "").strip() or VIT_MODEL_PATH.parent / ".cache")
+
+# Model registry: <dir>/<version>.keras plus an ACTIVE file naming the version to serve. A new version is
+# loaded and warmed in the background and swapped in without a restart, via POST /admin/models/activate
+# (X-Admin-Token must equal ML_ADMIN_TOKEN; admin routes are off while it is unset) or, with
+# ML_MODEL_REGISTRY_POLL_S > 0, by editing ACTIVE.
+MODEL_REGISTRY_DIR = Path(os.environ.get("ML_MODEL_REGISTRY_DIR", "").strip() or VIT_MODEL_PATH.parent / "registry")
+MODEL_REGISTRY_POLL_S = max(0.0, float(os.environ.get("ML_MODEL_REGISTRY_POLL_S", "0")))
+ADMIN_TOKEN = os.environ.get("ML_ADMIN_TOKEN", "").strip()
+
+# Embeddings (/embed) and the wardrobe similarity index: L2-normalized penultimate-layer vectors in a float16
+# memmap under ML_EMBED_INDEX_DIR/<model> (unset: in memory only, rebuilt by re-embedding). Search is exact; a
+# user with at least ML_EMBED_IVF_MIN_ITEMS items (0 = never) gets an IVF coarse quantizer probing
+# ML_EMBED_IVF_NPROBE lists. Indexing (/embed with user_id), /index/similar and DELETE /index/items read or change
+# per-user data, so they need the X-Admin-Token header (ML_ADMIN_TOKEN above) and are off while it is unset.
+EMBED_INDEX_DIR = os.environ.get("ML_EMBED_INDEX_DIR", "").strip()
+EMBED_IVF_MIN_ITEMS = max(0, int(os.environ.get("ML_EMBED_IVF_MIN_ITEMS", "4096")))
+EMBED_IVF_NPROBE = max(1, int(os.environ.get("ML_EMBED_IVF_NPROBE", "8")))
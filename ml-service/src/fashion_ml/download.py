@@ -0,0 +1,370 @@
+"""Resumable, parallel, verified model download into a content-addressed cache.
+
+``download_file`` fetches a URL as ``segments`` parallel HTTP Range requests into
+``<dest>.part``. Per-segment progress is kept in ``<dest>.part.json``, so a dropped connection
+(retried in place) or a process restart resumes each segment where it stopped. Servers without
+Range support get one plain streamed GET. The finished file is checked against a pinned
+SHA-256, stored as ``<cache>/sha256/<digest>`` and hard-linked (or copied) to ``dest``; later
+boots restore it from the cache without touching the network.
+
+Try it against a local Range-capable stand-in server (from ml-service/)::
+
+    PYTHONPATH=src python -m fashion_ml.download --serve models/ --port 8765 --drop-after-mb 16
+    PYTHONPATH=src python -m fashion_ml.download http://127.0.0.1:8765/best_model_17_marzo.keras \\
+        /tmp/vit.keras --sha256 <digest> --cache-dir /tmp/model-cache
+"""
+
+from __future__ import annotations
+
+import argparse
+import http.server
+import json
+import os
+import re
+import shutil
+import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+
+import requests
+
+from fashion_ml.checksums import file_sha256
+from fashion_ml.config import DOWNLOAD_SEGMENTS, MODEL_CACHE_DIR
+
+_CHUNK = 1024 * 1024
+_MIN_SEGMENT_BYTES = 8 * _CHUNK
+_PERSIST_EVERY_BYTES = 16 * _CHUNK
+_RETRIES = 5
+
+
+class DownloadError(RuntimeError):
+    """The download could not be completed (the ``.part`` file is kept for resuming)."""
+
+
+class ChecksumMismatch(DownloadError):
+    """Downloaded bytes do not match the pinned SHA-256 (the partial download is discarded)."""
+
+
+def cache_path(digest: str, cache_dir: Path = MODEL_CACHE_DIR) -> Path:
+    return Path(cache_dir) / "sha256" / digest
+
+
+def _link_or_copy(src: Path, dest: Path) -> None:
+    """Atomically make ``dest`` a hard link to ``src`` (a copy across filesystems)."""
+    dest.parent.mkdir(parents=True, exist_ok=True)
+    tmp = dest.with_name(dest.name + ".link")
+    tmp.unlink(missing_ok=True)
+    try:
+        os.link(src, tmp)
+    except OSError:
+        shutil.copyfile(src, tmp)
+    os.replace(tmp, dest)
+
+
+def restore_from_cache(digest: str, dest: Path, cache_dir: Path = MODEL_CACHE_DIR) -> bool:
+    """Materialize ``dest`` from the cache entry for ``digest``; False when it is not cached."""
+    cached = cache_path(digest, cache_dir)
+    if not cached.is_file():
+        return False
+    _link_or_copy(cached, Path(dest))
+    return True
+
+
+def verify_file(path: Path, digest: str, cache_dir: Path = MODEL_CACHE_DIR) -> bool:
+    """True when ``path`` has SHA-256 ``digest``; verified files are added to the cache.
+
+    A file that is already the cache entry (same inode) is trusted without re-hashing.
+    """
+    path = Path(path)
+    cached = cache_path(digest, cache_dir)
+    try:
+        if cached.is_file() and os.path.samefile(cached, path):
+            return True
+    except OSError:
+        pass
+    if file_sha256(path) != digest:
+        return False
+    try:
+        if not cached.is_file():
+            _link_or_copy(path, cached)
+    except OSError as e:
+        print(f"[model] could not add {path.name} to the model cache: {e}", flush=True)
+    return True
+
+
+def _probe(session: requests.Session, url: str, headers: dict) -> tuple[int | None, bool, str | None]:
+    """``(size, supports_ranges, validator)`` from a one-byte Range GET (redirects followed)."""
+    with session.get(url, headers={**headers, "Range": "bytes=0-0"}, stream=True, timeout=60) as r:
+        r.raise_for_status()
+        validator = r.headers.get("ETag") or r.headers.get("Last-Modified")
+        if r.status_code == 206:
+            total = r.headers.get("Content-Range", "").rpartition("/")[2]
+            if total.isdigit():
+                return int(total), True, validator
+        length = r.headers.get("Content-Length")
+        return (int(length) if length and r.status_code == 200 else None), False, validator
+
+
+class _SegmentedDownload:
+    """State of one Range download: the preallocated ``.part`` file plus its progress sidecar."""
+
+    def __init__(self, url: str, part: Path, size: int, validator: str | None, segments: int) -> None:
+        self.url = url
+        self.part = part
+        self.state_path = part.with_name(part.name + ".json")
+        self.size = size
+        self.validator = validator
+        self._lock = threading.Lock()
+        self._unsaved = 0
+        self.segments = self._resume_state()
+        if self.segments is None:
+            n = max(1, min(segments, size // _MIN_SEGMENT_BYTES or 1))
+            bounds = [size * i // n for i in range(n + 1)]
+            self.segments = [[bounds[i], bounds[i + 1] - 1, 0] for i in range(n)]
+            with self.part.open("wb") as f:
+                f.truncate(size)
+            self._save()
+        self.resumed_bytes = self.done_bytes()
+
+    def _resume_state(self) -> list[list[int]] | None:
+        try:
+            state = json.loads(self.state_path.read_text(encoding="utf-8"))
+        except (OSError, ValueError):
+            return None
+        same = (state.get("url"), state.get("size"), state.get("validator")) == (self.url, self.size, self.validator)
+        if not same or not self.part.is_file() or self.part.stat().st_size != self.size:
+            return None
+        return [list(seg) for seg in state["segments"]]
+
+    def _save(self) -> None:
+        tmp = self.state_path.with_name(self.state_path.name + ".tmp")
+        state = {"url": self.url, "size": self.size, "validator": self.validator, "segments": self.segments}
+        tmp.write_text(json.dumps(state), encoding="utf-8")
+        os.replace(tmp, self.state_path)
+
+    def done_bytes(self) -> int:
+        with self._lock:
+            return sum(seg[2] for seg in self.segments)
+
+    def _advance(self, seg: list[int], n: int) -> None:
+        with self._lock:
+            seg[2] += n
+            self._unsaved += n
+            if self._unsaved >= _PERSIST_EVERY_BYTES:
+                self._unsaved = 0
+                self._save()
+
+    def fetch(self, session: requests.Session, headers: dict, seg: list[int]) -> None:
+        """Download one segment, resuming from its recorded progress after each failure."""
+        start, end = seg[0], seg[1]
+        last_error: Exception | None = None
+        for attempt in range(_RETRIES):
+            pos = start + seg[2]
+            if pos > end:
+                return
+            try:
+                range_headers = {**headers, "Range": f"bytes={pos}-{end}"}
+                with session.get(self.url, headers=range_headers, stream=True, timeout=60) as r:
+                    r.raise_for_status()
+                    if r.status_code != 206:
+                        raise DownloadError(f"server ignored Range request (HTTP {r.status_code})")
+                    with self.part.open("r+b") as f:
+                        f.seek(pos)
+                        for chunk in r.iter_content(chunk_size=_CHUNK):
+                            chunk = chunk[: end + 1 - pos]
+                            if not chunk:
+                                continue
+                            f.write(chunk)
+                            # flushed to the OS before it is recorded, so a killed process never
+                            # marks bytes done that were still in a user-space buffer
+                            f.flush()
+                            pos += len(chunk)
+                            self._advance(seg, len(chunk))
+                            if pos > end:
+                                return
+                last_error = DownloadError(f"connection closed at byte {pos} of segment {start}-{end}")
+            except requests.RequestException as e:
+                last_error = e
+            time.sleep(min(0.5 * 2**attempt, 8.0))
+        raise DownloadError(f"segment {start}-{end} failed after {_RETRIES} attempts: {last_error}")
+
+    def finish(self) -> None:
+        with self._lock:
+            self._save()
+
+
+def _download_single(session: requests.Session, url: str, headers: dict, part: Path) -> None:
+    with session.get(url, headers=headers, stream=True, timeout=120) as r:
+        r.raise_for_status()
+        with part.open("wb") as f:
+            for chunk in r.iter_content(chunk_size=_CHUNK):
+                if chunk:
+                    f.write(chunk)
+
+
+def download_file(
+    url: str,
+    dest: Path,
+    sha256: str | None = None,
+    headers: dict | None = None,
+    segments: int = DOWNLOAD_SEGMENTS,
+    cache_dir: Path = MODEL_CACHE_DIR,
+    session: requests.Session | None = None,
+) -> str:
+    """Download ``url`` to ``dest`` (resumable, parallel, verified); returns the SHA-256.
+
+    With a pinned ``sha256`` already in the cache nothing is downloaded. Raises
+    ``ChecksumMismatch`` when the bytes do not match the pin, ``DownloadError`` (or a
+    ``requests`` error) when the transfer cannot complete; a resumable ``.part`` is kept.
+    """
+    dest = Path(dest)
+    headers = dict(headers or {})
+    pin = (sha256 or "").strip().lower() or None
+    if pin and restore_from_cache(pin, dest, cache_dir):
+        print(f"[model] restored {dest.name} from cache ({pin[:12]})", flush=True)
+        return pin
+
+    dest.parent.mkdir(parents=True, exist_ok=True)
+    part = dest.with_name(dest.name + ".part")
+    session = session or requests.Session()
+    t0 = time.perf_counter()
+    size, ranges, validator = _probe(session, url, headers)
+    if ranges and size:
+        job = _SegmentedDownload(url, part, size, validator, max(1, segments))
+        if job.resumed_bytes:
+            print(f"[model] resuming download at {job.resumed_bytes}/{size} bytes", flush=True)
+        pending = [seg for seg in job.segments if seg[2] <= seg[1] - seg[0]]
+        try:
+            with ThreadPoolExecutor(max_workers=max(1, len(pending)), thread_name_prefix="download") as pool:
+                for fut in [pool.submit(job.fetch, session, headers, seg) for seg in pending]:
+                    fut.result()
+        finally:
+            job.finish()
+        fetched = size - job.resumed_bytes
+        mode = f"{len(job.segments)} segments"
+    else:
+        _download_single(session, url, headers, part)
+        fetched = part.stat().st_size
+        mode = "single stream (no Range support)"
+    elapsed = time.perf_counter() - t0
+    print(
+        f"[model] downloaded {fetched / (1024 * 1024):.1f} MB in {elapsed:.1f}s "
+        f"({fetched / (1024 * 1024) / max(elapsed, 1e-6):.1f} MB/s, {mode})",
+        flush=True,
+    )
+
+    digest = file_sha256(part)
+    state = part.with_name(part.name + ".json")
+    if pin and digest != pin:
+        part.unlink(missing_ok=True)
+        state.unlink(missing_ok=True)
+        raise ChecksumMismatch(f"SHA-256 mismatch for {url}: expected {pin}, got {digest}")
+    cached = cache_path(digest, cache_dir)
+    try:
+        cached.parent.mkdir(parents=True, exist_ok=True)
+        os.replace(part, cached)
+        _link_or_copy(cached, dest)
+    except OSError:
+        # cache on another filesystem / not writable: keep the file at dest only
+        if part.exists():
+            os.replace(part, dest)
+    state.unlink(missing_ok=True)
+    print(f"[model] sha256={digest}{' (verified)' if pin else ''}", flush=True)
+    return digest
+
+
+class RangeRequestHandler(http.server.SimpleHTTPRequestHandler):
+    """``SimpleHTTPRequestHandler`` plus single ``Range: bytes=a-b`` requests (206 / 416), ETag.
+
+    ``drop_after_bytes`` (class attribute) closes each response early to simulate a flaky link.
+    """
+
+    drop_after_bytes = 0
+
+    def send_head(self):
+        self._range = None
+        path = self.translate_path(self.path)
+        match = re.fullmatch(r"bytes=(\d*)-(\d*)", (self.headers.get("Range") or "").strip())
+        if match is None or not os.path.isfile(path) or match.groups() == ("", ""):
+            return super().send_head()
+        st = os.stat(path)
+        size = st.st_size
+        first, last = match.groups()
+        if first:
+            start, end = int(first), min(int(last), size - 1) if last else size - 1
+        else:
+            start, end = max(0, size - int(last)), size - 1
+        if start >= size or start > end:
+            self.send_error(416, "Requested Range Not Satisfiable")
+            return None
+        f = open(path, "rb")
+        f.seek(start)
+        self._range = (start, end)
+        self.send_response(206)
+        self.send_header("Content-Type", self.guess_type(path))
+        self.send_header("Accept-Ranges", "bytes")
+        self.send_header("Content-Range", f"bytes {start}-{end}/{size}")
+        self.send_header("Content-Length", str(end - start + 1))
+        self.send_header("ETag", f'"{st.st_mtime_ns:x}-{size:x}"')
+        self.end_headers()
+        return f
+
+    def copyfile(self, source, outputfile):
+        remaining = None if self._range is None else self._range[1] - self._range[0] + 1
+        budget = self.drop_after_bytes or None
+        while remaining is None or remaining > 0:
+            n = 64 * 1024 if remaining is None else min(64 * 1024, remaining)
+            if budget is not None:
+                if budget <= 0:
+                    self.close_connection = True
+                    return
+                n = min(n, budget)
+                budget -= n
+            buf = source.read(n)
+            if not buf:
+                return
+            outputfile.write(buf)
+            if remaining is not None:
+                remaining -= len(buf)
+
+
+def serve(directory: Path, port: int, drop_after_bytes: int = 0) -> None:
+    handler = type("Handler", (RangeRequestHandler,), {"drop_after_bytes": drop_after_bytes})
+
+    def factory(*args, **kwargs):
+        return handler(*args, directory=str(directory), **kwargs)
+
+    with http.server.ThreadingHTTPServer(("127.0.0.1", port), factory) as httpd:
+        print(f"[download] serving {directory} on http://127.0.0.1:{port}/ (Range enabled)", flush=True)
+        httpd.serve_forever()
+
+
+def main(argv: list[str] | None = None) -> int:
+    parser = argparse.ArgumentParser(description="Resumable, parallel, SHA-256-verified model download.")
+    parser.add_argument("url", nargs="?", help="file to download")
+    parser.add_argument("dest", nargs="?", type=Path, help="local path to write")
+    parser.add_argument("--sha256", default=None, help="pinned digest; mismatches are rejected")
+    parser.add_argument("--segments", type=int, default=DOWNLOAD_SEGMENTS, help="parallel Range requests")
+    parser.add_argument("--cache-dir", type=Path, default=MODEL_CACHE_DIR)
+    parser.add_argument("--serve", type=Path, default=None, help="serve this directory with Range support instead")
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--drop-after-mb", type=float, default=0.0, help="(--serve) cut each response after N MB")
+    args = parser.parse_args(argv)
+
+    if args.serve is not None:
+        serve(args.serve, args.port, int(args.drop_after_mb * 1024 * 1024))
+        return 0
+    if not args.url or args.dest is None:
+        parser.error("url and dest are required (or --serve DIR)")
+    try:
+        download_file(args.url, args.dest, args.sha256, segments=args.segments, cache_dir=args.cache_dir)
+    except DownloadError as e:
+        print(f"[download] {e}", flush=True)
+        return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
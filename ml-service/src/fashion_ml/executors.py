@@ -0,0 +1,100 @@
+"""Bounded thread pools that keep image and model work off the asyncio event loop.
+
+``image_executor`` runs CPU-bound Pillow / NumPy work (decode, color, preprocessing);
+``model_executor`` runs the ViT forward pass. Async routes ``await executor.run(fn, ...)``
+so ``/health`` and static routes stay responsive while inference is saturated.
+"""
+
+from __future__ import annotations
+
+import asyncio
+import threading
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import Any, Callable
+
+from fashion_ml.config import EXECUTOR_MAX_PENDING, IMAGE_EXECUTOR_WORKERS, MODEL_EXECUTOR_WORKERS
+
+
+class ExecutorSaturated(RuntimeError):
+    """More than ``max_pending`` requests are already waiting on an executor; apps answer 503."""
+
+
+class BoundedExecutor:
+    """A fixed-size ``ThreadPoolExecutor`` that tracks queued / running tasks.
+
+    ``run`` (request admission) refuses new work with ``ExecutorSaturated`` once
+    ``max_pending`` tasks are in flight (0 = never refuse). ``submit`` is for fan-out inside
+    an already admitted request and is never refused.
+    """
+
+    def __init__(self, name: str, workers: int, max_pending: int = 0) -> None:
+        self.name = name
+        self.workers = max(1, int(workers))
+        self.max_pending = max(0, int(max_pending))
+        self._pool: ThreadPoolExecutor | None = None
+        self._lock = threading.Lock()
+        self._queued = 0
+        self._running = 0
+        self.completed = 0
+        self.rejected = 0
+        self.max_seen_pending = 0
+
+    def _executor(self) -> ThreadPoolExecutor:
+        if self._pool is None:
+            with self._lock:
+                if self._pool is None:
+                    self._pool = ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix=self.name)
+        return self._pool
+
+    def _wrap(self, fn: Callable, args: tuple, kwargs: dict) -> Callable[[], Any]:
+        def task():
+            with self._lock:
+                self._queued -= 1
+                self._running += 1
+            try:
+                return fn(*args, **kwargs)
+            finally:
+                with self._lock:
+                    self._running -= 1
+                    self.completed += 1
+
+        return task
+
+    def _admit(self, check: bool) -> None:
+        with self._lock:
+            pending = self._queued + self._running
+            if check and self.max_pending and pending >= self.max_pending:
+                self.rejected += 1
+                raise ExecutorSaturated(f"{self.name} executor saturated ({pending} pending)")
+            self._queued += 1
+            self.max_seen_pending = max(self.max_seen_pending, pending + 1)
+
+    def submit(self, fn: Callable, *args: Any, **kwargs: Any) -> Future:
+        self._admit(check=False)
+        return self._executor().submit(self._wrap(fn, args, kwargs))
+
+    async def run(self, fn: Callable, *args: Any, **kwargs: Any) -> Any:
+        """Run ``fn`` on this pool from async code, subject to ``max_pending`` admission."""
+        self._admit(check=True)
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(self._executor(), self._wrap(fn, args, kwargs))
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                "workers": self.workers,
+                "max_pending": self.max_pending,
+                "queue_depth": self._queued,
+                "running": self._running,
+                "completed": self.completed,
+                "rejected": self.rejected,
+                "max_seen_pending": self.max_seen_pending,
+            }
+
+
+image_executor = BoundedExecutor("image", IMAGE_EXECUTOR_WORKERS, EXECUTOR_MAX_PENDING)
+model_executor = BoundedExecutor("model", MODEL_EXECUTOR_WORKERS, EXECUTOR_MAX_PENDING)
+
+
+def executor_stats() -> dict:
+    return {"image": image_executor.stats(), "model": model_executor.stats()}
@@ -0,0 +1,155 @@
+"""Export the ViT ``.keras`` model to TFLite / ONNX and check the exports against Keras logits.
+
+Usage (from ml-service/)::
+
+    PYTHONPATH=src python -m fashion_ml.export                      # both formats, default model
+    PYTHONPATH=src python -m fashion_ml.export --formats onnx --tolerance 1e-3 --images data/sample
+
+Exports are written next to the model (``best_model_17_marzo.tflite`` / ``.onnx``) where
+``ML_INFERENCE_BACKEND`` picks them up. Needs the full TensorFlow stack (+ ``tf2onnx`` for ONNX).
+Exit code is non-zero when any export misses the tolerance.
+"""
+
+from __future__ import annotations
+
+import argparse
+import sys
+import tempfile
+from pathlib import Path
+from typing import Any
+
+import numpy as np
+from PIL import Image
+
+from fashion_ml.backends import EXPORT_SUFFIXES, exported_path, load_exported_backend
+from fashion_ml.config import ALLOWED_EXTENSIONS, VIT_MODEL_PATH
+from fashion_ml.image_ops import preprocess_image
+
+DEFAULT_TOLERANCE = 1e-3
+
+
+def load_keras_model(path: Path):
+    """Load through ``MLModels.load_vit`` so export sees exactly what serving loads."""
+    from fashion_ml.model_loader import MLModels
+
+    m = MLModels()
+    m.load_vit(path)
+    if m.vit is None:
+        raise RuntimeError(f"could not load {path}: {m.load_error_vit}")
+    return m.vit, m.vit_input_size
+
+
+def serving_signature(model: Any, input_size: int):
+    import tensorflow as tf
+
+    from fashion_ml.serving import inference_fn
+
+    spec = tf.TensorSpec([None, input_size, input_size, 3], tf.float32, name="image")
+    return tf.function(inference_fn(model), input_signature=[spec], autograph=False), spec
+
+
+def to_tflite(model: Any, input_size: int, out: Path, quantization: str | None = None) -> Path:
+    """``quantization``: None (float32), ``"int8"`` (dynamic-range) or ``"float16"`` weights."""
+    # Goes through a SavedModel written by keras.export.ExportArchive: converting the concrete
+    # function directly leaves Keras 3 variables unfrozen (the .tflite then returns NaN).
+    import keras
+    import tensorflow as tf
+
+    from fashion_ml.serving import inference_fn
+
+    spec = tf.TensorSpec([None, input_size, input_size, 3], tf.float32, name="image")
+    with tempfile.TemporaryDirectory() as tmp:
+        archive = keras.export.ExportArchive()
+        archive.track(model)
+        archive.add_endpoint("serve", inference_fn(model), input_signature=[spec])
+        archive.write_out(tmp, verbose=False)
+        converter = tf.lite.TFLiteConverter.from_saved_model(tmp)
+        converter.target_spec.supported_ops = [tf.lite.OpsSet.TFLITE_BUILTINS, tf.lite.OpsSet.SELECT_TF_OPS]
+        if quantization in ("int8", "float16"):
+            converter.optimizations = [tf.lite.Optimize.DEFAULT]
+            if quantization == "float16":
+                converter.target_spec.supported_types = [tf.float16]
+        out.write_bytes(converter.convert())
+    return out
+
+
+def to_onnx(model: Any, input_size: int, out: Path, opset: int = 17) -> Path:
+    import tf2onnx
+
+    fn, spec = serving_signature(model, input_size)
+    tf2onnx.convert.from_function(fn, input_signature=[spec], opset=opset, output_path=str(out))
+    return out
+
+
+def sample_batch(input_size: int, images: Path | None, count: int) -> np.ndarray:
+    """Preprocessed images from ``images`` (if given), topped up with seeded random pixels."""
+    arrs = []
+    if images is not None:
+        for p in sorted(images.rglob("*")):
+            if len(arrs) >= count:
+                break
+            if p.is_file() and p.suffix.lower().lstrip(".") in ALLOWED_EXTENSIONS:
+                with Image.open(p) as im:
+                    arrs.append(preprocess_image(im.convert("RGB"), target_size=input_size, normalize=False))
+    rng = np.random.default_rng(0)
+    while len(arrs) < count:
+        arrs.append(rng.uniform(0, 255, size=(1, input_size, input_size, 3)).astype(np.float32))
+    return np.concatenate(arrs, axis=0)
+
+
+def compare_logits(reference: np.ndarray, candidate: np.ndarray) -> dict:
+    ref = np.asarray(reference, dtype=np.float64).reshape(reference.shape[0], -1)
+    got = np.asarray(candidate, dtype=np.float64).reshape(ref.shape[0], -1)
+    return {
+        "max_abs_diff": float(np.max(np.abs(ref - got))),
+        "top1_agreement": float(np.mean(np.argmax(ref, axis=1) == np.argmax(got, axis=1))),
+    }
+
+
+def keras_logits(model: Any, batch: np.ndarray) -> np.ndarray:
+    ref = model.predict(batch, verbose=0)
+    return np.asarray(ref[0] if isinstance(ref, (list, tuple)) else ref)
+
+
+def main(argv: list[str] | None = None) -> int:
+    parser = argparse.ArgumentParser(description="Export the ViT model to TFLite / ONNX and verify logits.")
+    parser.add_argument("--model", type=Path, default=VIT_MODEL_PATH)
+    parser.add_argument("--formats", default="tflite,onnx", help="comma-separated: " + ",".join(EXPORT_SUFFIXES))
+    parser.add_argument("--tolerance", type=float, default=DEFAULT_TOLERANCE, help="max abs logit difference")
+    parser.add_argument("--images", type=Path, default=None, help="folder of sample images for the check")
+    parser.add_argument("--samples", type=int, default=8)
+    args = parser.parse_args(argv)
+
+    formats = [f.strip() for f in args.formats.split(",") if f.strip()]
+    unknown = [f for f in formats if f not in EXPORT_SUFFIXES]
+    if unknown:
+        parser.error(f"unknown format(s): {', '.join(unknown)}")
+
+    model, input_size = load_keras_model(args.model)
+    batch = sample_batch(input_size, args.images, args.samples)
+    reference = keras_logits(model, batch)
+
+    ok = True
+    for kind in formats:
+        out = exported_path(args.model, kind)
+        print(f"[export] {kind} -> {out}", flush=True)
+        try:
+            (to_tflite if kind == "tflite" else to_onnx)(model, input_size, out)
+            report = compare_logits(reference, load_exported_backend(kind, out).predict(batch))
+        except Exception as e:
+            print(f"[export] {kind} FAILED: {e}", flush=True)
+            ok = False
+            continue
+        passed = report["max_abs_diff"] <= args.tolerance
+        ok = ok and passed
+        print(
+            f"[export] {kind}: {out.stat().st_size / (1024 * 1024):.1f} MB, "
+            f"max |Δlogit| = {report['max_abs_diff']:.2e}, top-1 agreement = {report['top1_agreement']:.1%} "
+            f"-> {'OK' if passed else 'OVER TOLERANCE'}",
+            flush=True,
+        )
+    return 0 if ok else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,103 @@
+"""NumPy-aware JSON for the app responses: orjson when installed, stdlib ``json`` otherwise.
+
+Either way NumPy scalars and arrays serialize directly (no ``float()`` / ``tolist()`` pass in the
+handlers) and the output is compact UTF-8. ``FlaskJSONProvider`` plugs into ``app.json`` (so
+``jsonify`` uses it) and ``FastJSONResponse`` replaces FastAPI's ``JSONResponse``; returning it
+from a route also skips ``jsonable_encoder``'s walk over the body.
+"""
+
+from __future__ import annotations
+
+import json
+from typing import Any, Callable
+
+import numpy as np
+
+try:
+    import orjson
+except ImportError:  # optional: pip install orjson
+    orjson = None
+
+BACKEND = "orjson" if orjson is not None else "json"
+
+
+def _numpy_default(obj: Any) -> Any:
+    if isinstance(obj, np.ndarray):
+        return obj.tolist()
+    if isinstance(obj, np.generic):
+        return obj.item()
+    raise TypeError(f"Object of type {type(obj).__name__} is not JSON serializable")
+
+
+def dumps(obj: Any, sort_keys: bool = False, default: Callable[[Any], Any] | None = None) -> bytes:
+    """Compact UTF-8 JSON bytes for ``obj`` (dicts, lists, NumPy scalars and arrays).
+
+    ``default`` handles anything else; when given, datetimes and dataclasses are routed to it too
+    (so Flask keeps its own date format) instead of orjson's built-in encoding.
+    """
+
+    def fallback(o: Any) -> Any:
+        if isinstance(o, (np.ndarray, np.generic)) or default is None:
+            return _numpy_default(o)
+        return default(o)
+
+    if orjson is not None:
+        option = orjson.OPT_SERIALIZE_NUMPY | orjson.OPT_NON_STR_KEYS
+        if sort_keys:
+            option |= orjson.OPT_SORT_KEYS
+        if default is not None:
+            option |= orjson.OPT_PASSTHROUGH_DATETIME | orjson.OPT_PASSTHROUGH_DATACLASS
+        try:
+            return orjson.dumps(obj, default=fallback, option=option)
+        except TypeError:
+            pass  # e.g. ints beyond 64 bits or non-contiguous arrays: the stdlib handles those
+    return json.dumps(
+        obj, default=fallback, ensure_ascii=False, separators=(",", ":"), sort_keys=sort_keys
+    ).encode("utf-8")
+
+
+def loads(data: bytes | str) -> Any:
+    return orjson.loads(data) if orjson is not None else json.loads(data)
+
+
+def _flask_json_provider():
+    from flask.json.provider import DefaultJSONProvider
+
+    class FlaskJSONProvider(DefaultJSONProvider):
+        """``jsonify`` through ``dumps``; sorted keys and Flask's encoding of dates, ``Decimal`` ... kept."""
+
+        def dumps(self, obj: Any, **kwargs: Any) -> str:
+            return dumps(obj, sort_keys=kwargs.get("sort_keys", self.sort_keys), default=self.default).decode("utf-8")
+
+        def loads(self, s: str | bytes, **kwargs: Any) -> Any:
+            return loads(s)
+
+        def response(self, *args: Any, **kwargs: Any):
+            obj = self._prepare_response_obj(args, kwargs)
+            body = dumps(obj, sort_keys=self.sort_keys, default=self.default) + b"\n"
+            return self._app.response_class(body, mimetype=self.mimetype)
+
+    return FlaskJSONProvider
+
+
+def _fast_json_response():
+    from starlette.responses import JSONResponse
+
+    class FastJSONResponse(JSONResponse):
+        """``JSONResponse`` rendered through ``dumps``."""
+
+        def render(self, content: Any) -> bytes:
+            return dumps(content)
+
+    return FastJSONResponse
+
+
+_LAZY = {"FlaskJSONProvider": _flask_json_provider, "FastJSONResponse": _fast_json_response}
+
+
+def __getattr__(name: str):
+    # Built on first import so the Flask app never imports Starlette and vice versa.
+    if name in _LAZY:
+        cls = globals()[name] = _LAZY[name]()
+        return cls
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
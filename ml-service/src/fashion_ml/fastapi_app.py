@@ -2,19 +2,45 @@
 
 from __future__ import annotations
 
-import io
+import asyncio
 import os
-from pathlib import Path
 
-from fastapi import FastAPI, File, HTTPException, UploadFile
+from fastapi import FastAPI, File, Form, HTTPException, Request, UploadFile
 from fastapi.middleware.cors import CORSMiddleware
-from PIL import Image
+from fastapi.responses import PlainTextResponse
 
-from fashion_ml.config import MAX_UPLOAD_BYTES, VIT_MODEL_PATH
-from fashion_ml.image_ops import allowed_file, detect_color
-from fashion_ml.model_loader import build_classification_response, models
+from fashion_ml.artifacts import add_artifact_routes
+from fashion_ml.backends import EmbeddingsUnavailable
+from fashion_ml.config import MAX_BATCH_UPLOAD_BYTES, MAX_UPLOAD_BYTES, PROFILING_ENABLED
+from fashion_ml.executors import ExecutorSaturated, image_executor, model_executor
+from fashion_ml.fast_json import FastJSONResponse
+from fashion_ml.image_ops import allowed_file
+from fashion_ml.model_loader import models
+from fashion_ml.pipeline import (
+    BatchTooLarge,
+    ModelNotReady,
+    classify_batch_async,
+    classify_image_async,
+    embed_batch_async,
+    embed_image_async,
+    remove_items,
+    runtime_info,
+    similar_items,
+)
+from fashion_ml.profiling import PROFILE_ID_HEADER, profile_classify, profile_requested
+from fashion_ml.readiness import readiness
+from fashion_ml.registry import ADMIN_TOKEN_HEADER, SwapInProgress, UnknownVersion, admin_authorized, registry
+from fashion_ml.telemetry import PROMETHEUS_CONTENT_TYPE, MetricsMiddleware, render_prometheus
+from fashion_ml.uploads import (
+    MULTIPART_SLACK,
+    SpooledUpload,
+    UnsupportedImage,
+    UploadLimitMiddleware,
+    UploadTooLarge,
+)
+from fashion_ml.vector_index import UnknownItem
 
-app = FastAPI(title="Fashion AI ML", version="1.0.0")
+app = FastAPI(title="Fashion AI ML", version="1.0.0", default_response_class=FastJSONResponse)
 
 ALLOWED_ORIGINS = os.environ.get("CORS_ORIGINS", "*").split(",")
 ALLOWED_ORIGINS = [o.strip() for o in ALLOWED_ORIGINS if o.strip()] or ["*"]
@@ -27,12 +53,28 @@ app.add_middleware(
     allow_methods=["*"],
     allow_headers=["*"],
 )
+app.add_middleware(
+    UploadLimitMiddleware,
+    default_limit=MAX_UPLOAD_BYTES + MULTIPART_SLACK,
+    limits={
+        "/classify-batch": MAX_BATCH_UPLOAD_BYTES + MULTIPART_SLACK,
+        "/embed-batch": MAX_BATCH_UPLOAD_BYTES + MULTIPART_SLACK,
+    },
+)
+app.add_middleware(MetricsMiddleware)
+add_artifact_routes(app)
+
+
+@app.get("/metrics/prom", response_class=PlainTextResponse)
+def prometheus_metrics():
+    """Stage latency histograms and request counters (Prometheus text format)."""
+    return PlainTextResponse(render_prometheus(), media_type=PROMETHEUS_CONTENT_TYPE)
 
 
 @app.get("/health")
 def health():
-    vit_ok = models.vit is not None
-    p = VIT_MODEL_PATH
+    vit_ok = models.is_loaded
+    p = models.model_path
     return {
         "status": "OK",
         "model_loaded": vit_ok,
@@ -41,37 +83,222 @@ def health():
         "vit_model_loaded": vit_ok,
         "vit_model_file_exists": p.is_file(),
         "classes_count": 10,
+        "readiness": readiness.snapshot(),
+        "runtime": runtime_info(),
     }
 
 
+@app.get("/ready")
+def ready():
+    """200 once the model is loaded and warm, 503 (with the startup state) before that."""
+    snapshot = readiness.snapshot()
+    return FastJSONResponse(snapshot, status_code=200 if snapshot["ready"] else 503)
+
+
+@app.get("/admin/models")
+def admin_models(request: Request):
+    """Registry versions, the one being served and the last hot swap."""
+    if not admin_authorized(request.headers.get(ADMIN_TOKEN_HEADER)):
+        raise HTTPException(status_code=403, detail="Forbidden")
+    return registry.status()
+
+
+@app.post("/admin/models/activate")
+async def admin_activate_model(request: Request):
+    """``{"version": ...}``: load + warm it in the background and swap it in (202); ``"wait": true`` blocks."""
+    if not admin_authorized(request.headers.get(ADMIN_TOKEN_HEADER)):
+        raise HTTPException(status_code=403, detail="Forbidden")
+    try:
+        payload = await request.json()
+    except ValueError:
+        payload = {}
+    if not isinstance(payload, dict):
+        payload = {}
+    try:
+        swap = registry.activate(payload.get("version"))
+    except UnknownVersion as e:
+        raise HTTPException(status_code=404, detail=str(e)) from e
+    except SwapInProgress as e:
+        raise HTTPException(status_code=409, detail=str(e)) from e
+    if payload.get("wait"):
+        await asyncio.to_thread(swap.join)
+        status = registry.status()
+        return FastJSONResponse(status, status_code=200 if status["last_swap"]["state"] == "swapped" else 500)
+    return FastJSONResponse(registry.status(), status_code=202)
+
+
 @app.post("/predict")
-async def predict(imagen: UploadFile = File(..., alias="imagen")):
+async def predict(request: Request, imagen: UploadFile = File(..., alias="imagen")):
     """
     ViT classification (same JSON as POST /classify-vit on Flask).
     Multipart field name: imagen
     """
     if not imagen.filename or not allowed_file(imagen.filename):
         raise HTTPException(status_code=400, detail="Invalid or missing image file")
-    raw = await imagen.read()
+    try:
+        raw = SpooledUpload.from_file(imagen.file, imagen.filename)
+    except UploadTooLarge as e:
+        raise HTTPException(status_code=413, detail="File too large") from e
+    if not raw:
+        raise HTTPException(status_code=400, detail="No image provided")
+    try:
+        if PROFILING_ENABLED and profile_requested(request.headers):
+            body, profile_id = await model_executor.run(profile_classify, raw)
+            return FastJSONResponse(body, headers={PROFILE_ID_HEADER: profile_id})
+        return FastJSONResponse(await classify_image_async(raw))
+    except UploadTooLarge as e:
+        raise HTTPException(status_code=413, detail=str(e)) from e
+    except UnsupportedImage as e:
+        raise HTTPException(status_code=400, detail=str(e)) from e
+    except ExecutorSaturated as e:
+        raise HTTPException(status_code=503, detail=str(e)) from e
+    except ModelNotReady as e:
+        raise HTTPException(
+            status_code=503,
+            detail={"error": "Vision Transformer model not available", "model_loaded": False},
+        ) from e
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e)) from e
+
+
+@app.post("/classify-batch")
+async def predict_batch(imagen: list[UploadFile] = File(..., alias="imagen")):
+    """
+    Batch ViT classification: N ``imagen`` parts, one forward pass.
+    Returns a JSON array of /predict bodies; failed items carry ``error`` instead.
+    """
+    items = []
+    total = 0
+    for f in imagen:
+        raw = SpooledUpload.from_file(f.file, f.filename or "", limit=None)
+        total += len(raw)
+        if total > MAX_BATCH_UPLOAD_BYTES:
+            raise HTTPException(status_code=413, detail="Batch too large")
+        items.append((f.filename or "", raw))
+    try:
+        return FastJSONResponse(await classify_batch_async(items))
+    except BatchTooLarge as e:
+        raise HTTPException(status_code=413, detail=str(e)) from e
+    except ExecutorSaturated as e:
+        raise HTTPException(status_code=503, detail=str(e)) from e
+    except ModelNotReady as e:
+        raise HTTPException(
+            status_code=503,
+            detail={"error": "Vision Transformer model not available", "model_loaded": False},
+        ) from e
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e)) from e
+
+
+@app.post("/embed")
+async def embed(
+    request: Request,
+    imagen: UploadFile = File(..., alias="imagen"),
+    user_id: str | None = Form(None),
+    item_id: str | None = Form(None),
+):
+    """L2-normalized ViT embedding of one ``imagen``; ``user_id`` + ``item_id`` (admin token) also index it."""
+    if user_id and not admin_authorized(request.headers.get(ADMIN_TOKEN_HEADER)):
+        raise HTTPException(status_code=403, detail="Forbidden")
+    if not imagen.filename or not allowed_file(imagen.filename):
+        raise HTTPException(status_code=400, detail="Invalid or missing image file")
+    try:
+        raw = SpooledUpload.from_file(imagen.file, imagen.filename)
+    except UploadTooLarge as e:
+        raise HTTPException(status_code=413, detail="File too large") from e
     if not raw:
         raise HTTPException(status_code=400, detail="No image provided")
-    if len(raw) > MAX_UPLOAD_BYTES:
-        raise HTTPException(status_code=413, detail="File too large")
     try:
-        image = Image.open(io.BytesIO(raw))
-        if image.mode != "RGB":
-            image = image.convert("RGB")
-        color = detect_color(image)
-        if models.vit is None:
-            raise HTTPException(
-                status_code=503,
-                detail={"error": "Vision Transformer model not available", "model_loaded": False},
-            )
-        probs, _ = models.predict_vit(image)
-        return build_classification_response(
-            probs, color, "vision_transformer", Path(VIT_MODEL_PATH).name
-        )
-    except HTTPException:
-        raise
+        return FastJSONResponse(await embed_image_async(raw, imagen.filename, user_id, item_id))
+    except UploadTooLarge as e:
+        raise HTTPException(status_code=413, detail=str(e)) from e
+    except (UnsupportedImage, ValueError) as e:
+        raise HTTPException(status_code=400, detail=str(e)) from e
+    except EmbeddingsUnavailable as e:
+        raise HTTPException(status_code=501, detail=str(e)) from e
+    except ExecutorSaturated as e:
+        raise HTTPException(status_code=503, detail=str(e)) from e
+    except ModelNotReady as e:
+        raise HTTPException(
+            status_code=503,
+            detail={"error": "Vision Transformer model not available", "model_loaded": False},
+        ) from e
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e)) from e
+
+
+@app.post("/embed-batch")
+async def embed_batch(
+    request: Request,
+    imagen: list[UploadFile] = File(..., alias="imagen"),
+    user_id: str | None = Form(None),
+    item_id: list[str] | None = Form(None),
+):
+    """N ``imagen`` parts -> JSON array of /embed bodies; ``item_id`` per part (admin token) indexes them."""
+    if user_id and not admin_authorized(request.headers.get(ADMIN_TOKEN_HEADER)):
+        raise HTTPException(status_code=403, detail="Forbidden")
+    items = []
+    total = 0
+    for f in imagen:
+        raw = SpooledUpload.from_file(f.file, f.filename or "", limit=None)
+        total += len(raw)
+        if total > MAX_BATCH_UPLOAD_BYTES:
+            raise HTTPException(status_code=413, detail="Batch too large")
+        items.append((f.filename or "", raw))
+    try:
+        return FastJSONResponse(await embed_batch_async(items, user_id, item_id))
+    except BatchTooLarge as e:
+        raise HTTPException(status_code=413, detail=str(e)) from e
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e)) from e
+    except EmbeddingsUnavailable as e:
+        raise HTTPException(status_code=501, detail=str(e)) from e
+    except ExecutorSaturated as e:
+        raise HTTPException(status_code=503, detail=str(e)) from e
+    except ModelNotReady as e:
+        raise HTTPException(
+            status_code=503,
+            detail={"error": "Vision Transformer model not available", "model_loaded": False},
+        ) from e
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e)) from e
+
+
+async def _json_object(request: Request) -> dict:
+    try:
+        payload = await request.json()
+    except ValueError:
+        payload = None
+    if not isinstance(payload, dict):
+        raise HTTPException(status_code=400, detail="JSON object body required")
+    return payload
+
+
+@app.post("/index/similar")
+async def index_similar(request: Request):
+    """``{"user_id", "item_id" | "embedding", "k"}`` -> the user's closest indexed items (no forward pass)."""
+    if not admin_authorized(request.headers.get(ADMIN_TOKEN_HEADER)):
+        raise HTTPException(status_code=403, detail="Forbidden")
+    payload = await _json_object(request)
+    try:
+        return FastJSONResponse(await image_executor.run(similar_items, payload))
+    except UnknownItem as e:
+        raise HTTPException(status_code=404, detail=str(e)) from e
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e)) from e
+    except ExecutorSaturated as e:
+        raise HTTPException(status_code=503, detail=str(e)) from e
+
+
+@app.delete("/index/items")
+async def index_remove_items(request: Request):
+    """``{"user_id", "item_id"?}``: drop one item, or every item of the user, from the similarity index."""
+    if not admin_authorized(request.headers.get(ADMIN_TOKEN_HEADER)):
+        raise HTTPException(status_code=403, detail="Forbidden")
+    payload = await _json_object(request)
+    try:
+        return FastJSONResponse(await image_executor.run(remove_items, payload))
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e)) from e
+    except ExecutorSaturated as e:
+        raise HTTPException(status_code=503, detail=str(e)) from e
@@ -2,84 +2,140 @@
 
 from __future__ import annotations
 
-import io
-import json
 import os
+import time
 from pathlib import Path
 
-from flask import Flask, jsonify, request, send_file
+from flask import Flask, Response, g, jsonify, request
 from flask_cors import CORS
-from PIL import Image
+from werkzeug.exceptions import RequestEntityTooLarge
 
-from fashion_ml.config import MAX_UPLOAD_BYTES, ML_SERVICE_ROOT, VIT_MODEL_PATH
-from fashion_ml.image_ops import allowed_file, detect_color
-from fashion_ml.model_loader import build_classification_response, models
+from fashion_ml.artifacts import ARTIFACT_ROUTES, artifacts, conditional_response
+from fashion_ml.backends import EmbeddingsUnavailable
+from fashion_ml.config import (
+    MAX_BATCH_UPLOAD_BYTES,
+    MAX_UPLOAD_BYTES,
+    PROFILING_ENABLED,
+)
+from fashion_ml.fast_json import FlaskJSONProvider
+from fashion_ml.image_ops import allowed_file
+from fashion_ml.model_loader import models
+from fashion_ml.pipeline import (
+    BatchTooLarge,
+    ModelNotReady,
+    classify_batch,
+    classify_image,
+    embed_batch,
+    embed_image,
+    remove_items,
+    runtime_info,
+    similar_items,
+)
+from fashion_ml.profiling import PROFILE_ID_HEADER, profile_classify, profile_requested
+from fashion_ml.readiness import readiness
+from fashion_ml.registry import ADMIN_TOKEN_HEADER, SwapInProgress, UnknownVersion, admin_authorized, registry
+from fashion_ml.telemetry import PROMETHEUS_CONTENT_TYPE, record_request, render_prometheus, stage_timer
+from fashion_ml.uploads import MULTIPART_SLACK, SpooledUpload, UnsupportedImage, UploadTooLarge
+from fashion_ml.vector_index import UnknownItem
 
 UPLOAD_FOLDER = "temp"
 os.makedirs(UPLOAD_FOLDER, exist_ok=True)
 
 app = Flask(__name__)
+app.json = FlaskJSONProvider(app)
+# werkzeug stops reading the body past this (also for chunked uploads); per-route caps are checked below
+app.config["MAX_CONTENT_LENGTH"] = MAX_BATCH_UPLOAD_BYTES + MULTIPART_SLACK
 CORS(app)
 
 
-def _send_static_file(filename: str, mimetype: str | None = None):
-    filepath = os.path.join(str(ML_SERVICE_ROOT), filename)
-    if not os.path.exists(filepath):
-        return None
-    return send_file(filepath, mimetype=mimetype, as_attachment=False)
+@app.before_request
+def _start_timer():
+    g.request_started = time.perf_counter()
+
+
+@app.after_request
+def _record_request(response):
+    started = g.get("request_started")
+    if started is not None:
+        rule = request.url_rule.rule if request.url_rule is not None else "other"
+        record_request(rule, response.status_code, time.perf_counter() - started)
+    return response
+
+
+@app.errorhandler(RequestEntityTooLarge)
+def _request_too_large(_e):
+    return jsonify({"error": "File too large"}), 413
+
+
+def _artifact_response(relpath: str):
+    """Model artifact from the in-memory cache, honouring If-None-Match and Accept-Encoding."""
+    artifact = artifacts.get(relpath)
+    if artifact is None:
+        return jsonify({"error": "Not found"}), 404
+    status, body, headers = conditional_response(
+        artifact, request.headers.get("If-None-Match"), request.headers.get("Accept-Encoding")
+    )
+    return Response(body, status=status, headers=headers)
 
 
 @app.route("/", methods=["GET"])
 def root():
-    return jsonify({"message": "Fashion AI ML API", "health": "/health", "classify_vit": "POST /classify-vit"})
+    return jsonify(
+        {
+            "message": "Fashion AI ML API",
+            "health": "/health",
+            "ready": "/ready",
+            "classify_vit": "POST /classify-vit",
+            "classify_batch": "POST /classify-batch",
+        }
+    )
 
 
 @app.route("/confusion-matrix", methods=["GET"])
 def serve_confusion_matrix():
-    r = _send_static_file("confusion_matrix.png", "image/png")
-    return r if r is not None else (jsonify({"error": "Not found"}), 404)
+    return _artifact_response(ARTIFACT_ROUTES["/confusion-matrix"])
 
 
 @app.route("/confusion-matrix-vit", methods=["GET"])
 def serve_confusion_matrix_vit():
-    r = _send_static_file("confusion_matrix_vit.png", "image/png")
-    return r if r is not None else (jsonify({"error": "Not found"}), 404)
+    return _artifact_response(ARTIFACT_ROUTES["/confusion-matrix-vit"])
 
 
 @app.route("/metrics", methods=["GET"])
 def serve_metrics():
-    filepath = os.path.join(str(ML_SERVICE_ROOT), "model_metrics.json")
-    if not os.path.exists(filepath):
-        return jsonify({"error": "Not found"}), 404
-    with open(filepath, "r", encoding="utf-8") as f:
-        return jsonify(json.load(f))
+    return _artifact_response(ARTIFACT_ROUTES["/metrics"])
+
+
+@app.route("/metrics/prom", methods=["GET"])
+def serve_prometheus_metrics():
+    """Stage latency histograms and request counters (Prometheus text format)."""
+    return Response(render_prometheus(), mimetype=PROMETHEUS_CONTENT_TYPE)
 
 
 @app.route("/metrics-vit", methods=["GET"])
 def serve_metrics_vit():
-    filepath = os.path.join(str(ML_SERVICE_ROOT), "model_metrics_vit.json")
-    if not os.path.exists(filepath):
-        return jsonify({"error": "Not found"}), 404
-    with open(filepath, "r", encoding="utf-8") as f:
-        return jsonify(json.load(f))
+    return _artifact_response(ARTIFACT_ROUTES["/metrics-vit"])
+
+
+@app.route("/confusion-matrix-vit-real", methods=["GET"])
+def serve_confusion_matrix_vit_real():
+    return _artifact_response(ARTIFACT_ROUTES["/confusion-matrix-vit-real"])
 
 
 @app.route("/data-audit", methods=["GET"])
 def serve_data_audit():
-    r = _send_static_file("data_audit.png", "image/png")
-    return r if r is not None else (jsonify({"error": "Not found"}), 404)
+    return _artifact_response(ARTIFACT_ROUTES["/data-audit"])
 
 
 @app.route("/training-curves-vit", methods=["GET"])
 def serve_training_curves_vit():
-    r = _send_static_file("training_curves_vit.png", "image/png")
-    return r if r is not None else (jsonify({"error": "Not found"}), 404)
+    return _artifact_response(ARTIFACT_ROUTES["/training-curves-vit"])
 
 
 @app.route("/health", methods=["GET"])
 def health():
-    vit_ok = models.vit is not None
-    vit_path = VIT_MODEL_PATH
+    vit_ok = models.is_loaded
+    vit_path = models.model_path
     return jsonify(
         {
             "status": "OK",
@@ -91,20 +147,70 @@ def health():
             "vit_model_file_exists": vit_path.is_file(),
             "vit_model_path": str(vit_path.resolve()) if vit_path.is_file() else None,
             "classes_count": 10,
+            "readiness": readiness.snapshot(),
+            "runtime": runtime_info(),
         }
     )
 
 
+@app.route("/ready", methods=["GET"])
+def ready():
+    """200 once the model is loaded and warm, 503 (with the startup state) before that."""
+    snapshot = readiness.snapshot()
+    return jsonify(snapshot), 200 if snapshot["ready"] else 503
+
+
+@app.route("/admin/models", methods=["GET"])
+def admin_models():
+    """Registry versions, the one being served and the last hot swap."""
+    if not admin_authorized(request.headers.get(ADMIN_TOKEN_HEADER)):
+        return jsonify({"error": "Forbidden"}), 403
+    return jsonify(registry.status())
+
+
+@app.route("/admin/models/activate", methods=["POST"])
+def admin_activate_model():
+    """``{"version": ...}``: load + warm it in the background and swap it in (202); ``"wait": true`` blocks."""
+    if not admin_authorized(request.headers.get(ADMIN_TOKEN_HEADER)):
+        return jsonify({"error": "Forbidden"}), 403
+    payload = request.get_json(silent=True) or {}
+    try:
+        swap = registry.activate(payload.get("version"))
+    except UnknownVersion as e:
+        return jsonify({"error": str(e)}), 404
+    except SwapInProgress as e:
+        return jsonify({"error": str(e)}), 409
+    if payload.get("wait"):
+        swap.join()
+        status = registry.status()
+        return jsonify(status), 200 if status["last_swap"]["state"] == "swapped" else 500
+    return jsonify(registry.status()), 202
+
+
 def _validate_upload():
-    if "imagen" not in request.files:
+    """Reject on Content-Length before parsing; the file part stays in werkzeug's spooled file."""
+    if request.content_length is not None and request.content_length > MAX_UPLOAD_BYTES + MULTIPART_SLACK:
+        return None, (jsonify({"error": "File too large"}), 413)
+    with stage_timer("upload_read"):
+        files = request.files
+    if "imagen" not in files:
         return None, (jsonify({"error": "No image provided"}), 400)
-    file = request.files["imagen"]
+    file = files["imagen"]
     if file.filename == "" or not allowed_file(file.filename):
         return None, (jsonify({"error": "Invalid file"}), 400)
-    raw = file.read()
-    if len(raw) > MAX_UPLOAD_BYTES:
+    try:
+        return SpooledUpload.from_file(file.stream, file.filename), None
+    except UploadTooLarge:
         return None, (jsonify({"error": "File too large"}), 413)
-    return raw, None
+
+
+def _classify_response(raw: SpooledUpload):
+    if PROFILING_ENABLED and profile_requested(request.headers):
+        body, profile_id = profile_classify(raw)
+        response = jsonify(body)
+        response.headers[PROFILE_ID_HEADER] = profile_id
+        return response
+    return jsonify(classify_image(raw))
 
 
 @app.route("/classify", methods=["POST"])
@@ -114,17 +220,13 @@ def classify():
         raw, err = _validate_upload()
         if err:
             return err
-        image = Image.open(io.BytesIO(raw))
-        if image.mode != "RGB":
-            image = image.convert("RGB")
-        color = detect_color(image)
-        if models.vit is None:
-            return jsonify({"error": "Vision Transformer model not available", "model_loaded": False}), 503
-        probs, _ = models.predict_vit(image)
-        body = build_classification_response(
-            probs, color, "vision_transformer", Path(VIT_MODEL_PATH).name
-        )
-        return jsonify(body)
+        return _classify_response(raw)
+    except UploadTooLarge as e:
+        return jsonify({"error": str(e)}), 413
+    except UnsupportedImage as e:
+        return jsonify({"error": str(e)}), 400
+    except ModelNotReady:
+        return jsonify({"error": "Vision Transformer model not available", "model_loaded": False}), 503
     except Exception as e:
         return jsonify({"error": f"Error processing image: {str(e)}"}), 500
 
@@ -135,16 +237,111 @@ def classify_vit():
         raw, err = _validate_upload()
         if err:
             return err
-        image = Image.open(io.BytesIO(raw))
-        if image.mode != "RGB":
-            image = image.convert("RGB")
-        color = detect_color(image)
-        if models.vit is None:
-            return jsonify({"error": "Vision Transformer model not available", "model_loaded": False}), 503
-        probs, _ = models.predict_vit(image)
-        body = build_classification_response(
-            probs, color, "vision_transformer", Path(VIT_MODEL_PATH).name
-        )
-        return jsonify(body)
+        return _classify_response(raw)
+    except UploadTooLarge as e:
+        return jsonify({"error": str(e)}), 413
+    except UnsupportedImage as e:
+        return jsonify({"error": str(e)}), 400
+    except ModelNotReady:
+        return jsonify({"error": "Vision Transformer model not available", "model_loaded": False}), 503
     except Exception as e:
         return jsonify({"error": f"Error processing image: {str(e)}"}), 500
+
+
+@app.route("/classify-batch", methods=["POST"])
+def classify_batch_route():
+    """N ``imagen`` parts -> JSON array of /classify-vit bodies (per-item ``error`` on failure)."""
+    if request.content_length is not None and request.content_length > MAX_BATCH_UPLOAD_BYTES + MULTIPART_SLACK:
+        return jsonify({"error": "Batch too large"}), 413
+    with stage_timer("upload_read"):
+        files = request.files.getlist("imagen")
+    if not files:
+        return jsonify({"error": "No image provided"}), 400
+    try:
+        items = [(f.filename or "", SpooledUpload.from_file(f.stream, f.filename or "", limit=None)) for f in files]
+        return jsonify(classify_batch(items))
+    except BatchTooLarge as e:
+        return jsonify({"error": str(e)}), 413
+    except ModelNotReady:
+        return jsonify({"error": "Vision Transformer model not available", "model_loaded": False}), 503
+    except Exception as e:
+        return jsonify({"error": f"Error processing images: {str(e)}"}), 500
+
+
+@app.route("/embed", methods=["POST"])
+def embed():
+    """One ``imagen`` part -> L2-normalized ViT embedding; form ``user_id`` + ``item_id`` (admin token) also index it."""
+    try:
+        raw, err = _validate_upload()
+        if err:
+            return err
+        form = request.form
+        if form.get("user_id") and not admin_authorized(request.headers.get(ADMIN_TOKEN_HEADER)):
+            return jsonify({"error": "Forbidden"}), 403
+        return jsonify(embed_image(raw, request.files["imagen"].filename, form.get("user_id"), form.get("item_id")))
+    except UploadTooLarge as e:
+        return jsonify({"error": str(e)}), 413
+    except (UnsupportedImage, ValueError) as e:
+        return jsonify({"error": str(e)}), 400
+    except EmbeddingsUnavailable as e:
+        return jsonify({"error": str(e)}), 501
+    except ModelNotReady:
+        return jsonify({"error": "Vision Transformer model not available", "model_loaded": False}), 503
+    except Exception as e:
+        return jsonify({"error": f"Error processing image: {str(e)}"}), 500
+
+
+@app.route("/embed-batch", methods=["POST"])
+def embed_batch_route():
+    """N ``imagen`` parts -> JSON array of /embed bodies; ``item_id`` per part (admin token) indexes them."""
+    if request.content_length is not None and request.content_length > MAX_BATCH_UPLOAD_BYTES + MULTIPART_SLACK:
+        return jsonify({"error": "Batch too large"}), 413
+    with stage_timer("upload_read"):
+        files = request.files.getlist("imagen")
+    if not files:
+        return jsonify({"error": "No image provided"}), 400
+    if request.form.get("user_id") and not admin_authorized(request.headers.get(ADMIN_TOKEN_HEADER)):
+        return jsonify({"error": "Forbidden"}), 403
+    try:
+        items = [(f.filename or "", SpooledUpload.from_file(f.stream, f.filename or "", limit=None)) for f in files]
+        return jsonify(embed_batch(items, request.form.get("user_id"), request.form.getlist("item_id")))
+    except BatchTooLarge as e:
+        return jsonify({"error": str(e)}), 413
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+    except EmbeddingsUnavailable as e:
+        return jsonify({"error": str(e)}), 501
+    except ModelNotReady:
+        return jsonify({"error": "Vision Transformer model not available", "model_loaded": False}), 503
+    except Exception as e:
+        return jsonify({"error": f"Error processing images: {str(e)}"}), 500
+
+
+@app.route("/index/similar", methods=["POST"])
+def index_similar():
+    """``{"user_id", "item_id" | "embedding", "k"}`` -> the user's closest indexed items (no forward pass)."""
+    if not admin_authorized(request.headers.get(ADMIN_TOKEN_HEADER)):
+        return jsonify({"error": "Forbidden"}), 403
+    payload = request.get_json(silent=True)
+    if not isinstance(payload, dict):
+        return jsonify({"error": "JSON object body required"}), 400
+    try:
+        return jsonify(similar_items(payload))
+    except UnknownItem as e:
+        return jsonify({"error": str(e)}), 404
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+
+
+@app.route("/index/items", methods=["DELETE"])
+def index_remove_items():
+    """``{"user_id", "item_id"?}``: drop one item, or every item of the user, from the similarity index."""
+    if not admin_authorized(request.headers.get(ADMIN_TOKEN_HEADER)):
+        return jsonify({"error": "Forbidden"}), 403
+    payload = request.get_json(silent=True)
+    if not isinstance(payload, dict):
+        return jsonify({"error": "JSON object body required"}), 400
+    try:
+        return jsonify(remove_items(payload))
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
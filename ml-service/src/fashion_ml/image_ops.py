@@ -5,19 +5,18 @@ from __future__ import annotations
 import numpy as np
 from PIL import Image
 
-from fashion_ml.config import IMG_SIZE
+from fashion_ml.config import COLOR_FAST_SIZE, COLOR_MODE, IMG_SIZE
+from fashion_ml.uploads import SpooledUpload, open_image
 
 
-def preprocess_image(
-    image: Image.Image,
-    target_size: int = IMG_SIZE,
-    normalize: bool = True,
-) -> np.ndarray:
-    if image.mode != "RGB":
-        image = image.convert("RGB")
-
-    width, height = image.size
+def _vit_crop_box(width: int, height: int, target_size: int) -> tuple[tuple[float, float, float, float], bool]:
+    """Source-pixel box of the ViT center crop and whether it needs resampling.
 
+    Small images are (conceptually) upscaled so the short side equals ``target_size``; the
+    ``target_size`` square is then cut from the center. Large images are cropped at native
+    resolution, so their box is an exact pixel crop.
+    """
+    new_width, new_height = width, height
     if width < target_size or height < target_size:
         if width < height:
             new_width = target_size
@@ -25,25 +24,104 @@ def preprocess_image(
         else:
             new_height = target_size
             new_width = int(width * (target_size / height))
-        image = image.resize((new_width, new_height), Image.LANCZOS)
-        width, height = image.size
+    left, top = round((new_width - target_size) / 2), round((new_height - target_size) / 2)
+    right, bottom = round((new_width + target_size) / 2), round((new_height + target_size) / 2)
+    if new_width == target_size and new_height == target_size:
+        left, top, right, bottom = 0, 0, target_size, target_size
+    sx, sy = width / new_width, height / new_height
+    box = (left * sx, top * sy, right * sx, bottom * sy)
+    exact = sx == 1 and sy == 1 and right - left == target_size and bottom - top == target_size
+    return box, not exact
 
-    if width != target_size or height != target_size:
-        left = (width - target_size) / 2
-        top = (height - target_size) / 2
-        right = (width + target_size) / 2
-        bottom = (height + target_size) / 2
-        image = image.crop((left, top, right, bottom))
 
-    image = image.resize((target_size, target_size), Image.LANCZOS)
-    img_array = np.array(image)
+def preprocess_image(
+    image: Image.Image,
+    target_size: int = IMG_SIZE,
+    normalize: bool = True,
+    out: np.ndarray | None = None,
+) -> np.ndarray:
+    """``(1, target_size, target_size, 3)`` float32 ViT input: center crop, upscaling small images.
 
-    if normalize:
-        img_array = img_array.astype("float32") / 255.0
-    else:
-        img_array = img_array.astype("float32")
+    Crop and resize happen in one pass over the source pixels (``resize(box=...)``) and the
+    result is written straight into ``out`` (allocated when not given), so no full-size
+    intermediate image or uint8 copy is kept around.
+    """
+    if image.mode != "RGB":
+        image = image.convert("RGB")
 
-    return np.expand_dims(img_array, axis=0)
+    box, resample = _vit_crop_box(image.width, image.height, target_size)
+    if resample:
+        image = image.resize((target_size, target_size), Image.LANCZOS, box=box)
+    elif image.size != (target_size, target_size):
+        image = image.crop(tuple(int(v) for v in box))
+
+    if out is None:
+        out = np.empty((1, target_size, target_size, 3), dtype=np.float32)
+    out[0] = np.asarray(image)
+    if normalize:
+        np.divide(out, 255.0, out=out)
+    return out
+
+
+class DecodedImage:
+    """One upload decoded once, plus downsampled levels built lazily and shared by consumers.
+
+    ``image`` is the only full-resolution copy kept per request. ``level()`` caches each
+    derived size (400px for the KMeans color engine, 96px for the fast one, 32px for the
+    perceptual signature) and ``vit_input()`` caches the ViT tensor, so no consumer converts or
+    copies the full image again. Not thread-safe; build one per request / batch item.
+    """
+
+    __slots__ = ("image", "_modes", "_levels", "_vit")
+
+    def __init__(self, image: Image.Image) -> None:
+        self.image = image
+        self._modes: dict[str, Image.Image] = {image.mode: image}
+        self._levels: dict[tuple, Image.Image] = {}
+        self._vit: dict[int, np.ndarray] = {}
+
+    @classmethod
+    def from_bytes(cls, raw: bytes | SpooledUpload) -> DecodedImage:
+        """Header checks (format, pixel count) first, then a single full decode."""
+        image = open_image(raw)
+        image.load()
+        if image.mode != "RGB":
+            image = image.convert("RGB")
+        return cls(image)
+
+    @property
+    def mode(self) -> str:
+        return self.image.mode
+
+    def as_mode(self, mode: str) -> Image.Image:
+        """Full-size image in ``mode`` (converted at most once)."""
+        if mode not in self._modes:
+            self._modes[mode] = self.image.convert(mode)
+        return self._modes[mode]
+
+    def level(
+        self,
+        size: int,
+        resample: int | None = None,
+        reducing_gap: float | None = None,
+        mode: str | None = None,
+    ) -> Image.Image:
+        """``size`` x ``size`` downsample of the full image, built on first use."""
+        key = (size, resample, reducing_gap, mode)
+        if key not in self._levels:
+            src = self.as_mode(mode) if mode else self.image
+            self._levels[key] = src.resize((size, size), resample, reducing_gap=reducing_gap)
+        return self._levels[key]
+
+    def vit_input(self, target_size: int = IMG_SIZE) -> np.ndarray:
+        """Un-normalized ``(1, S, S, 3)`` float32 ViT tensor (``preprocess_image``)."""
+        if target_size not in self._vit:
+            self._vit[target_size] = preprocess_image(self.image, target_size=target_size, normalize=False)
+        return self._vit[target_size]
+
+
+def _as_decoded(image: Image.Image | DecodedImage) -> DecodedImage:
+    return image if isinstance(image, DecodedImage) else DecodedImage(image)
 
 
 def logits_to_probs(logits) -> np.ndarray:
@@ -53,124 +131,257 @@ def logits_to_probs(logits) -> np.ndarray:
     return exp_x / exp_x.sum()
 
 
-def detect_color(image: Image.Image) -> str:
-    try:
-        img_array = np.array(image)
-        img_small = Image.fromarray(img_array).resize((400, 400))
-        img_array = np.array(img_small)
-
-        if len(img_array.shape) == 3 and img_array.shape[2] == 4:
-            alpha = img_array[:, :, 3]
-            mask = alpha > 128
-            img_array = img_array[mask][:, :3]
-            if len(img_array) == 0:
-                return "desconocido"
-
-        height, width = img_array.shape[:2]
-        border_width = max(8, int(min(height, width) * 0.12))
-        border_pixels = []
-
-        border_pixels.extend(img_array[0:border_width, :].reshape(-1, 3))
-        border_pixels.extend(img_array[-border_width:, :].reshape(-1, 3))
-        border_pixels.extend(img_array[:, 0:border_width].reshape(-1, 3))
-        border_pixels.extend(img_array[:, -border_width:].reshape(-1, 3))
-
-        border_pixels = np.array(border_pixels)
-
-        if len(border_pixels) > 0:
-            border_rounded = (border_pixels / 15).astype(int) * 15
-            unique_colors, counts = np.unique(border_rounded, axis=0, return_counts=True)
-            bg_color = unique_colors[np.argsort(counts)[-1]].astype(float)
-        else:
-            bg_color = np.array([255.0, 255.0, 255.0])
-
-        img_flat = img_array.reshape(-1, 3).astype(np.float32)
-        distances = np.sqrt(np.sum((img_flat - bg_color) ** 2, axis=1))
+def logits_to_probs_batch(logits) -> np.ndarray:
+    """Row-wise ``logits_to_probs`` over an ``(N, C)`` matrix."""
+    x = np.asarray(logits, dtype=np.float64)
+    x = x - x.max(axis=1, keepdims=True)
+    exp_x = np.exp(x)
+    return exp_x / exp_x.sum(axis=1, keepdims=True)
+
+
+def _color_name(r_avg: float, g_avg: float, b_avg: float) -> str:
+    """Map a dominant RGB triple to the Spanish color label used across the app."""
+    max_ch, min_ch = max(r_avg, g_avg, b_avg), min(r_avg, g_avg, b_avg)
+    delta = max_ch - min_ch
+    brightness = max_ch / 255.0
+    saturation = (delta / max_ch) if max_ch > 0 else 0
+
+    if delta == 0:
+        hue = 0
+    elif max_ch == r_avg:
+        hue = 60 * (((g_avg - b_avg) / delta) % 6)
+    elif max_ch == g_avg:
+        hue = 60 * (((b_avg - r_avg) / delta) + 2)
+    else:
+        hue = 60 * (((r_avg - g_avg) / delta) + 4)
+    hue = hue / 360.0
+
+    if brightness < 0.22 or (saturation < 0.12 and brightness < 0.32):
+        return "negro"
+    if brightness > 0.94 and saturation < 0.06:
+        return "blanco"
+    if saturation < 0.1:
+        return "negro" if brightness < 0.35 else ("blanco" if brightness > 0.88 else "gris")
+
+    if saturation > 0.28:
+        if hue < 0.07 or hue > 0.93:
+            return "rojo" if brightness > 0.55 else "rojo oscuro"
+        if 0.05 < hue < 0.12:
+            return "naranja" if brightness > 0.48 else "marrón"
+        if 0.12 < hue < 0.20:
+            return "amarillo" if brightness > 0.48 else "amarillo oscuro"
+        if 0.20 < hue < 0.48:
+            return "verde" if brightness > 0.48 else "verde oscuro"
+        if 0.48 < hue < 0.72:
+            return "azul" if brightness > 0.48 else "azul oscuro"
+        if 0.72 < hue < 0.93:
+            return "rosa" if brightness > 0.68 else "magenta"
+
+    if 0.05 < hue < 0.12 and saturation < 0.42 and brightness < 0.58:
+        return "marrón"
+    if brightness > 0.72 and saturation < 0.28:
+        return "beige"
+
+    return "gris" if saturation < 0.18 else "multicolor"
+
+
+def _border_pixels(img_array: np.ndarray, border_width: int) -> np.ndarray:
+    return np.concatenate(
+        [
+            img_array[0:border_width, :].reshape(-1, 3),
+            img_array[-border_width:, :].reshape(-1, 3),
+            img_array[:, 0:border_width].reshape(-1, 3),
+            img_array[:, -border_width:].reshape(-1, 3),
+        ]
+    )
+
+
+def _background_threshold(bg_color: np.ndarray) -> int:
+    bg_brightness = np.mean(bg_color) / 255.0
+    return 55 if bg_brightness > 0.85 else (35 if bg_brightness < 0.2 else 45)
+
+
+def _center_mask(height: int, width: int) -> np.ndarray:
+    center_y, center_x = height // 2, width // 2
+    center_region_size = int(min(height, width) / 2.5)
+    center_mask = np.zeros((height, width), dtype=bool)
+    y_start, y_end = max(0, center_y - center_region_size), min(height, center_y + center_region_size)
+    x_start, x_end = max(0, center_x - center_region_size), min(width, center_x + center_region_size)
+    center_mask[y_start:y_end, x_start:x_end] = True
+    return center_mask.reshape(-1)
+
+
+def _dominant_rgb_kmeans(decoded: DecodedImage):
+    """Legacy engine: 400x400 resize, border background estimate, sklearn KMeans (n_init=15)."""
+    if decoded.mode in ("RGB", "RGBA", "L"):
+        img_small = decoded.level(400)
+    else:  # palette / exotic modes: keep the legacy array round-trip semantics
+        img_small = Image.fromarray(np.array(decoded.image)).resize((400, 400))
+    img_array = np.asarray(img_small)
+
+    if len(img_array.shape) == 3 and img_array.shape[2] == 4:
+        alpha = img_array[:, :, 3]
+        mask = alpha > 128
+        img_array = img_array[mask][:, :3]
+        if len(img_array) == 0:
+            return None
+
+    height, width = img_array.shape[:2]
+    border_width = max(8, int(min(height, width) * 0.12))
+    border_pixels = _border_pixels(img_array, border_width)
+
+    if len(border_pixels) > 0:
+        border_rounded = (border_pixels / 15).astype(int) * 15
+        unique_colors, counts = np.unique(border_rounded, axis=0, return_counts=True)
+        bg_color = unique_colors[np.argsort(counts)[-1]].astype(float)
+    else:
+        bg_color = np.array([255.0, 255.0, 255.0])
 
-        bg_brightness = np.mean(bg_color) / 255.0
-        threshold = 55 if bg_brightness > 0.85 else (35 if bg_brightness < 0.2 else 45)
+    img_flat = img_array.reshape(-1, 3).astype(np.float32)
+    distances = np.sqrt(np.sum((img_flat - bg_color) ** 2, axis=1))
+    threshold = _background_threshold(bg_color)
 
-        object_mask = distances > threshold
-        center_y, center_x = height // 2, width // 2
-        center_region_size = int(min(height, width) / 2.5)
-        center_mask = np.zeros((height, width), dtype=bool)
-        y_start, y_end = max(0, center_y - center_region_size), min(height, center_y + center_region_size)
-        x_start, x_end = max(0, center_x - center_region_size), min(width, center_x + center_region_size)
-        center_mask[y_start:y_end, x_start:x_end] = True
+    object_mask = distances > threshold
+    final_mask = object_mask & _center_mask(height, width)
 
-        final_mask = object_mask & center_mask.reshape(-1)
+    if np.sum(final_mask) < 100:
+        pixels = img_flat[object_mask] if np.sum(object_mask) >= 100 else img_flat
+    else:
+        pixels = img_flat[final_mask]
 
-        if np.sum(final_mask) < 100:
-            pixels = img_flat[object_mask] if np.sum(object_mask) >= 100 else img_flat
-        else:
-            pixels = img_flat[final_mask]
+    if len(pixels) == 0:
+        return None
 
-        if len(pixels) == 0:
+    try:
+        from sklearn.cluster import KMeans
+
+        sample_size = min(3000, len(pixels))
+        if sample_size >= 30:
+            sample_indices = np.random.choice(len(pixels), sample_size, replace=False)
+            kmeans = KMeans(n_clusters=min(7, max(3, sample_size // 40)), random_state=42, n_init=15)
+            kmeans.fit(pixels[sample_indices])
+            labels = kmeans.predict(pixels)
+            cluster_counts = np.bincount(labels)
+            return kmeans.cluster_centers_[np.argmax(cluster_counts)]
+        return np.mean(pixels, axis=0)
+    except Exception:
+        return np.mean(pixels, axis=0)
+
+
+# Fast engine: 8 levels per channel -> 512 palette bins; bins are smoothed over their 3x3x3
+# neighbourhood so a color straddling a bin edge is not split in two.
+_PALETTE_LEVELS = 8
+_PALETTE_SHIFT = 5  # 256 / 8 = 32 = 1 << 5
+
+
+def _dominant_rgb_fast(decoded: DecodedImage, size: int | None = None):
+    """Vectorized engine: fixed small downsample, histogram background, palette-bin mode.
+
+    Memory is bounded by ``size * size`` pixels plus a 512-bin palette, and the output is
+    fully deterministic (no sampling, no iterative clustering).
+    """
+    size = int(size or COLOR_FAST_SIZE)
+    alpha_mask = None
+    image = decoded.image
+    if image.mode in ("RGBA", "LA") or (image.mode == "P" and "transparency" in image.info):
+        arr = np.asarray(decoded.level(size, Image.BILINEAR, 2.0, mode="RGBA"))
+        alpha_mask = arr[:, :, 3].reshape(-1) > 128
+        if not alpha_mask.any():
+            return None
+        arr = arr[:, :, :3]
+    else:
+        arr = np.asarray(decoded.level(size, Image.BILINEAR, 2.0, mode="RGB"))
+
+    height, width = arr.shape[:2]
+    border_width = max(2, int(min(height, width) * 0.12))
+    border = _border_pixels(arr, border_width).astype(np.int32) // 15
+    keys = (border[:, 0] * 18 + border[:, 1]) * 18 + border[:, 2]
+    best = int(np.argmax(np.bincount(keys, minlength=18**3)))
+    bg_color = np.array([best // (18 * 18), (best // 18) % 18, best % 18], dtype=np.float32) * 15
+
+    img_flat = arr.reshape(-1, 3).astype(np.float32)
+    distances = np.sqrt(np.sum((img_flat - bg_color) ** 2, axis=1))
+    object_mask = distances > _background_threshold(bg_color)
+    if alpha_mask is not None:
+        object_mask &= alpha_mask
+    final_mask = object_mask & _center_mask(height, width)
+
+    min_pixels = max(8, int(100 * height * width / (400 * 400)))
+    if np.count_nonzero(final_mask) >= min_pixels:
+        pixels = img_flat[final_mask]
+    elif np.count_nonzero(object_mask) >= min_pixels:
+        pixels = img_flat[object_mask]
+    elif alpha_mask is not None:
+        pixels = img_flat[alpha_mask]
+    else:
+        pixels = img_flat
+    if len(pixels) == 0:
+        return None
+
+    q = pixels.astype(np.int32) >> _PALETTE_SHIFT
+    n = _PALETTE_LEVELS
+    bins = (q[:, 0] * n + q[:, 1]) * n + q[:, 2]
+    counts = np.bincount(bins, minlength=n**3).reshape(n, n, n)
+    padded = np.pad(counts, 1)
+    smoothed = sum(
+        padded[dr : dr + n, dg : dg + n, db : db + n]
+        for dr in range(3)
+        for dg in range(3)
+        for db in range(3)
+    )
+    peak = np.array(np.unravel_index(int(np.argmax(smoothed)), smoothed.shape))
+    near = np.all(np.abs(q - peak) <= 1, axis=1)
+    return pixels[near].mean(axis=0)
+
+
+def detect_color(image: Image.Image | DecodedImage, mode: str | None = None) -> str:
+    """Dominant garment color label. ``mode`` overrides ``ML_COLOR_MODE`` ("kmeans" | "fast")."""
+    try:
+        engine = _dominant_rgb_fast if (mode or COLOR_MODE) == "fast" else _dominant_rgb_kmeans
+        rgb = engine(_as_decoded(image))
+        if rgb is None:
             return "desconocido"
-
-        try:
-            from sklearn.cluster import KMeans
-
-            sample_size = min(3000, len(pixels))
-            if sample_size >= 30:
-                sample_indices = np.random.choice(len(pixels), sample_size, replace=False)
-                kmeans = KMeans(n_clusters=min(7, max(3, sample_size // 40)), random_state=42, n_init=15)
-                kmeans.fit(pixels[sample_indices])
-                labels = kmeans.predict(pixels)
-                cluster_counts = np.bincount(labels)
-                dominant_color = kmeans.cluster_centers_[np.argmax(cluster_counts)]
-                r_avg, g_avg, b_avg = dominant_color
-            else:
-                r_avg, g_avg, b_avg = np.mean(pixels, axis=0)
-        except Exception:
-            r_avg, g_avg, b_avg = np.mean(pixels, axis=0)
-
-        max_ch, min_ch = max(r_avg, g_avg, b_avg), min(r_avg, g_avg, b_avg)
-        delta = max_ch - min_ch
-        brightness = max_ch / 255.0
-        saturation = (delta / max_ch) if max_ch > 0 else 0
-
-        if delta == 0:
-            hue = 0
-        elif max_ch == r_avg:
-            hue = 60 * (((g_avg - b_avg) / delta) % 6)
-        elif max_ch == g_avg:
-            hue = 60 * (((b_avg - r_avg) / delta) + 2)
-        else:
-            hue = 60 * (((r_avg - g_avg) / delta) + 4)
-        hue = hue / 360.0
-
-        if brightness < 0.22 or (saturation < 0.12 and brightness < 0.32):
-            return "negro"
-        if brightness > 0.94 and saturation < 0.06:
-            return "blanco"
-        if saturation < 0.1:
-            return "negro" if brightness < 0.35 else ("blanco" if brightness > 0.88 else "gris")
-
-        if saturation > 0.28:
-            if hue < 0.07 or hue > 0.93:
-                return "rojo" if brightness > 0.55 else "rojo oscuro"
-            if 0.05 < hue < 0.12:
-                return "naranja" if brightness > 0.48 else "marrón"
-            if 0.12 < hue < 0.20:
-                return "amarillo" if brightness > 0.48 else "amarillo oscuro"
-            if 0.20 < hue < 0.48:
-                return "verde" if brightness > 0.48 else "verde oscuro"
-            if 0.48 < hue < 0.72:
-                return "azul" if brightness > 0.48 else "azul oscuro"
-            if 0.72 < hue < 0.93:
-                return "rosa" if brightness > 0.68 else "magenta"
-
-        if 0.05 < hue < 0.12 and saturation < 0.42 and brightness < 0.58:
-            return "marrón"
-        if brightness > 0.72 and saturation < 0.28:
-            return "beige"
-
-        return "gris" if saturation < 0.18 else "multicolor"
+        r_avg, g_avg, b_avg = (float(c) for c in rgb)
+        return _color_name(r_avg, g_avg, b_avg)
     except Exception:
         return "desconocido"
 
 
+# EXIF orientation -> transpose that brings the pixels upright.
+_EXIF_TRANSPOSE = {
+    2: Image.FLIP_LEFT_RIGHT,
+    3: Image.ROTATE_180,
+    4: Image.FLIP_TOP_BOTTOM,
+    5: Image.TRANSPOSE,
+    6: Image.ROTATE_270,
+    7: Image.TRANSVERSE,
+    8: Image.ROTATE_90,
+}
+
+
+def perceptual_signature(image: Image.Image | DecodedImage) -> tuple[int, tuple[int, int, int]]:
+    """``(dhash, mean_rgb)`` of an already-decoded image, stable across re-encodes and resizes.
+
+    The 64-bit difference hash only sees luminance structure, so the mean RGB of the same
+    thumbnail rides along to keep the same garment in two colors apart. The EXIF orientation
+    is applied to the square thumbnail first, so a photo and the same photo rotated upright by
+    the frontend or ``sharp`` get the same signature.
+    """
+    decoded = _as_decoded(image)
+    image = decoded.image
+    small = decoded.level(32, Image.BOX, mode="RGB")
+    try:
+        orientation = image.getexif().get(0x0112, 1)
+    except Exception:
+        orientation = 1
+    if orientation in _EXIF_TRANSPOSE:
+        small = small.transpose(_EXIF_TRANSPOSE[orientation])
+    gray = np.asarray(small.convert("L").resize((9, 8), Image.LANCZOS), dtype=np.int16)
+    bits = (gray[:, 1:] > gray[:, :-1]).ravel()
+    mean_rgb = np.asarray(small, dtype=np.float32).reshape(-1, 3).mean(axis=0)
+    return int.from_bytes(np.packbits(bits).tobytes(), "big"), tuple(int(round(c)) for c in mean_rgb)
+
+
 def allowed_file(filename: str, allowed: frozenset | None = None) -> bool:
     from fashion_ml.config import ALLOWED_EXTENSIONS
 
@@ -0,0 +1,131 @@
+"""Import-time report for the service entry points (startup regressions).
+
+Usage (from ml-service/)::
+
+    PYTHONPATH=src python -m fashion_ml.importtime                      # app, fastapi, space
+    PYTHONPATH=src python -m fashion_ml.importtime --targets space --top 30 --json imports.json
+    PYTHONPATH=src python -m fashion_ml.importtime --fail-above-ms 1500 --fail-on-heavy
+
+Each target is imported in a fresh interpreter under ``python -X importtime``. The report lists
+total import time, the slowest imports made directly by the entry point (cumulative) and any
+heavy package (TensorFlow, Keras, keras-hub, scikit-learn, ...) imported eagerly: those belong
+to the background model load or to first use, not to the path that binds the port.
+"""
+
+from __future__ import annotations
+
+import argparse
+import json
+import os
+import subprocess
+import sys
+from pathlib import Path
+
+_ML_SERVICE = Path(__file__).resolve().parents[2]
+_HF_SPACE = _ML_SERVICE.parent / "hf-space"
+
+# name -> (module imported, cwd)
+TARGETS = {
+    "app": ("app", _ML_SERVICE),
+    "fastapi": ("run_fastapi", _ML_SERVICE),
+    "space": ("space_app", _HF_SPACE),
+}
+HEAVY_PACKAGES = ("tensorflow", "keras", "keras_hub", "sklearn", "scipy", "onnxruntime", "tf2onnx", "requests")
+
+
+def parse_importtime(stderr: str) -> list[tuple[str, int, int]]:
+    """``-X importtime`` output -> ``[(module, self_us, cumulative_us)]``; nested modules keep their indent."""
+    rows = []
+    for line in stderr.splitlines():
+        if not line.startswith("import time:"):
+            continue
+        parts = line[len("import time:"):].split("|")
+        if len(parts) != 3:
+            continue
+        try:
+            rows.append((parts[2].rstrip()[1:], int(parts[0]), int(parts[1])))
+        except ValueError:
+            continue  # header line
+    return rows
+
+
+def measure(target: str) -> dict:
+    module, cwd = TARGETS[target]
+    pythonpath = [str(_ML_SERVICE / "src")] + ([os.environ["PYTHONPATH"]] if os.environ.get("PYTHONPATH") else [])
+    proc = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", f"import {module}"],
+        cwd=str(cwd),
+        env={**os.environ, "PYTHONPATH": os.pathsep.join(pythonpath)},
+        capture_output=True,
+        text=True,
+        timeout=300,
+    )
+    rows = parse_importtime(proc.stderr)
+    # children are printed before their parent: collect depth-1 rows until the target's own line
+    total_us, direct, pending = 0, [], []
+    for name, _, cum in rows:
+        depth = (len(name) - len(name.lstrip(" "))) // 2
+        if depth == 1:
+            pending.append((name.strip(), cum))
+        elif depth == 0:
+            if name == module:
+                total_us, direct = cum, pending
+            pending = []
+    direct.sort(key=lambda r: -r[1])
+    imported = {name.strip().split(".")[0] for name, _, _ in rows}
+    error = None
+    if proc.returncode != 0:
+        lines = [ln for ln in proc.stderr.splitlines() if not ln.startswith("import time:")]
+        error = lines[-1] if lines else f"exit code {proc.returncode}"
+    return {
+        "target": target,
+        "module": module,
+        "ok": proc.returncode == 0,
+        "error": error,
+        "total_ms": round(total_us / 1000.0, 1),
+        "modules": len(rows),
+        "slowest": [{"module": name, "cumulative_ms": round(cum / 1000.0, 1)} for name, cum in direct],
+        "heavy_imported": [p for p in HEAVY_PACKAGES if p in imported],
+    }
+
+
+def format_report(result: dict, top: int) -> str:
+    if not result["ok"]:
+        return f"{result['target']}: import {result['module']} failed: {result['error']}"
+    lines = [f"{result['target']}: import {result['module']} {result['total_ms']:.1f} ms ({result['modules']} modules)"]
+    for row in result["slowest"][:top]:
+        lines.append(f"  {row['cumulative_ms']:9.1f} ms  {row['module']}")
+    heavy = result["heavy_imported"]
+    lines.append(f"  heavy packages imported eagerly: {', '.join(heavy) if heavy else 'none'}")
+    return "\n".join(lines)
+
+
+def main(argv: list[str] | None = None) -> int:
+    parser = argparse.ArgumentParser(description="Import-time report for the ML service entry points.")
+    parser.add_argument("--targets", default=",".join(TARGETS), help="comma-separated: " + ",".join(TARGETS))
+    parser.add_argument("--top", type=int, default=15, help="slowest direct imports to list")
+    parser.add_argument("--json", type=Path, default=None, help="write all results here")
+    parser.add_argument("--fail-above-ms", type=float, default=None, help="exit 1 when a target imports slower")
+    parser.add_argument("--fail-on-heavy", action="store_true", help="exit 1 when a heavy package is imported")
+    args = parser.parse_args(argv)
+
+    targets = [t.strip() for t in args.targets.split(",") if t.strip()]
+    unknown = [t for t in targets if t not in TARGETS]
+    if unknown:
+        parser.error(f"unknown target(s): {', '.join(unknown)}")
+
+    results = [measure(t) for t in targets]
+    print("\n\n".join(format_report(r, args.top) for r in results))
+    if args.json:
+        args.json.write_text(json.dumps(results, indent=2), encoding="utf-8")
+
+    failed = [r for r in results if not r["ok"]]
+    if args.fail_above_ms is not None:
+        failed += [r for r in results if r["ok"] and r["total_ms"] > args.fail_above_ms]
+    if args.fail_on_heavy:
+        failed += [r for r in results if r["heavy_imported"]]
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
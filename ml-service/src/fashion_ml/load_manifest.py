@@ -0,0 +1,125 @@
+"""Load-strategy manifest: which ``load_model`` variant worked for a ``.keras`` file, and what it needs.
+
+``MLModels.load_vit`` may try several loaders, each re-reading the whole archive, after a
+sweep over keras-hub's classes. The first successful boot writes ``<stem>.load.json`` next to
+the model::
+
+    {"sha256": ..., "size": ..., "mtime_ns": ..., "strategy": "tf_safe_mode_off",
+     "custom_objects": [{"module": ..., "class_name": ..., "registered_name": ...}, ...]}
+
+Later boots of the same file (same SHA-256; size + mtime short-circuit re-hashing) import only
+the listed modules and go straight to the recorded loader.
+"""
+
+from __future__ import annotations
+
+import importlib
+import json
+import zipfile
+from pathlib import Path
+
+from fashion_ml.checksums import file_sha256
+
+MANIFEST_VERSION = 1
+
+
+def manifest_path(keras_path: Path) -> Path:
+    """``best_model_17_marzo.load.json`` next to ``best_model_17_marzo.keras``."""
+    return Path(keras_path).with_suffix(".load.json")
+
+
+def referenced_custom_objects(keras_path: Path) -> list[dict]:
+    """Non-core classes named in the archive's ``config.json`` (keras-hub layers, custom models ...)."""
+    with zipfile.ZipFile(keras_path) as zf:
+        config = json.loads(zf.read("config.json"))
+    found: dict[tuple[str, str], dict] = {}
+
+    def walk(node) -> None:
+        if isinstance(node, dict):
+            module, class_name = node.get("module"), node.get("class_name")
+            registered = node.get("registered_name")
+            if isinstance(module, str) and isinstance(class_name, str):
+                core = module == "builtins" or module == "keras" or module.startswith("keras.")
+                if not core or (registered and registered != class_name):
+                    found[(module, class_name)] = {
+                        "module": module,
+                        "class_name": class_name,
+                        "registered_name": registered,
+                    }
+            for value in node.values():
+                walk(value)
+        elif isinstance(node, list):
+            for value in node:
+                walk(value)
+
+    walk(config)
+    return sorted(found.values(), key=lambda e: (e["module"], e["class_name"]))
+
+
+def _file_hash(keras_path: Path, recorded: dict | None) -> str:
+    """SHA-256 of the model, reusing ``recorded`` when size and mtime are unchanged."""
+    st = keras_path.stat()
+    if recorded and recorded.get("size") == st.st_size and recorded.get("mtime_ns") == st.st_mtime_ns:
+        return recorded["sha256"]
+    return file_sha256(keras_path)
+
+
+def read_manifest(keras_path: Path) -> dict | None:
+    """The manifest if it matches the current file's SHA-256, else ``None``."""
+    path = manifest_path(keras_path)
+    try:
+        manifest = json.loads(path.read_text(encoding="utf-8"))
+    except (OSError, ValueError):
+        return None
+    if manifest.get("version") != MANIFEST_VERSION or not manifest.get("strategy"):
+        return None
+    try:
+        st = keras_path.stat()
+        if _file_hash(keras_path, manifest) != manifest.get("sha256"):
+            print(f"⚠️  {path.name} is for another version of {keras_path.name}; ignoring it", flush=True)
+            return None
+    except OSError:
+        return None
+    if (manifest.get("size"), manifest.get("mtime_ns")) != (st.st_size, st.st_mtime_ns):
+        # same bytes, new mtime (copied / touched): refresh so the next boot skips hashing again
+        manifest.update(size=st.st_size, mtime_ns=st.st_mtime_ns)
+        try:
+            path.write_text(json.dumps(manifest, indent=2), encoding="utf-8")
+        except OSError:
+            pass
+    return manifest
+
+
+def write_manifest(keras_path: Path, strategy: str, previous: dict | None = None) -> dict | None:
+    """Record ``strategy`` and the archive's custom objects; best effort (read-only dirs are fine)."""
+    try:
+        st = keras_path.stat()
+        manifest = {
+            "version": MANIFEST_VERSION,
+            "file": keras_path.name,
+            "sha256": _file_hash(keras_path, previous),
+            "size": st.st_size,
+            "mtime_ns": st.st_mtime_ns,
+            "strategy": strategy,
+            "custom_objects": referenced_custom_objects(keras_path),
+        }
+        manifest_path(keras_path).write_text(json.dumps(manifest, indent=2), encoding="utf-8")
+    except Exception as e:
+        print(f"⚠️  Could not write load manifest for {keras_path.name}: {e}", flush=True)
+        return None
+    return manifest
+
+
+def import_custom_objects(manifest: dict) -> dict | None:
+    """``custom_objects`` map for just the classes the manifest lists; ``None`` if one is missing."""
+    objects: dict = {}
+    for entry in manifest.get("custom_objects", []):
+        try:
+            cls = getattr(importlib.import_module(entry["module"]), entry["class_name"])
+        except Exception as e:
+            print(f"⚠️  Manifest class {entry['module']}.{entry['class_name']} unavailable: {e}", flush=True)
+            return None
+        objects[entry["class_name"]] = cls
+        if entry.get("registered_name"):
+            objects[entry["registered_name"]] = cls
+    return objects
@@ -0,0 +1,278 @@
+"""Local HTTP load test: Flask (app.py) vs FastAPI (run_fastapi.py) vs the HF Space app.
+
+Usage (from ml-service/)::
+
+    PYTHONPATH=src python -m fashion_ml.loadtest                                # all three servers
+    PYTHONPATH=src python -m fashion_ml.loadtest --servers flask,space --concurrency 1,8,32 \\
+        --duration 15 --mix jpeg:640x480:6,png:1632x1224:3,jpeg:4000x3000:1 --json load.json
+
+Each server is started from its real entry point on a free local port with a stub model
+(``ML_STUB_MODEL_MS``: fixed forward latency, no TensorFlow or weights) and the result cache
+disabled, so every request runs decode, color and preprocessing. Multipart uploads from the
+weighted ``--mix`` are replayed at each concurrency level for ``--duration`` seconds.
+Reports throughput, p50/p95/p99 latency and error rate per server and level, as a table and
+optionally as JSON. Extra server settings go through ``--env KEY=VALUE`` (repeatable).
+"""
+
+from __future__ import annotations
+
+import argparse
+import json
+import os
+import random
+import socket
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from pathlib import Path
+
+import numpy as np
+import requests
+
+from fashion_ml.bench import encode, synthetic_image
+
+_ML_SERVICE = Path(__file__).resolve().parents[2]
+_HF_SPACE = _ML_SERVICE.parent / "hf-space"
+
+# name -> (argv after the interpreter, cwd, classify path)
+SERVERS = {
+    "flask": (["app.py"], _ML_SERVICE, "/classify-vit"),
+    "fastapi": (["run_fastapi.py"], _ML_SERVICE, "/predict"),
+    "space": (
+        ["-m", "uvicorn", "space_app:app", "--host", "127.0.0.1", "--port", "{port}"],
+        _HF_SPACE,
+        "/classify-vit",
+    ),
+}
+DEFAULT_MIX = "jpeg:640x480:6,png:1632x1224:3,jpeg:4000x3000:1"
+_MIME = {"jpeg": "image/jpeg", "png": "image/png", "webp": "image/webp"}
+
+
+def parse_mix(spec: str) -> list[tuple[str, int, int, float]]:
+    """``fmt:WxH:weight,...`` -> ``[(fmt, w, h, weight)]``."""
+    mix = []
+    for part in spec.split(","):
+        part = part.strip()
+        if not part:
+            continue
+        fmt, dims, *rest = part.split(":")
+        w, h = (int(v) for v in dims.lower().split("x"))
+        fmt = fmt.lower()
+        if fmt not in _MIME:
+            raise ValueError(f"unknown format {fmt!r} (expected one of {', '.join(_MIME)})")
+        mix.append((fmt, w, h, float(rest[0]) if rest else 1.0))
+    if not mix:
+        raise ValueError("empty --mix")
+    return mix
+
+
+def build_payloads(mix, variants: int = 4) -> tuple[list[tuple[str, bytes, str]], list[float]]:
+    """A few distinct encodings per mix entry (different garment colors) and their weights."""
+    payloads, weights = [], []
+    for fmt, w, h, weight in mix:
+        for v in range(variants):
+            raw = encode(synthetic_image(w, h, seed=v * 7919 + w), "JPEG" if fmt == "jpeg" else fmt.upper())
+            payloads.append((f"load_{w}x{h}_{v}.{fmt}", raw, _MIME[fmt]))
+            weights.append(weight / variants)
+    return payloads, weights
+
+
+def free_port() -> int:
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+class ServerProcess:
+    """One entry point as a subprocess, with a stub model, logging to a temp file."""
+
+    def __init__(self, name: str, stub_ms: float, env: dict[str, str], log_dir: Path) -> None:
+        argv, cwd, self.path = SERVERS[name]
+        self.name = name
+        self.port = free_port()
+        self.base = f"http://127.0.0.1:{self.port}"
+        self.log_path = log_dir / f"{name}.log"
+        child_env = {
+            **os.environ,
+            "PORT": str(self.port),
+            "ML_STUB_MODEL_MS": str(stub_ms),
+            "ML_RESULT_CACHE_SIZE": "0",
+            "PYTHONUNBUFFERED": "1",
+            **env,
+        }
+        self._log = open(self.log_path, "w", encoding="utf-8")
+        self.proc = subprocess.Popen(
+            [sys.executable, *[a.format(port=self.port) for a in argv]],
+            cwd=str(cwd),
+            env=child_env,
+            stdout=self._log,
+            stderr=subprocess.STDOUT,
+        )
+
+    def wait_ready(self, timeout_s: float) -> None:
+        deadline = time.monotonic() + timeout_s
+        while time.monotonic() < deadline:
+            if self.proc.poll() is not None:
+                raise RuntimeError(f"{self.name} exited with {self.proc.returncode}; see {self.log_path}")
+            try:
+                if requests.get(self.base + "/ready", timeout=2).ok:
+                    return
+            except requests.RequestException:
+                pass
+            time.sleep(0.25)
+        raise TimeoutError(f"{self.name} not ready after {timeout_s:.0f}s; see {self.log_path}")
+
+    def stop(self) -> None:
+        if self.proc.poll() is None:
+            self.proc.terminate()
+            try:
+                self.proc.wait(timeout=10)
+            except subprocess.TimeoutExpired:
+                self.proc.kill()
+                self.proc.wait()
+        self._log.close()
+
+
+def run_level(url: str, payloads, weights, concurrency: int, duration_s: float, seed: int = 0) -> dict:
+    """``concurrency`` closed-loop clients posting random payloads for ``duration_s`` seconds."""
+    latencies: list[float] = []
+    errors: dict[str, int] = {}
+    lock = threading.Lock()
+    deadline = time.monotonic() + duration_s
+
+    def client(idx: int) -> None:
+        rng = random.Random(seed * 1000 + idx)
+        session = requests.Session()
+        local_lat, local_err = [], {}
+        while time.monotonic() < deadline:
+            name, raw, mime = rng.choices(payloads, weights)[0]
+            t0 = time.perf_counter()
+            try:
+                r = session.post(url, files={"imagen": (name, raw, mime)}, timeout=60)
+                key = None if r.status_code == 200 else str(r.status_code)
+            except requests.RequestException as e:
+                key = type(e).__name__
+            local_lat.append(time.perf_counter() - t0)
+            if key is not None:
+                local_err[key] = local_err.get(key, 0) + 1
+        with lock:
+            latencies.extend(local_lat)
+            for k, v in local_err.items():
+                errors[k] = errors.get(k, 0) + v
+
+    started = time.perf_counter()
+    threads = [threading.Thread(target=client, args=(i,), daemon=True) for i in range(concurrency)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    elapsed = time.perf_counter() - started
+
+    n = len(latencies)
+    n_err = sum(errors.values())
+    ms = np.asarray(latencies) * 1000.0 if n else np.zeros(1)
+    return {
+        "concurrency": concurrency,
+        "requests": n,
+        "throughput_rps": round((n - n_err) / elapsed, 2) if elapsed else 0.0,
+        "p50_ms": round(float(np.percentile(ms, 50)), 1),
+        "p95_ms": round(float(np.percentile(ms, 95)), 1),
+        "p99_ms": round(float(np.percentile(ms, 99)), 1),
+        "error_rate": round(n_err / n, 4) if n else 0.0,
+        "errors": errors,
+    }
+
+
+def format_table(results: list[dict]) -> str:
+    header = ("server", "conc", "reqs", "rps", "p50 ms", "p95 ms", "p99 ms", "err %")
+    rows = [header]
+    for r in results:
+        if "error" in r:
+            rows.append((r["server"], "-", "-", "-", "-", "-", "-", r["error"][:40]))
+            continue
+        rows.append(
+            (
+                r["server"],
+                str(r["concurrency"]),
+                str(r["requests"]),
+                f"{r['throughput_rps']:.1f}",
+                f"{r['p50_ms']:.1f}",
+                f"{r['p95_ms']:.1f}",
+                f"{r['p99_ms']:.1f}",
+                f"{r['error_rate'] * 100:.1f}",
+            )
+        )
+    widths = [max(len(row[i]) for row in rows) for i in range(len(header))]
+    lines = [
+        "  ".join(cell.rjust(w) if i else cell.ljust(w) for i, (cell, w) in enumerate(zip(row, widths)))
+        for row in rows
+    ]
+    lines.insert(1, "  ".join("-" * w for w in widths))
+    return "\n".join(lines)
+
+
+def main(argv: list[str] | None = None) -> int:
+    parser = argparse.ArgumentParser(
+        description="Load-test the Flask / FastAPI / HF Space entry points with a stub model."
+    )
+    parser.add_argument("--servers", default=",".join(SERVERS), help="comma-separated: " + ",".join(SERVERS))
+    parser.add_argument("--concurrency", default="1,4,16", help="comma-separated client counts")
+    parser.add_argument("--duration", type=float, default=10.0, help="seconds per concurrency level")
+    parser.add_argument("--mix", default=DEFAULT_MIX, help="weighted uploads: fmt:WxH:weight,...")
+    parser.add_argument("--stub-ms", type=float, default=20.0, help="stub model forward latency")
+    parser.add_argument("--env", action="append", default=[], help="KEY=VALUE passed to every server")
+    parser.add_argument("--startup-timeout", type=float, default=120.0)
+    parser.add_argument("--json", type=Path, default=None, help="write all results here")
+    args = parser.parse_args(argv)
+
+    servers = [s.strip() for s in args.servers.split(",") if s.strip()]
+    unknown = [s for s in servers if s not in SERVERS]
+    if unknown:
+        parser.error(f"unknown server(s): {', '.join(unknown)}")
+    levels = [int(c) for c in args.concurrency.split(",") if c.strip()]
+    env = dict(kv.split("=", 1) for kv in args.env)
+    payloads, weights = build_payloads(parse_mix(args.mix))
+
+    results: list[dict] = []
+    with tempfile.TemporaryDirectory(prefix="fashion-loadtest-") as tmp:
+        for name in servers:
+            print(f"[loadtest] starting {name} ...", flush=True)
+            server = ServerProcess(name, args.stub_ms, env, Path(tmp))
+            try:
+                server.wait_ready(args.startup_timeout)
+                for level in levels:
+                    row = run_level(server.base + server.path, payloads, weights, level, args.duration)
+                    results.append({"server": name, **row})
+                    print(
+                        f"[loadtest] {name} c={level}: {row['throughput_rps']} rps, "
+                        f"p95 {row['p95_ms']} ms, errors {row['error_rate']:.1%}",
+                        flush=True,
+                    )
+            except Exception as e:
+                print(f"[loadtest] {name} failed: {e}", flush=True)
+                try:
+                    print(server.log_path.read_text(encoding="utf-8")[-2000:], flush=True)
+                except OSError:
+                    pass
+                results.append({"server": name, "error": str(e)})
+            finally:
+                server.stop()
+
+    print()
+    print(format_table(results))
+    if args.json:
+        report = {
+            "mix": args.mix,
+            "stub_ms": args.stub_ms,
+            "duration_s": args.duration,
+            "env": env,
+            "results": results,
+        }
+        args.json.write_text(json.dumps(report, indent=2), encoding="utf-8")
+    return 0 if all("error" not in r for r in results) else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -2,19 +2,53 @@
 
 from __future__ import annotations
 
+import gc
+import importlib.util
 import threading
+import time
+from contextlib import ExitStack
 from pathlib import Path
-from typing import Any
+from typing import Any, NamedTuple
 
 import numpy as np
 from PIL import Image
 
-from fashion_ml.image_ops import logits_to_probs, preprocess_image
+from fashion_ml.backends import (
+    QUANTIZATION_VARIANTS,
+    InferenceBackend,
+    KerasBackend,
+    StubBackend,
+    TFLiteBackend,
+    exported_path,
+    load_exported_backend,
+    quantized_path,
+)
+from fashion_ml.batching import MicroBatcher
+from fashion_ml.config import (
+    BATCH_MAX_SIZE,
+    BATCH_MAX_WAIT_MS,
+    BATCHING_ENABLED,
+    INFERENCE_BACKEND,
+    LOAD_MANIFEST_ENABLED,
+    QUANT_CALIBRATION_DIR,
+    QUANT_MIN_AGREEMENT,
+    STUB_MODEL_LATENCY_MS,
+    VIT_COMPILED_BATCH_SIZES,
+    VIT_QUANTIZATION,
+    VIT_REPLICAS,
+    VIT_SERVING,
+    VIT_MODEL_PATH,
+    VIT_THREADS_PER_REPLICA,
+)
+from fashion_ml.image_ops import logits_to_probs, logits_to_probs_batch, preprocess_image
 from fashion_ml.labels import CLASS_NAMES, CLASS_TO_TIPO, TIPO_POR_INDICE
+from fashion_ml.load_manifest import import_custom_objects, read_manifest, write_manifest
+from fashion_ml.replica_pool import ReplicaPool, estimate_pool_memory
+from fashion_ml.telemetry import observe_stage
 
 
 def configure_tensorflow_runtime() -> None:
-    """Reduce GPU OOM risk; no-op on CPU-only."""
+    """Reduce GPU OOM risk; no-op on CPU-only. With a replica pool, split intra-op threads per replica."""
     try:
         import tensorflow as tf
 
@@ -23,27 +57,103 @@ def configure_tensorflow_runtime() -> None:
                 tf.config.experimental.set_memory_growth(g, True)
         except Exception:
             pass
+        if VIT_REPLICAS > 1:
+            try:
+                tf.config.threading.set_intra_op_parallelism_threads(VIT_THREADS_PER_REPLICA)
+                tf.config.threading.set_inter_op_parallelism_threads(VIT_REPLICAS)
+            except Exception:
+                pass  # runtime already initialized
     except Exception:
         pass
 
 
+def _logits_matrix(pred: Any, n: int) -> np.ndarray:
+    """Normalize raw model output to an ``(n, 10)`` logits matrix."""
+    out = pred[0] if isinstance(pred, (list, tuple)) else pred
+    logits = np.asarray(out).reshape(n, -1)
+    if logits.shape[1] != 10:
+        logits = np.asarray(pred).reshape(n, -1)[:, :10]
+    if logits.shape[1] < 10:
+        z = np.zeros((n, 10), dtype=np.float64)
+        z[:, 0] = 1.0
+        logits = z
+    return logits
+
+
+# Tried in this order on a first boot; the winner is recorded in the load manifest.
+VIT_LOAD_STRATEGIES = ("tf_safe_mode_off", "tf_custom_objects", "keras3", "tf_default")
+
+
+def _load_with(strategy: str, vit_path: Path, custom_objects: dict) -> Any:
+    """One ``load_model`` variant over the ``.keras`` archive (see ``VIT_LOAD_STRATEGIES``)."""
+    import tensorflow as tf
+
+    if strategy == "tf_safe_mode_off":
+        return tf.keras.models.load_model(str(vit_path), compile=False, safe_mode=False)
+    if strategy == "tf_custom_objects":
+        return tf.keras.models.load_model(str(vit_path), compile=False, custom_objects=custom_objects)
+    if strategy == "keras3":
+        import keras as k3
+
+        try:
+            return k3.models.load_model(str(vit_path), compile=False, safe_mode=False)
+        except TypeError:
+            return k3.models.load_model(str(vit_path), compile=False)
+    if strategy == "tf_default":
+        return tf.keras.models.load_model(str(vit_path), compile=False)
+    raise ValueError(f"unknown load strategy {strategy!r}")
+
+
+class Serving(NamedTuple):
+    """What one request runs on: read once from ``models.serving``, then used for the cache key,
+    the forward pass and the reported ``model_file``, so a hot swap mid-request cannot mix them."""
+
+    backend: InferenceBackend | None
+    pool: ReplicaPool | None
+    lock: threading.Lock
+    model_path: Path
+
+
 class MLModels:
-    """Holds ViT weights and metadata. Lazy full load via load_classification_model()."""
+    """Holds ViT weights and metadata. Lazy full load via load_classification_model().
+
+    ``vit`` is the Keras model (keras backend only); inference always goes through ``backend``.
+    ``_serving`` is the ``Serving`` snapshot forward passes take in one read, so ``swap_in`` can
+    replace the model while in-flight requests finish on the old one.
+    """
 
     __slots__ = (
         "_lock",
+        "_batcher",
+        "_pool",
+        "_serving",
+        "backend",
+        "model_path",
         "vit_input_size",
         "vit",
         "keras_hub_available",
         "load_error_vit",
+        "load_report",
     )
 
     def __init__(self) -> None:
         self._lock = threading.Lock()
+        self._batcher = (
+            MicroBatcher(
+                self._forward, max_batch_size=BATCH_MAX_SIZE, max_wait_ms=BATCH_MAX_WAIT_MS, workers=VIT_REPLICAS
+            )
+            if BATCHING_ENABLED
+            else None
+        )
+        self.backend: InferenceBackend | None = None
+        self._pool: ReplicaPool | None = None
+        self.model_path = VIT_MODEL_PATH
+        self._serving = Serving(None, None, self._lock, self.model_path)
         self.vit_input_size = 224
         self.vit: Any = None
         self.keras_hub_available = False
         self.load_error_vit: str | None = None
+        self.load_report: dict = {"manifest": None, "strategy": None, "attempts": []}
 
     def _import_keras_hub_custom_objects(self) -> dict:
         vit_custom_objects: dict = {}
@@ -89,129 +199,456 @@ class MLModels:
             return {}
         return vit_custom_objects
 
-    def load_vit(self, vit_path: Path) -> None:
-        import tensorflow as tf
+    def _try_strategies(self, strategies, vit_path: Path, custom_objects: dict, source: str) -> str | None:
+        """Run loaders in order until one returns a model; each attempt is timed into ``load_report``."""
+        self.vit = None
+        for strategy in strategies:
+            t0 = time.perf_counter()
+            try:
+                self.vit = _load_with(strategy, vit_path, custom_objects)
+                error = None if self.vit is not None else "load_model returned None"
+            except Exception as e:
+                self.vit = None
+                error = str(e)
+            attempt = {"strategy": strategy, "source": source, "seconds": round(time.perf_counter() - t0, 3)}
+            if error is not None:
+                attempt["error"] = error[:200]
+                self.load_error_vit = error[:500]
+            self.load_report["attempts"].append(attempt)
+            if self.vit is not None:
+                self.load_error_vit = None
+                return strategy
+        return None
 
+    def load_vit(self, vit_path: Path) -> None:
         self.load_error_vit = None
+        self.load_report = {"manifest": None, "strategy": None, "attempts": []}
         if not vit_path.is_file():
             self.vit = None
+            self.load_error_vit = f"ViT not found: {vit_path}"
             print(f"❌ ViT not found: {vit_path}", flush=True)
             return
 
-        vit_custom_objects = self._import_keras_hub_custom_objects()
-        vit_loaded = False
-        vit_last_error: Exception | None = None
-        self.vit = None
+        strategy = None
+        manifest = read_manifest(vit_path) if LOAD_MANIFEST_ENABLED else None
+        if manifest is not None:
+            custom_objects = import_custom_objects(manifest)
+            if custom_objects is not None:
+                self.keras_hub_available = importlib.util.find_spec("keras_hub") is not None
+                self.load_report["manifest"] = "hit"
+                strategy = self._try_strategies([manifest["strategy"]], vit_path, custom_objects, "manifest")
+            if strategy is None:
+                self.load_report["manifest"] = "stale"
+                print(f"⚠️  Recorded load strategy failed for {vit_path.name}; trying all loaders", flush=True)
 
-        try:
-            self.vit = tf.keras.models.load_model(str(vit_path), compile=False, safe_mode=False)
-            if self.vit is not None:
-                vit_loaded = True
-        except (TypeError, Exception) as e0:
-            vit_last_error = e0
-            self.vit = None
+        if strategy is None:
+            vit_custom_objects = self._import_keras_hub_custom_objects()
+            tried = {a["strategy"] for a in self.load_report["attempts"]}
+            strategies = [
+                name
+                for name in VIT_LOAD_STRATEGIES
+                if name not in tried and (name != "tf_custom_objects" or vit_custom_objects)
+            ]
+            strategy = self._try_strategies(strategies, vit_path, vit_custom_objects, "sweep")
+            if strategy is not None and LOAD_MANIFEST_ENABLED:
+                if write_manifest(vit_path, strategy, previous=manifest) is not None:
+                    self.load_report["manifest"] = "written"
 
-        if not vit_loaded and vit_custom_objects:
-            try:
-                self.vit = tf.keras.models.load_model(
-                    str(vit_path), compile=False, custom_objects=vit_custom_objects
-                )
-                vit_loaded = True
-            except Exception as e2:
-                vit_last_error = e2
-                self.vit = None
-
-        if not vit_loaded:
-            try:
-                import keras as k3
-
-                try:
-                    self.vit = k3.models.load_model(str(vit_path), compile=False, safe_mode=False)
-                except TypeError:
-                    self.vit = k3.models.load_model(str(vit_path), compile=False)
-                if self.vit is not None:
-                    vit_loaded = True
-            except Exception as e1:
-                vit_last_error = e1
-
-        if not vit_loaded:
-            try:
-                self.vit = tf.keras.models.load_model(str(vit_path), compile=False)
-                vit_loaded = True
-            except (TypeError, Exception) as e3:
-                vit_last_error = e3
-                self.vit = None
-
-        if vit_loaded and self.vit is not None:
-            print(f"✅ ViT loaded ({vit_path.stat().st_size / (1024*1024):.1f} MB)", flush=True)
+        if strategy is not None:
+            self.load_report["strategy"] = strategy
+            total = sum(a["seconds"] for a in self.load_report["attempts"])
+            print(
+                f"✅ ViT loaded ({vit_path.stat().st_size / (1024*1024):.1f} MB, {strategy}, {total:.1f}s)",
+                flush=True,
+            )
             if self.vit.input_shape and len(self.vit.input_shape) >= 3:
                 detected_size = self.vit.input_shape[1]
                 if detected_size and detected_size > 0:
                     self.vit_input_size = int(detected_size)
         else:
             self.vit = None
-            err_msg = str(vit_last_error) if vit_last_error else "unknown"
+            err_msg = self.load_error_vit or "unknown"
             self.load_error_vit = err_msg[:500]
             print(f"❌ ViT did not load. Error: {err_msg[:200]}", flush=True)
             if not self.keras_hub_available:
                 print("   Tip: pip install keras-hub (si tu .keras lo necesita)", flush=True)
 
+    @property
+    def is_loaded(self) -> bool:
+        return self._serving.backend is not None
+
+    @property
+    def serving(self) -> Serving:
+        """Snapshot of the served model; pass it to the ``predict_*`` / ``embed_batch`` calls of one request."""
+        return self._serving
+
+    def _build_compiled(self, backend: KerasBackend) -> None:
+        """Trace + warm the compiled serving path; keep the Keras path if anything is off."""
+        from fashion_ml.serving import PARITY_TOLERANCE, CompiledPredictor
+
+        try:
+            compiled = CompiledPredictor(backend.model, self.vit_input_size, VIT_COMPILED_BATCH_SIZES)
+            warmup = compiled.warmup()
+            diff = compiled.max_abs_diff(backend.model)
+        except Exception as e:
+            print(f"⚠️  Compiled ViT path unavailable, using model.predict: {e}", flush=True)
+            return
+        if diff > PARITY_TOLERANCE:
+            print(f"⚠️  Compiled ViT logits differ from model.predict by {diff:.2e}; using model.predict", flush=True)
+            return
+        backend.compiled = compiled
+        print(f"✅ Compiled ViT path warm (batch sizes {list(compiled.batch_sizes)}, {warmup:.2f}s)", flush=True)
+
+    def _load_exported(self, kind: str, vit_path: Path) -> InferenceBackend | None:
+        path = exported_path(vit_path, kind)
+        if not path.is_file():
+            print(f"⚠️  {path.name} not found (python -m fashion_ml.export); falling back to Keras", flush=True)
+            return None
+        try:
+            backend = load_exported_backend(kind, path)
+        except Exception as e:
+            print(f"⚠️  {kind} backend failed to load ({e}); falling back to Keras", flush=True)
+            return None
+        print(f"✅ ViT loaded via {kind} ({path.stat().st_size / (1024*1024):.1f} MB)", flush=True)
+        return backend
+
+    def _load_quantized(self, variant: str, vit_path: Path) -> InferenceBackend | None:
+        """Quantized TFLite variant, only if its validation report clears the agreement gate."""
+        from fashion_ml.quantize import build_and_validate, check_report
+
+        if variant not in QUANTIZATION_VARIANTS:
+            print(f"⚠️  Unknown ML_VIT_QUANTIZATION={variant!r}; serving float32", flush=True)
+            return None
+        ok, reason, report = check_report(vit_path, variant, QUANT_MIN_AGREEMENT)
+        if not ok and not report and QUANT_CALIBRATION_DIR and vit_path.is_file():
+            print(f"Building {variant} ViT from {vit_path.name}, validating on {QUANT_CALIBRATION_DIR}", flush=True)
+            try:
+                build_and_validate(vit_path, variant, Path(QUANT_CALIBRATION_DIR), QUANT_MIN_AGREEMENT)
+                ok, reason, report = check_report(vit_path, variant, QUANT_MIN_AGREEMENT)
+            except Exception as e:
+                reason = f"build failed: {e}"
+        if not ok:
+            print(f"❌ Quantized ViT ({variant}) refused: {reason}; serving float32", flush=True)
+            return None
+        path = quantized_path(vit_path, variant)
+        try:
+            backend = TFLiteBackend(path)
+        except Exception as e:
+            print(f"❌ Quantized ViT ({variant}) failed to load ({e}); serving float32", flush=True)
+            return None
+        backend.details["quantization"] = {
+            "variant": variant,
+            "top1_agreement": report.get("top1_agreement"),
+            "validated_images": report.get("images"),
+        }
+        print(
+            f"✅ ViT loaded quantized ({variant}, {path.stat().st_size / (1024*1024):.1f} MB, "
+            f"top-1 agreement {report.get('top1_agreement', 0):.2%})",
+            flush=True,
+        )
+        return backend
+
+    def _build_pool(self, vit_path: Path) -> None:
+        """Replicate ``self.backend`` ``VIT_REPLICAS`` times and log the memory estimate."""
+        primary = self.backend
+        n = VIT_REPLICAS
+        threads = VIT_THREADS_PER_REPLICA
+        try:
+            if isinstance(primary, StubBackend):
+                backends = [StubBackend(primary.input_size, primary.latency_s * 1000.0) for _ in range(n)]
+                shared, per_replica = False, 0
+            elif isinstance(primary, KerasBackend):
+                if primary.compiled is not None:
+                    # Traced concrete functions are safe to call concurrently: share one set of weights.
+                    backends: list[InferenceBackend] = [primary]
+                    for _ in range(n - 1):
+                        replica = KerasBackend(primary.model, primary.input_size, primary.source)
+                        replica.compiled = primary.compiled
+                        backends.append(replica)
+                    shared = True
+                else:
+                    backends = [primary]
+                    for _ in range(n - 1):
+                        copy = MLModels()
+                        copy.load_vit(vit_path)
+                        if copy.vit is None:
+                            raise RuntimeError(copy.load_error_vit or "replica failed to load")
+                        backends.append(KerasBackend(copy.vit, copy.vit_input_size, vit_path))
+                    shared = False
+                try:
+                    per_replica = int(primary.model.count_params()) * 4
+                except Exception:
+                    per_replica = vit_path.stat().st_size
+            else:
+                backends = []
+                for _ in range(n):
+                    b = load_exported_backend(primary.name, primary.source, num_threads=threads)
+                    b.details.update(primary.details)
+                    backends.append(b)
+                shared = False
+                per_replica = primary.source.stat().st_size
+        except Exception as e:
+            print(f"⚠️  Replica pool unavailable ({e}); using a single locked model", flush=True)
+            return
+        pool = ReplicaPool(backends, threads_per_replica=threads)
+        pool.memory_estimate = estimate_pool_memory(per_replica, n, shared)
+        est = pool.memory_estimate
+        print(
+            f"✅ Replica pool: {n} x {primary.name} ({threads} threads each), "
+            f"~{est['total_weights_mb']} MB weights{' (shared)' if shared else ''}"
+            + (f" of {est['host_mb']} MB host RAM" if est["host_mb"] else ""),
+            flush=True,
+        )
+        if est["fraction_of_host"] and est["fraction_of_host"] > 0.8:
+            print("⚠️  Replica weights exceed 80% of host RAM; lower ML_VIT_REPLICAS", flush=True)
+        self.backend = backends[0]
+        self._pool = pool
+
     def load_classification_model(self, vit_path: Path) -> None:
+        self._pool = None
+        self.model_path = Path(vit_path)
+        if STUB_MODEL_LATENCY_MS is not None:
+            self.backend = StubBackend(self.vit_input_size, STUB_MODEL_LATENCY_MS)
+            print(f"⚠️  ML_STUB_MODEL_MS set: serving a stub model ({STUB_MODEL_LATENCY_MS} ms)", flush=True)
+        else:
+            self._load_backend(vit_path)
+        if self.backend is not None and VIT_REPLICAS > 1:
+            self._build_pool(vit_path)
+        self._serving = Serving(self.backend, self._pool, self._lock, self.model_path)
+
+    def use_backend(self, backend: InferenceBackend) -> None:
+        """Serve an already built backend (benchmarks, tests) without loading anything."""
+        self.backend, self._pool = backend, None
+        self.vit_input_size = backend.input_size
+        self._serving = Serving(backend, None, self._lock, self.model_path)
+
+    def swap_in(self, candidate: MLModels) -> None:
+        """Serve ``candidate`` (loaded and warmed) from now on; the old weights are freed once drained.
+
+        Requests that already snapshotted the old backend finish on it; every forward pass after
+        the assignment below uses the new one. Versions must share the input size, since
+        preprocessing for in-flight requests has already happened at the old size.
+        """
+        backend, pool, lock, model_path = candidate._serving
+        if backend is None:
+            raise RuntimeError(candidate.load_error_vit or "candidate model is not loaded")
+        if self.is_loaded and candidate.vit_input_size != self.vit_input_size:
+            raise ValueError(
+                f"input size {candidate.vit_input_size} != serving {self.vit_input_size}; restart to change it"
+            )
+        old_backend, old_pool, old_lock, _ = self._serving
+        self.vit = candidate.vit
+        self.vit_input_size = candidate.vit_input_size
+        self.keras_hub_available = candidate.keras_hub_available
+        self.load_error_vit = None
+        self.load_report = candidate.load_report
+        self.backend, self._pool = backend, pool
+        self.model_path = model_path
+        self._serving = Serving(backend, pool, lock, model_path)
+
+        # drain: wait for forward passes still running on the old weights, then drop them
+        if old_pool is not None:
+            with ExitStack() as stack:
+                for _ in range(len(old_pool)):
+                    stack.enter_context(old_pool.checkout())
+        elif old_backend is not None:
+            with old_lock:
+                pass
+        del old_backend, old_pool
+        gc.collect()
+
+    def _load_backend(self, vit_path: Path) -> None:
+        self.backend = None
+        if VIT_QUANTIZATION != "none":
+            backend = self._load_quantized(VIT_QUANTIZATION, vit_path)
+            if backend is not None:
+                self.vit = None
+                self.load_error_vit = None
+                self.vit_input_size = backend.input_size
+                self.backend = backend
+                return
+        if INFERENCE_BACKEND in ("tflite", "onnx"):
+            backend = self._load_exported(INFERENCE_BACKEND, vit_path)
+            if backend is not None:
+                self.vit = None
+                self.load_error_vit = None
+                self.vit_input_size = backend.input_size
+                self.backend = backend
+                return
         configure_tensorflow_runtime()
         print(f"Loading ViT model from {vit_path}", flush=True)
         self.load_vit(vit_path)
+        if self.vit is None:
+            return
+        keras_backend = KerasBackend(self.vit, self.vit_input_size, vit_path)
+        if VIT_SERVING == "compiled":
+            self._build_compiled(keras_backend)
+        self.backend = keras_backend
+
+    def _run_backend(self, batch: np.ndarray, method: str, stage: str, serving: Serving | None = None) -> Any:
+        """``backend.<method>(batch)`` on a checked-out replica (or under the lock) of ``serving``."""
+        backend, pool, lock, _ = serving or self._serving
+        if backend is None:
+            raise RuntimeError("ViT model not loaded")
+        t0 = time.perf_counter()
+        if pool is not None:
+            with pool.checkout(batch.shape[0]) as replica:
+                t1 = time.perf_counter()
+                out = getattr(replica.backend, method)(batch)
+        else:
+            with lock:
+                t1 = time.perf_counter()
+                out = getattr(backend, method)(batch)
+        observe_stage("lock_wait", t1 - t0)
+        observe_stage(stage, time.perf_counter() - t1)
+        return out
+
+    def _forward(self, batch: np.ndarray, serving: Serving | None = None) -> np.ndarray:
+        """One locked forward pass over ``(N, H, W, 3)``; returns ``(N, 10)`` logits."""
+        return _logits_matrix(self._run_backend(batch, "predict", "forward", serving), batch.shape[0])
+
+    def embed_batch(self, batch: np.ndarray, serving: Serving | None = None) -> np.ndarray:
+        """L2-normalized ``(N, D)`` penultimate-layer embeddings for a preprocessed batch.
+
+        Raises ``EmbeddingsUnavailable`` for backends that only expose logits (TFLite / ONNX).
+        """
+        if not self.is_loaded:
+            raise RuntimeError("ViT model not loaded")
+        emb = np.asarray(self._run_backend(batch, "embed", "embed_forward", serving), dtype=np.float32)
+        return emb / np.maximum(np.linalg.norm(emb, axis=1, keepdims=True), 1e-12)
+
+    def predict_vit_batch(self, batch: np.ndarray, serving: Serving | None = None) -> tuple[np.ndarray, np.ndarray]:
+        """Returns (probs, logits), each ``(N, 10)``, for an already preprocessed batch."""
+        if not self.is_loaded:
+            raise RuntimeError("ViT model not loaded")
+        logits = self._forward(batch, serving)
+        probs = logits_to_probs_batch(logits)
+        return probs, logits
 
     def predict_vit(self, image: Image.Image) -> tuple[np.ndarray, np.ndarray]:
         """Returns (probs, logits) length 10."""
-        if self.vit is None:
+        if not self.is_loaded:
+            raise RuntimeError("ViT model not loaded")
+        return self.predict_vit_array(preprocess_image(image, target_size=self.vit_input_size, normalize=False))
+
+    def predict_vit_array(self, arr: np.ndarray, serving: Serving | None = None) -> tuple[np.ndarray, np.ndarray]:
+        """``predict_vit`` for an already preprocessed ``(1, H, W, 3)`` tensor."""
+        if not self.is_loaded:
             raise RuntimeError("ViT model not loaded")
-        arr = preprocess_image(image, target_size=self.vit_input_size, normalize=False)
-        with self._lock:
-            pred = self.vit.predict(arr, verbose=0)
-        out = pred[0] if isinstance(pred, (list, tuple)) else pred
-        logits = np.asarray(out).ravel()
-        if len(logits) != 10:
-            logits = np.asarray(pred).ravel()[:10]
-        if len(logits) < 10:
-            z = np.zeros(10, dtype=np.float64)
-            z[0] = 1.0
-            logits = z
+        serving = serving or self._serving
+        if self._batcher is not None:
+            logits = self._batcher.predict(arr, serving)
+        else:
+            logits = self._forward(arr, serving)[0]
         probs = logits_to_probs(logits)
         return probs, logits
 
+    def warmup(self) -> float:
+        """One forward pass per replica on a blank input, so the first request skips kernel / graph setup."""
+        if not self.is_loaded:
+            return 0.0
+        t0 = time.perf_counter()
+        blank = np.zeros((1, self.vit_input_size, self.vit_input_size, 3), dtype=np.float32)
+        backend, pool, lock, _ = self._serving
+        if pool is None:
+            with lock:
+                backend.predict(blank)
+        else:
+            # hold every replica at once so each one is warmed exactly once
+            with ExitStack() as stack:
+                for replica in [stack.enter_context(pool.checkout()) for _ in range(len(pool))]:
+                    replica.backend.predict(blank)
+        return time.perf_counter() - t0
+
+    def runtime_info(self) -> dict:
+        """Serving-path details reported by ``/health``."""
+        backend, pool, _, _ = self._serving
+        serving = backend.info() if backend is not None else {"backend": None, "path": None}
+        return {
+            "serving": {**serving, "requested_backend": INFERENCE_BACKEND, "requested_path": VIT_SERVING},
+            "batching": self._batcher.stats() if self._batcher is not None else {"enabled": False},
+            "replicas": pool.stats() if pool is not None else {"size": 1},
+            "load": self.load_report,
+        }
+
 
 # Singleton used by Flask / FastAPI
 models = MLModels()
 
 
-def build_classification_response(
-    probs: np.ndarray,
-    color: str,
-    backend: str,
-    model_basename: str,
+# Per class index: (clase_nombre, tipo of the predicted class, tipo inside top3).
+_CLASS_INFO = [
+    (name, CLASS_TO_TIPO.get(name, TIPO_POR_INDICE.get(i, "desconocido")), CLASS_TO_TIPO.get(name, "desconocido"))
+    for i, name in enumerate(CLASS_NAMES)
+]
+_UNKNOWN_CLASS = ("desconocido", "desconocido", "desconocido")
+
+
+def _response_body(
+    clase: int, confianza: float, top_idx: list[int], top_p: list[float], color: str, backend: str, model_basename: str
 ) -> dict:
-    clase = int(np.argmax(probs))
-    confianza = float(probs[clase])
-    top3_indices = np.argsort(probs)[-3:][::-1]
-    top3_info = []
-    for idx in top3_indices:
-        if idx < len(CLASS_NAMES):
-            top3_info.append(
-                {
-                    "clase_nombre": CLASS_NAMES[idx],
-                    "confianza": float(probs[idx]),
-                    "tipo": CLASS_TO_TIPO.get(CLASS_NAMES[idx], "desconocido"),
-                }
-            )
-    clase_nombre = CLASS_NAMES[clase] if clase < len(CLASS_NAMES) else "desconocido"
-    tipo = CLASS_TO_TIPO.get(clase_nombre, TIPO_POR_INDICE.get(clase, "desconocido"))
+    known = len(_CLASS_INFO)
+    name, tipo, _ = _CLASS_INFO[clase] if clase < known else _UNKNOWN_CLASS
     return {
-        "clase": int(clase),
-        "clase_nombre": clase_nombre,
+        "clase": clase,
+        "clase_nombre": name,
         "tipo": tipo,
         "confianza": confianza,
         "color": color,
-        "top3": top3_info,
+        "top3": [
+            {"clase_nombre": _CLASS_INFO[i][0], "confianza": p, "tipo": _CLASS_INFO[i][2]}
+            for i, p in zip(top_idx, top_p)
+            if i < known
+        ],
         "model": backend,
         "model_file": model_basename,
     }
+
+
+def _top_k_indices(probs: np.ndarray, k: int) -> np.ndarray:
+    """``(N, k)`` class indices by descending probability for an ``(N, C)`` matrix.
+
+    Row-wise ``np.argsort(probs)[-k:][::-1]``, the original ranking, so ties come out in the
+    same order from both builders and as before the batch path existed.
+    """
+    return np.argsort(probs, axis=1)[:, -k:][:, ::-1]
+
+
+def build_classification_responses(
+    probs: np.ndarray,
+    colors: list[str],
+    backend: str,
+    model_basename: str,
+    top_k: int = 3,
+) -> list[dict]:
+    """Response bodies for a whole ``(N, C)`` probability matrix (row ``i`` pairs with ``colors[i]``).
+
+    Top-k comes from one ``argsort`` over the batch and all numbers cross into Python through a
+    single ``tolist`` per array instead of per-element casts.
+    """
+    probs = np.asarray(probs)
+    n, c = probs.shape
+    top = _top_k_indices(probs, min(top_k, c))
+    top_idx = top.tolist()
+    top_p = np.take_along_axis(probs, top, axis=1).astype(np.float64).tolist()
+    clases = probs.argmax(axis=1).tolist()
+    confianzas = probs[np.arange(n), clases].astype(np.float64).tolist()
+    return [
+        _response_body(clase, confianza, idxs, ps, color, backend, model_basename)
+        for clase, confianza, idxs, ps, color in zip(clases, confianzas, top_idx, top_p, colors)
+    ]
+
+
+def build_classification_response(
+    probs: np.ndarray,
+    color: str,
+    backend: str,
+    model_basename: str,
+) -> dict:
+    """One response body for a length-10 probability vector; same output as ``build_classification_responses``."""
+    p = np.asarray(probs).ravel()
+    top = _top_k_indices(p[None, :], min(3, p.shape[0]))[0]
+    clase = int(p.argmax())
+    return _response_body(
+        clase, float(p[clase]), top.tolist(), p[top].astype(np.float64).tolist(), color, backend, model_basename
+    )
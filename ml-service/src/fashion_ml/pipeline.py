@@ -0,0 +1,382 @@
+"""Classify and embed pipelines shared by the Flask, FastAPI and HF Space apps (single image and batch)."""
+
+from __future__ import annotations
+
+import numpy as np
+
+from fashion_ml.coalesce import in_flight
+from fashion_ml.config import (
+    COLOR_MODE,
+    MAX_BATCH_FILES,
+    MAX_BATCH_UPLOAD_BYTES,
+    MAX_UPLOAD_BYTES,
+)
+from fashion_ml.executors import executor_stats, image_executor, model_executor
+from fashion_ml.image_ops import DecodedImage, allowed_file, detect_color, perceptual_signature
+from fashion_ml.model_loader import Serving, build_classification_response, build_classification_responses, models
+from fashion_ml.registry import registry
+from fashion_ml.result_cache import model_identity, near_duplicates, result_cache
+from fashion_ml.telemetry import stage_timer
+from fashion_ml.uploads import SpooledUpload
+from fashion_ml.vector_index import embedding_index
+
+BACKEND_NAME = "vision_transformer"
+
+
+class ModelNotReady(RuntimeError):
+    """The ViT weights are not loaded (yet); apps answer 503."""
+
+
+class BatchTooLarge(ValueError):
+    """Batch exceeds ``MAX_BATCH_FILES`` or ``MAX_BATCH_UPLOAD_BYTES``; apps answer 413."""
+
+
+def model_basename() -> str:
+    """File name of the model being served (changes after a registry hot swap)."""
+    return models.model_path.name
+
+
+def _serving() -> Serving:
+    """The model snapshot one request keys, runs and reports on; ``ModelNotReady`` before the load."""
+    serving = models.serving
+    if serving.backend is None:
+        raise ModelNotReady("Vision Transformer model not available")
+    return serving
+
+
+def runtime_info() -> dict:
+    """Serving-path details reported by ``/health``."""
+    return {
+        **models.runtime_info(),
+        "result_cache": result_cache.stats(),
+        "near_duplicates": near_duplicates.stats(),
+        "executors": executor_stats(),
+        "coalescing": in_flight.stats(),
+        "embedding_index": embedding_index.stats(),
+        "registry": {
+            "active_version": registry.active_version(),
+            "pinned": registry.pinned(),
+            "swaps": registry.swaps,
+            "last_swap": dict(registry.last_swap),
+        },
+    }
+
+
+def _index_identity(serving: Serving) -> str:
+    return f"{model_identity(serving.model_path)}:{COLOR_MODE}"
+
+
+def check_batch_size(count: int, total_bytes: int) -> None:
+    if count > MAX_BATCH_FILES:
+        raise BatchTooLarge(f"Too many files (max {MAX_BATCH_FILES})")
+    if total_bytes > MAX_BATCH_UPLOAD_BYTES:
+        raise BatchTooLarge(f"Batch too large (max {MAX_BATCH_UPLOAD_BYTES // (1024 * 1024)} MB)")
+
+
+def _prepare(raw: bytes | SpooledUpload, target_size: int, identity: str | None):
+    """Image-pool stage of one upload: decode, near-duplicate check, color, ViT preprocessing.
+
+    Returns ``(body, arr, color, signature)``; ``body`` is set when the near-duplicate index
+    already answered and the item can skip the forward pass.
+    """
+    with stage_timer("decode"):
+        decoded = DecodedImage.from_bytes(raw)
+    signature = None
+    if identity is not None:
+        with stage_timer("signature"):
+            signature = perceptual_signature(decoded)
+            near = near_duplicates.lookup(signature, identity)
+        if near is not None:
+            return near, None, None, signature
+    with stage_timer("color"):
+        color = detect_color(decoded)
+    with stage_timer("preprocess"):
+        arr = decoded.vit_input(target_size)
+    return None, arr, color, signature
+
+
+def _request_key(raw: bytes | SpooledUpload, serving: Serving) -> str | None:
+    """Content key shared by the result cache and single-flight coalescing (``None`` when both are off)."""
+    if not (result_cache.enabled or in_flight.enabled):
+        return None
+    return result_cache.key_for(raw, serving.model_path)
+
+
+def _image_stage(raw: bytes | SpooledUpload, key: str | None, serving: Serving) -> tuple:
+    """Cache lookups, decode, color and preprocessing for one upload (image pool).
+
+    Returns ``(key, body, arr, color, signature, identity)``; ``body`` is set when a cache
+    already answered and the forward pass can be skipped.
+    """
+    key = key if result_cache.enabled else None
+    if key is not None:
+        cached = result_cache.get(key)
+        if cached is not None:
+            return key, cached, None, None, None, None
+    identity = _index_identity(serving) if near_duplicates.enabled else None
+    body, arr, color, signature = _prepare(raw, models.vit_input_size, identity)
+    if body is not None and key is not None:
+        result_cache.put(key, body)
+    return key, body, arr, color, signature, identity
+
+
+def _model_stage(staged: tuple, serving: Serving) -> dict:
+    """Forward pass and response for an ``_image_stage`` result (model pool)."""
+    key, _, arr, color, signature, identity = staged
+    probs, _ = models.predict_vit_array(arr, serving)
+    with stage_timer("response_build"):
+        body = build_classification_response(probs, color, BACKEND_NAME, serving.model_path.name)
+    if key is not None:
+        result_cache.put(key, body)
+    if signature is not None:
+        near_duplicates.add(signature, identity, body)
+    return body
+
+
+def _classify(raw: bytes | SpooledUpload, key: str | None, serving: Serving) -> dict:
+    staged = _image_stage(raw, key, serving)
+    if staged[1] is not None:
+        return staged[1]
+    return _model_stage(staged, serving)
+
+
+def classify_image(raw: bytes | SpooledUpload) -> dict:
+    """Decode, detect color and run ViT on one upload; same JSON as POST /classify-vit.
+
+    Identical uploads already being classified are not run again: the call waits for that
+    request's body (or error).
+    """
+    serving = _serving()
+    key = _request_key(raw, serving)
+    return in_flight.do(key, _classify, raw, key, serving)
+
+
+async def _classify_async(raw: bytes | SpooledUpload, key: str | None, serving: Serving) -> dict:
+    staged = await image_executor.run(_image_stage, raw, key, serving)
+    if staged[1] is not None:
+        return staged[1]
+    return await model_executor.run(_model_stage, staged, serving)
+
+
+async def classify_image_async(raw: bytes | SpooledUpload) -> dict:
+    """``classify_image`` for async apps: hashing, image work and the forward pass run on bounded pools."""
+    serving = _serving()
+    key = await image_executor.run(_request_key, raw, serving) if (result_cache.enabled or in_flight.enabled) else None
+    return await in_flight.do_async(key, _classify_async, raw, key, serving)
+
+
+def classify_batch(items: list[tuple[str, bytes | SpooledUpload]]) -> list[dict]:
+    """Classify ``(filename, raw)`` uploads with one batched ViT forward pass.
+
+    Returns one dict per input, in order: the ``build_classification_response`` body on
+    success, or ``{"error": ..., "filename": ...}`` for items that could not be processed.
+    """
+    check_batch_size(len(items), sum(len(raw) for _, raw in items))
+    serving = _serving()
+    identity = _index_identity(serving) if near_duplicates.enabled else None
+    results: list = [None] * len(items)
+    keys: dict[int, str] = {}
+    futures = {}
+    for i, (filename, raw) in enumerate(items):
+        if not filename or not allowed_file(filename):
+            results[i] = {"error": "Invalid file", "filename": filename}
+        elif not raw:
+            results[i] = {"error": "No image provided", "filename": filename}
+        elif len(raw) > MAX_UPLOAD_BYTES:
+            results[i] = {"error": "File too large", "filename": filename}
+        else:
+            if result_cache.enabled:
+                keys[i] = result_cache.key_for(raw, serving.model_path)
+                results[i] = result_cache.get(keys[i])
+                if results[i] is not None:
+                    continue
+            futures[i] = image_executor.submit(_prepare, raw, models.vit_input_size, identity)
+
+    ready: list[tuple[int, np.ndarray, str, tuple | None]] = []
+    for i, fut in futures.items():
+        try:
+            body, arr, color, signature = fut.result()
+        except Exception as e:
+            results[i] = {"error": f"Error processing image: {str(e)}", "filename": items[i][0]}
+            continue
+        if body is not None:
+            results[i] = body
+            if i in keys:
+                result_cache.put(keys[i], body)
+        else:
+            ready.append((i, arr, color, signature))
+
+    if ready:
+        probs, _ = models.predict_vit_batch(np.concatenate([arr for _, arr, _, _ in ready], axis=0), serving)
+        with stage_timer("response_build"):
+            bodies = build_classification_responses(
+                probs, [color for _, _, color, _ in ready], BACKEND_NAME, serving.model_path.name
+            )
+        for body, (i, _, _, signature) in zip(bodies, ready):
+            results[i] = body
+            if i in keys:
+                result_cache.put(keys[i], results[i])
+            if signature is not None:
+                near_duplicates.add(signature, identity, results[i])
+    return results
+
+
+async def classify_batch_async(items: list[tuple[str, bytes | SpooledUpload]]) -> list[dict]:
+    """``classify_batch`` off the event loop; per-item decoding fans out to the image pool."""
+    check_batch_size(len(items), sum(len(raw) for _, raw in items))
+    return await model_executor.run(classify_batch, items)
+
+
+def _index_target(user_id: str | None, item_ids: list[str | None]) -> str | None:
+    """Validated ``user_id`` for indexing, or ``None`` when the embeddings are only returned."""
+    if user_id is None or user_id == "":
+        return None
+    if any(not item_id for item_id in item_ids):
+        raise ValueError("item_id is required for every image when user_id is given")
+    if len(set(item_ids)) != len(item_ids):
+        raise ValueError("duplicate item_id in batch")
+    return str(user_id)
+
+
+def _embed_input(raw: bytes | SpooledUpload) -> np.ndarray:
+    """Image-pool stage of ``/embed``: decode and ViT preprocessing (no color, no caches)."""
+    with stage_timer("decode"):
+        decoded = DecodedImage.from_bytes(raw)
+    with stage_timer("preprocess"):
+        return decoded.vit_input(models.vit_input_size)
+
+
+def _embed_bodies(
+    batch: np.ndarray, user_id: str | None, item_ids: list[str | None], filenames: list[str], serving: Serving
+) -> list[dict]:
+    """Model-pool stage: one ``embed`` forward pass, then index the vectors when ``user_id`` is set."""
+    emb = models.embed_batch(batch, serving)
+    model_file = serving.model_path.name
+    bodies = []
+    for vec, item_id, filename in zip(emb, item_ids, filenames):
+        if user_id is not None:
+            embedding_index.add(user_id, item_id, vec, model_file)
+        bodies.append(
+            {
+                "embedding": vec,
+                "dim": int(vec.shape[0]),
+                "model_file": model_file,
+                "filename": filename,
+                "item_id": item_id,
+                "indexed": user_id is not None,
+            }
+        )
+    return bodies
+
+
+def embed_image(
+    raw: bytes | SpooledUpload, filename: str = "", user_id: str | None = None, item_id: str | None = None
+) -> dict:
+    """L2-normalized penultimate-layer embedding of one upload; indexed under ``user_id`` / ``item_id`` if given."""
+    user_id = _index_target(user_id, [item_id])
+    serving = _serving()
+    return _embed_bodies(_embed_input(raw), user_id, [item_id], [filename], serving)[0]
+
+
+async def embed_image_async(
+    raw: bytes | SpooledUpload, filename: str = "", user_id: str | None = None, item_id: str | None = None
+) -> dict:
+    """``embed_image`` for async apps: preprocessing and the forward pass run on bounded pools."""
+    user_id = _index_target(user_id, [item_id])
+    serving = _serving()
+    arr = await image_executor.run(_embed_input, raw)
+    bodies = await model_executor.run(_embed_bodies, arr, user_id, [item_id], [filename], serving)
+    return bodies[0]
+
+
+def embed_batch(
+    items: list[tuple[str, bytes | SpooledUpload]],
+    user_id: str | None = None,
+    item_ids: list[str | None] | None = None,
+) -> list[dict]:
+    """Embed ``(filename, raw)`` uploads with one batched forward pass.
+
+    ``item_ids`` pairs with ``items`` by position. Returns one dict per input, in order; items
+    that could not be processed carry ``{"error": ..., "filename": ...}`` and are not indexed.
+    """
+    check_batch_size(len(items), sum(len(raw) for _, raw in items))
+    item_ids = list(item_ids or [])
+    if user_id and len(item_ids) != len(items):
+        raise ValueError(f"expected {len(items)} item_id values, got {len(item_ids)}")
+    item_ids += [None] * (len(items) - len(item_ids))
+    user_id = _index_target(user_id, item_ids)
+    serving = _serving()
+
+    results: list = [None] * len(items)
+    futures = {}
+    for i, (filename, raw) in enumerate(items):
+        if not filename or not allowed_file(filename):
+            results[i] = {"error": "Invalid file", "filename": filename}
+        elif not raw:
+            results[i] = {"error": "No image provided", "filename": filename}
+        elif len(raw) > MAX_UPLOAD_BYTES:
+            results[i] = {"error": "File too large", "filename": filename}
+        else:
+            futures[i] = image_executor.submit(_embed_input, raw)
+
+    ready: list[tuple[int, np.ndarray]] = []
+    for i, fut in futures.items():
+        try:
+            ready.append((i, fut.result()))
+        except Exception as e:
+            results[i] = {"error": f"Error processing image: {str(e)}", "filename": items[i][0]}
+
+    if ready:
+        bodies = _embed_bodies(
+            np.concatenate([arr for _, arr in ready], axis=0),
+            user_id,
+            [item_ids[i] for i, _ in ready],
+            [items[i][0] for i, _ in ready],
+            serving,
+        )
+        for body, (i, _) in zip(bodies, ready):
+            results[i] = body
+    return results
+
+
+async def embed_batch_async(
+    items: list[tuple[str, bytes | SpooledUpload]],
+    user_id: str | None = None,
+    item_ids: list[str | None] | None = None,
+) -> list[dict]:
+    """``embed_batch`` off the event loop; per-item decoding fans out to the image pool."""
+    check_batch_size(len(items), sum(len(raw) for _, raw in items))
+    return await model_executor.run(embed_batch, items, user_id, item_ids)
+
+
+def similar_items(payload: dict) -> dict:
+    """``/index/similar``: ``{"user_id", "item_id" | "embedding", "k"}`` -> nearest indexed items of that user.
+
+    Raises ``ValueError`` for a malformed payload and ``UnknownItem`` for an unindexed ``item_id``.
+    """
+    user_id = payload.get("user_id")
+    if not user_id:
+        raise ValueError("user_id is required")
+    try:
+        k = int(payload.get("k", 10))
+    except (TypeError, ValueError):
+        raise ValueError("k must be an integer") from None
+    if not 1 <= k <= 1000:
+        raise ValueError("k must be between 1 and 1000")
+    item_id = payload.get("item_id")
+    vector = payload.get("embedding")
+    if vector is not None and not isinstance(vector, list):
+        raise ValueError("embedding must be a list of numbers")
+    return embedding_index.query(
+        str(user_id), model_basename(), k=k, item_id=None if item_id is None else str(item_id), vector=vector
+    )
+
+
+def remove_items(payload: dict) -> dict:
+    """``DELETE /index/items``: drop one item (``item_id``) or all of a user's items from the index."""
+    user_id = payload.get("user_id")
+    if not user_id:
+        raise ValueError("user_id is required")
+    item_id = payload.get("item_id")
+    removed = embedding_index.remove(str(user_id), None if item_id is None else str(item_id), model_basename())
+    return {"user_id": str(user_id), "item_id": item_id, "removed": removed}
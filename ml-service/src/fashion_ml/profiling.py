@@ -0,0 +1,142 @@
+"""Opt-in profiling of single classify requests (``ML_PROFILING=1`` + ``X-Profile: 1``).
+
+A profiled request skips the result cache and near-duplicate index and runs in the request
+thread: decode, color and preprocessing under ``cProfile``; the forward pass under the
+TensorFlow profiler (Keras backend) or ``cProfile`` (TFLite / ONNX / stub). Each run is a
+directory ``<ML_PROFILE_DIR>/<profile_id>/``::
+
+    image.prof / image.txt       cProfile stats (pstats dump + top functions by cumulative time)
+    forward/                     TensorBoard profile plugin trace (or forward.prof / forward.txt)
+    meta.json                    timings, upload size, backend, model file
+
+When ``ML_PROFILING`` is off the apps only test that module-level flag, so requests pay nothing.
+"""
+
+from __future__ import annotations
+
+import cProfile
+import io
+import json
+import pstats
+import secrets
+import shutil
+import threading
+import time
+from pathlib import Path
+from typing import Callable, Mapping
+
+from fashion_ml.config import PROFILE_DIR, PROFILE_MAX_BYTES, PROFILE_MAX_RUNS, PROFILING_ENABLED
+from fashion_ml.model_loader import build_classification_response, models
+from fashion_ml.pipeline import BACKEND_NAME, ModelNotReady, _prepare
+from fashion_ml.uploads import SpooledUpload
+
+PROFILE_HEADER = "X-Profile"
+PROFILE_ID_HEADER = "X-Profile-Id"
+
+_TOP_FUNCTIONS = 40
+# One profiled request at a time: the TensorFlow profiler is process-wide and traces overlap badly.
+_lock = threading.Lock()
+
+
+def profile_requested(headers: Mapping[str, str]) -> bool:
+    """True when profiling is enabled and the request asked for it (``X-Profile: 1``)."""
+    if not PROFILING_ENABLED:
+        return False
+    value = headers.get(PROFILE_HEADER)
+    return value is not None and value.strip().lower() in ("1", "true", "yes", "on")
+
+
+def new_profile_id() -> str:
+    return f"{time.strftime('%Y%m%d-%H%M%S')}-{secrets.token_hex(4)}"
+
+
+def _dump_cprofile(profiler: cProfile.Profile, base: Path) -> None:
+    profiler.dump_stats(str(base.with_suffix(".prof")))
+    buf = io.StringIO()
+    pstats.Stats(profiler, stream=buf).sort_stats("cumulative").print_stats(_TOP_FUNCTIONS)
+    base.with_suffix(".txt").write_text(buf.getvalue(), encoding="utf-8")
+
+
+def _run_cprofile(fn: Callable, base: Path):
+    profiler = cProfile.Profile()
+    profiler.enable()
+    try:
+        return fn()
+    finally:
+        profiler.disable()
+        _dump_cprofile(profiler, base)
+
+
+def _run_forward(fn: Callable, run_dir: Path) -> tuple[object, str]:
+    """``fn()`` under the TF profiler on the Keras backend, else under ``cProfile``."""
+    backend = models.backend
+    if backend is not None and backend.name == "keras":
+        try:
+            import tensorflow as tf
+
+            tf.profiler.experimental.start(str(run_dir / "forward"))
+        except Exception as e:
+            print(f"⚠️ TensorFlow profiler unavailable, using cProfile for the forward pass: {e}", flush=True)
+        else:
+            try:
+                return fn(), "tensorflow"
+            finally:
+                tf.profiler.experimental.stop()
+    return _run_cprofile(fn, run_dir / "forward"), "cprofile"
+
+
+def _dir_bytes(path: Path) -> int:
+    return sum(f.stat().st_size for f in path.rglob("*") if f.is_file())
+
+
+def rotate(keep: str | None = None) -> None:
+    """Delete the oldest runs beyond ``PROFILE_MAX_RUNS`` / ``PROFILE_MAX_BYTES`` (never ``keep``)."""
+    if not PROFILE_DIR.is_dir():
+        return
+    # profile ids start with a timestamp, so name order is age order
+    runs = sorted(p for p in PROFILE_DIR.iterdir() if p.is_dir())
+    sizes = {p: _dir_bytes(p) for p in runs}
+    total = sum(sizes.values())
+    while runs and (len(runs) > PROFILE_MAX_RUNS or total > PROFILE_MAX_BYTES):
+        oldest = runs.pop(0)
+        if oldest.name == keep:
+            continue
+        shutil.rmtree(oldest, ignore_errors=True)
+        total -= sizes[oldest]
+
+
+def profile_classify(raw: bytes | SpooledUpload) -> tuple[dict, str]:
+    """``classify_image`` under the profilers; returns ``(body, profile_id)``.
+
+    ``body`` is the usual /classify-vit JSON plus ``profile_id``.
+    """
+    serving = models.serving
+    if serving.backend is None:
+        raise ModelNotReady("Vision Transformer model not available")
+    profile_id = new_profile_id()
+    run_dir = PROFILE_DIR / profile_id
+    with _lock:
+        run_dir.mkdir(parents=True, exist_ok=True)
+        t0 = time.perf_counter()
+        _, arr, color, _ = _run_cprofile(lambda: _prepare(raw, models.vit_input_size, None), run_dir / "image")
+        t1 = time.perf_counter()
+        # predict_vit_batch runs in this thread (no micro-batcher), so only this request is traced
+        (probs, _), forward_profiler = _run_forward(lambda: models.predict_vit_batch(arr, serving), run_dir)
+        t2 = time.perf_counter()
+        body = build_classification_response(probs[0], color, BACKEND_NAME, serving.model_path.name)
+        meta = {
+            "profile_id": profile_id,
+            "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S%z"),
+            "upload_bytes": len(raw),
+            "filename": raw.filename if isinstance(raw, SpooledUpload) else None,
+            "backend": models.backend.name if models.backend is not None else None,
+            "model_file": body["model_file"],
+            "forward_profiler": forward_profiler,
+            "image_ms": round((t1 - t0) * 1000.0, 3),
+            "forward_ms": round((t2 - t1) * 1000.0, 3),
+            "clase_nombre": body["clase_nombre"],
+        }
+        (run_dir / "meta.json").write_text(json.dumps(meta, indent=2), encoding="utf-8")
+        rotate(keep=profile_id)
+    print(f"✅ Profile {profile_id}: image {meta['image_ms']} ms, forward {meta['forward_ms']} ms", flush=True)
+    return {**body, "profile_id": profile_id}, profile_id
@@ -0,0 +1,154 @@
+"""Build int8 / float16 TFLite variants of the ViT and gate them on top-1 agreement.
+
+Usage (from ml-service/)::
+
+    PYTHONPATH=src python -m fashion_ml.quantize --images path/to/labelled/or/unlabelled/photos
+    PYTHONPATH=src python -m fashion_ml.quantize --images data/sample --variants int8 --min-agreement 0.99
+
+For each variant this writes ``<model>.<variant>.tflite`` and ``<model>.<variant>.report.json``
+next to the ``.keras`` file. The report records top-1 agreement with the float32 Keras model on
+every image in the folder, and the SHA-256 of the artifact it describes. The loader
+(``ML_VIT_QUANTIZATION``) only enables a variant whose report matches its artifact and reaches
+``ML_QUANT_MIN_AGREEMENT``. Dynamic-range int8 quantizes weights only, so the folder is used
+for validation, not as a representative dataset.
+"""
+
+from __future__ import annotations
+
+import argparse
+import json
+import sys
+import time
+from pathlib import Path
+
+import numpy as np
+from PIL import Image
+
+from fashion_ml.backends import QUANTIZATION_VARIANTS, TFLiteBackend, quantization_report_path, quantized_path
+from fashion_ml.checksums import file_sha256
+from fashion_ml.config import ALLOWED_EXTENSIONS, QUANT_MIN_AGREEMENT, VIT_MODEL_PATH
+from fashion_ml.image_ops import preprocess_image
+
+_CHUNK = 16
+
+
+def _image_batches(images: Path, input_size: int):
+    paths = [p for p in sorted(images.rglob("*")) if p.is_file() and p.suffix.lower().lstrip(".") in ALLOWED_EXTENSIONS]
+    for i in range(0, len(paths), _CHUNK):
+        arrs = []
+        for p in paths[i : i + _CHUNK]:
+            try:
+                with Image.open(p) as im:
+                    arrs.append(preprocess_image(im.convert("RGB"), target_size=input_size, normalize=False))
+            except Exception as e:
+                print(f"skip {p}: {e}", file=sys.stderr)
+        if arrs:
+            yield np.concatenate(arrs, axis=0)
+
+
+def build_and_validate(
+    keras_path: Path,
+    variant: str,
+    images: Path,
+    min_agreement: float = QUANT_MIN_AGREEMENT,
+) -> dict:
+    """Convert ``keras_path`` to the ``variant`` TFLite model, validate it on ``images``, write the report."""
+    from fashion_ml.export import keras_logits, load_keras_model, to_tflite
+
+    if variant not in QUANTIZATION_VARIANTS:
+        raise ValueError(f"unknown quantization variant: {variant}")
+    model, input_size = load_keras_model(keras_path)
+    out = quantized_path(keras_path, variant)
+    to_tflite(model, input_size, out, quantization=variant)
+    quant = TFLiteBackend(out)
+
+    n = agree = 0
+    max_diff = 0.0
+    t_ref = t_quant = 0.0
+    for batch in _image_batches(images, input_size):
+        t0 = time.perf_counter()
+        ref = keras_logits(model, batch).reshape(batch.shape[0], -1)
+        t1 = time.perf_counter()
+        got = np.asarray(quant.predict(batch)).reshape(batch.shape[0], -1)
+        t2 = time.perf_counter()
+        t_ref += t1 - t0
+        t_quant += t2 - t1
+        n += batch.shape[0]
+        agree += int(np.sum(np.argmax(ref, axis=1) == np.argmax(got, axis=1)))
+        max_diff = max(max_diff, float(np.max(np.abs(ref - got))))
+    if n == 0:
+        raise ValueError(f"no readable images in {images}")
+
+    agreement = agree / n
+    report = {
+        "variant": variant,
+        "artifact": out.name,
+        "artifact_sha256": file_sha256(out),
+        "artifact_bytes": out.stat().st_size,
+        "source": Path(keras_path).name,
+        "source_bytes": Path(keras_path).stat().st_size,
+        "images": n,
+        "top1_agreement": agreement,
+        "max_abs_logit_diff": max_diff,
+        "min_agreement": min_agreement,
+        "passed": agreement >= min_agreement,
+        "ms_per_image": {"float32": t_ref * 1000.0 / n, variant: t_quant * 1000.0 / n},
+        "created_at": time.strftime("%Y-%m-%dT%H:%M:%SZ", time.gmtime()),
+    }
+    quantization_report_path(keras_path, variant).write_text(json.dumps(report, indent=2), encoding="utf-8")
+    return report
+
+
+def check_report(keras_path: Path, variant: str, min_agreement: float = QUANT_MIN_AGREEMENT) -> tuple[bool, str, dict]:
+    """``(ok, reason, report)`` for enabling the ``variant`` artifact next to ``keras_path``."""
+    artifact = quantized_path(keras_path, variant)
+    report_path = quantization_report_path(keras_path, variant)
+    if not artifact.is_file():
+        return False, f"{artifact.name} not found", {}
+    if not report_path.is_file():
+        return False, f"{report_path.name} not found (run python -m fashion_ml.quantize)", {}
+    try:
+        report = json.loads(report_path.read_text(encoding="utf-8"))
+    except (OSError, ValueError) as e:
+        return False, f"unreadable report: {e}", {}
+    if report.get("artifact_sha256") != file_sha256(artifact):
+        return False, "report does not match the artifact (re-run validation)", report
+    agreement = float(report.get("top1_agreement") or 0.0)
+    if agreement < min_agreement:
+        return False, f"top-1 agreement {agreement:.2%} < required {min_agreement:.2%}", report
+    return True, "ok", report
+
+
+def main(argv: list[str] | None = None) -> int:
+    parser = argparse.ArgumentParser(description="Build and validate quantized TFLite variants of the ViT.")
+    parser.add_argument("--images", type=Path, required=True, help="folder of validation images")
+    parser.add_argument("--model", type=Path, default=VIT_MODEL_PATH)
+    parser.add_argument("--variants", default=",".join(QUANTIZATION_VARIANTS))
+    parser.add_argument("--min-agreement", type=float, default=QUANT_MIN_AGREEMENT)
+    args = parser.parse_args(argv)
+
+    if not args.images.is_dir():
+        parser.error(f"not a directory: {args.images}")
+    variants = [v.strip() for v in args.variants.split(",") if v.strip()]
+    ok = True
+    for variant in variants:
+        try:
+            r = build_and_validate(args.model, variant, args.images, args.min_agreement)
+        except Exception as e:
+            print(f"[quantize] {variant} FAILED: {e}", flush=True)
+            ok = False
+            continue
+        ok = ok and r["passed"]
+        print(
+            f"[quantize] {variant}: {r['artifact_bytes'] / (1024 * 1024):.1f} MB "
+            f"(float32 .keras {r['source_bytes'] / (1024 * 1024):.1f} MB), {r['images']} images, "
+            f"top-1 agreement {r['top1_agreement']:.2%}, max |Δlogit| {r['max_abs_logit_diff']:.3f}, "
+            f"{r['ms_per_image'][variant]:.1f} vs {r['ms_per_image']['float32']:.1f} ms/image "
+            f"-> {'ENABLED' if r['passed'] else 'REFUSED'}",
+            flush=True,
+        )
+    return 0 if ok else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,95 @@
+"""Startup readiness state machine shared by the Flask, FastAPI and HF Space entry points.
+
+``starting -> downloading -> loading -> warming -> ready`` (or ``failed`` from any stage).
+Servers bind their port first and run ``run_startup`` in a background thread; ``/health``
+reports the snapshot and ``/ready`` answers 503 until the state is ``ready``.
+"""
+
+from __future__ import annotations
+
+import threading
+import time
+from typing import Callable
+
+STATES = ("starting", "downloading", "loading", "warming", "ready", "failed")
+
+
+class Readiness:
+    """Current startup state plus the wall time spent in each stage so far."""
+
+    def __init__(self) -> None:
+        self._lock = threading.Lock()
+        self._t0 = time.perf_counter()
+        self._stage_started = self._t0
+        self.state = "starting"
+        self.error: str | None = None
+        self.stages: dict[str, float] = {}
+        self.ready_after_s: float | None = None
+
+    def enter(self, state: str) -> None:
+        if state not in STATES:
+            raise ValueError(f"unknown readiness state {state!r}")
+        now = time.perf_counter()
+        with self._lock:
+            self.stages[self.state] = round(self.stages.get(self.state, 0.0) + now - self._stage_started, 4)
+            self.state = state
+            self._stage_started = now
+            if state == "ready":
+                self.ready_after_s = round(now - self._t0, 4)
+        print(f"[startup] {state} (+{now - self._t0:.2f}s)", flush=True)
+
+    def fail(self, error: str) -> None:
+        self.error = error[:500]
+        self.enter("failed")
+
+    @property
+    def is_ready(self) -> bool:
+        return self.state == "ready"
+
+    def snapshot(self) -> dict:
+        now = time.perf_counter()
+        with self._lock:
+            stages = dict(self.stages)
+            if self.state not in ("ready", "failed"):
+                stages[self.state] = round(stages.get(self.state, 0.0) + now - self._stage_started, 4)
+            return {
+                "state": self.state,
+                "ready": self.state == "ready",
+                "error": self.error,
+                "stage_seconds": stages,
+                "ready_after_s": self.ready_after_s,
+                "uptime_s": round(now - self._t0, 3),
+            }
+
+
+readiness = Readiness()
+
+
+def run_startup(load: Callable[[], None], download: Callable[[], None] | None = None) -> bool:
+    """Download (optional), load and warm the ViT, moving ``readiness`` along; True when ready."""
+    from fashion_ml.model_loader import models
+
+    try:
+        if download is not None:
+            readiness.enter("downloading")
+            download()
+        readiness.enter("loading")
+        load()
+        if not models.is_loaded:
+            readiness.fail(models.load_error_vit or "ViT model did not load")
+            return False
+        readiness.enter("warming")
+        models.warmup()
+        readiness.enter("ready")
+        return True
+    except Exception as e:
+        print(f"❌ Startup failed: {e}", flush=True)
+        readiness.fail(str(e))
+        return False
+
+
+def start_background(load: Callable[[], None], download: Callable[[], None] | None = None) -> threading.Thread:
+    """``run_startup`` in a daemon thread so the server can accept connections meanwhile."""
+    t = threading.Thread(target=run_startup, args=(load, download), name="model-startup", daemon=True)
+    t.start()
+    return t
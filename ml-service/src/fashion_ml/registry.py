@@ -0,0 +1,206 @@
+"""Local model registry and zero-downtime hot swap.
+
+Layout of ``ML_MODEL_REGISTRY_DIR``::
+
+    registry/
+        2025-03-17.keras    # one archive per version; the file stem is the version name
+        2025-05-02.keras
+        ACTIVE              # version to serve (optional; boot falls back to ML_VIT_PATH)
+
+``activate`` loads the version into a separate ``MLModels`` in a background thread, warms it,
+then ``models.swap_in`` switches serving over in one assignment: requests already in their
+forward pass finish on the old weights, which are released once drained. ``model_file`` in
+every response and in ``/health`` names the active version. The result cache and the
+near-duplicate index key on the model file, so entries from the old version stop matching.
+"""
+
+from __future__ import annotations
+
+import hmac
+import os
+import re
+import threading
+import time
+from pathlib import Path
+
+from fashion_ml.config import ADMIN_TOKEN, MODEL_REGISTRY_DIR, MODEL_REGISTRY_POLL_S
+from fashion_ml.model_loader import MLModels, models
+
+ACTIVE_FILE = "ACTIVE"
+ADMIN_TOKEN_HEADER = "X-Admin-Token"
+_VERSION_RE = re.compile(r"^[A-Za-z0-9][A-Za-z0-9._-]{0,127}$")
+
+
+class UnknownVersion(LookupError):
+    """No ``<version>.keras`` in the registry; apps answer 404."""
+
+
+class SwapInProgress(RuntimeError):
+    """Another version is still loading; apps answer 409."""
+
+
+def admin_authorized(token: str | None) -> bool:
+    """``X-Admin-Token`` check; always False while ``ML_ADMIN_TOKEN`` is unset."""
+    return bool(ADMIN_TOKEN) and token is not None and hmac.compare_digest(token.encode(), ADMIN_TOKEN.encode())
+
+
+class ModelRegistry:
+    """Versions under ``root`` and the state of the last (or current) hot swap."""
+
+    def __init__(self, root: Path = MODEL_REGISTRY_DIR) -> None:
+        self.root = Path(root)
+        self._swap_lock = threading.Lock()
+        self._watcher: threading.Thread | None = None
+        self.swaps = 0
+        self.last_swap: dict = {"state": "idle"}
+
+    def path_for(self, version: str) -> Path:
+        if not isinstance(version, str) or not _VERSION_RE.match(version):
+            raise UnknownVersion(f"invalid version name: {version!r}")
+        path = self.root / f"{version}.keras"
+        if not path.is_file():
+            raise UnknownVersion(f"version {version!r} not found in {self.root}")
+        return path
+
+    def versions(self) -> list[dict]:
+        try:
+            files = sorted(p for p in self.root.glob("*.keras") if p.is_file())
+        except OSError:
+            return []
+        active = self.active_version()
+        out = []
+        for p in files:
+            st = p.stat()
+            out.append(
+                {
+                    "version": p.stem,
+                    "file": p.name,
+                    "size_mb": round(st.st_size / (1024 * 1024), 1),
+                    "modified": time.strftime("%Y-%m-%dT%H:%M:%SZ", time.gmtime(st.st_mtime)),
+                    "active": p.stem == active,
+                }
+            )
+        return out
+
+    def pinned(self) -> str | None:
+        """Version named in ``ACTIVE``, if any."""
+        try:
+            version = (self.root / ACTIVE_FILE).read_text(encoding="utf-8").strip()
+        except OSError:
+            return None
+        return version or None
+
+    def pin(self, version: str) -> None:
+        """Point ``ACTIVE`` at ``version`` (atomic rename, so the watcher never reads half a name)."""
+        tmp = self.root / f".{ACTIVE_FILE}.{os.getpid()}.tmp"
+        tmp.write_text(version + "\n", encoding="utf-8")
+        os.replace(tmp, self.root / ACTIVE_FILE)
+
+    def boot_path(self, default: Path) -> Path:
+        """Model to load at startup: the pinned version when it exists, else ``default``."""
+        version = self.pinned()
+        if version is None:
+            return Path(default)
+        try:
+            return self.path_for(version)
+        except UnknownVersion as e:
+            print(f"⚠️  Registry ACTIVE ignored: {e}; booting {Path(default).name}", flush=True)
+            return Path(default)
+
+    def active_version(self) -> str | None:
+        """Registry version being served, or ``None`` when serving a file from outside the registry."""
+        path = models.model_path
+        try:
+            in_registry = path.parent.resolve() == self.root.resolve()
+        except OSError:
+            return None
+        return path.stem if in_registry and models.is_loaded else None
+
+    def activate(self, version: str, pin: bool = True) -> threading.Thread:
+        """Start loading ``version`` in the background; it replaces the served model once warm.
+
+        With ``pin``, ``ACTIVE`` is pointed at ``version`` after the swap succeeds (never on failure).
+        """
+        path = self.path_for(version)
+        if not self._swap_lock.acquire(blocking=False):
+            raise SwapInProgress(f"swap to {self.last_swap.get('version')!r} still in progress")
+        try:
+            self.last_swap = {"state": "loading", "version": version, "started": time.time(), "error": None}
+            t = threading.Thread(target=self._swap, args=(version, path, pin), name="model-swap", daemon=True)
+            t.start()
+        except BaseException:
+            self._swap_lock.release()
+            raise
+        return t
+
+    def _swap(self, version: str, path: Path, pin: bool) -> None:
+        t0 = time.perf_counter()
+        previous = models.model_path.name
+        try:
+            print(f"[registry] loading {path.name} (serving {previous})", flush=True)
+            candidate = MLModels()
+            candidate.load_classification_model(path)
+            if not candidate.is_loaded:
+                raise RuntimeError(candidate.load_error_vit or f"{path.name} did not load")
+            self.last_swap["state"] = "warming"
+            candidate.warmup()
+            self.last_swap["state"] = "swapping"
+            models.swap_in(candidate)
+            del candidate
+            if pin:  # only a version that loaded and warmed is booted on the next restart
+                try:
+                    self.pin(version)
+                except OSError as e:
+                    print(f"⚠️  Serving {path.name} but could not write {ACTIVE_FILE}: {e}", flush=True)
+            self.swaps += 1
+            self.last_swap.update(state="swapped", previous=previous, seconds=round(time.perf_counter() - t0, 3))
+            print(f"✅ Now serving {path.name} (was {previous}, {time.perf_counter() - t0:.1f}s)", flush=True)
+        except Exception as e:
+            self.last_swap.update(state="failed", error=str(e)[:500], seconds=round(time.perf_counter() - t0, 3))
+            print(f"❌ Swap to {path.name} failed, still serving {previous}: {e}", flush=True)
+        finally:
+            self._swap_lock.release()
+
+    def status(self) -> dict:
+        return {
+            "registry_dir": str(self.root),
+            "model_file": models.model_path.name,
+            "active_version": self.active_version(),
+            "pinned": self.pinned(),
+            "swaps": self.swaps,
+            "last_swap": dict(self.last_swap),
+            "watching": self._watcher is not None,
+            "versions": self.versions(),
+        }
+
+    def start_watching(self, interval_s: float = MODEL_REGISTRY_POLL_S) -> threading.Thread | None:
+        """Poll ``ACTIVE`` every ``interval_s`` and swap when it names another version (0 disables)."""
+        if interval_s <= 0 or self._watcher is not None:
+            return self._watcher
+        self._watcher = threading.Thread(target=self._watch, args=(interval_s,), name="model-registry", daemon=True)
+        self._watcher.start()
+        print(f"[registry] watching {self.root / ACTIVE_FILE} every {interval_s:g}s", flush=True)
+        return self._watcher
+
+    def _watch(self, interval_s: float) -> None:
+        from fashion_ml.readiness import readiness
+
+        tried: str | None = None
+        while True:
+            time.sleep(interval_s)
+            version = self.pinned()
+            if version is None or not readiness.is_ready or self._swap_lock.locked():
+                continue
+            if version == models.model_path.stem and self.active_version() is not None:
+                tried = None
+                continue
+            if version == tried:
+                continue  # failed (or unknown) once already; wait for ACTIVE to change
+            tried = version
+            try:
+                self.activate(version, pin=False)
+            except (UnknownVersion, SwapInProgress) as e:
+                print(f"⚠️  Registry ACTIVE not applied: {e}", flush=True)
+
+
+registry = ModelRegistry()
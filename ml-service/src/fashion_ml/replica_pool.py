@@ -0,0 +1,110 @@
+"""Pool of model replicas: requests check out a free replica instead of contending on one lock."""
+
+from __future__ import annotations
+
+import os
+import queue
+import threading
+import time
+from contextlib import contextmanager
+
+from fashion_ml.backends import InferenceBackend
+
+
+class _Replica:
+    __slots__ = ("index", "backend", "calls", "items", "busy_s")
+
+    def __init__(self, index: int, backend: InferenceBackend) -> None:
+        self.index = index
+        self.backend = backend
+        self.calls = 0
+        self.items = 0
+        self.busy_s = 0.0
+
+
+class ReplicaPool:
+    """Fixed set of backends, each used by at most one thread at a time.
+
+    ``checkout`` blocks only while every replica is busy; per-replica call and item counts, busy
+    time and utilization (busy time / pool uptime) are kept for ``/health``.
+    """
+
+    def __init__(self, backends: list[InferenceBackend], threads_per_replica: int | None = None) -> None:
+        if not backends:
+            raise ValueError("ReplicaPool needs at least one backend")
+        self._replicas = [_Replica(i, b) for i, b in enumerate(backends)]
+        self._free: queue.Queue[_Replica] = queue.Queue()
+        for r in self._replicas:
+            self._free.put(r)
+        self._stats_lock = threading.Lock()
+        self._started = time.monotonic()
+        self.threads_per_replica = threads_per_replica
+        self.wait_s = 0.0
+        self.memory_estimate: dict = {}
+
+    def __len__(self) -> int:
+        return len(self._replicas)
+
+    @property
+    def primary(self) -> InferenceBackend:
+        return self._replicas[0].backend
+
+    @contextmanager
+    def checkout(self, items: int = 0):
+        """A free replica for the ``with`` block; ``items`` is the batch size it is about to run."""
+        t0 = time.perf_counter()
+        replica = self._free.get()
+        t1 = time.perf_counter()
+        try:
+            yield replica
+        finally:
+            busy = time.perf_counter() - t1
+            with self._stats_lock:
+                replica.calls += 1
+                replica.items += items
+                replica.busy_s += busy
+                self.wait_s += t1 - t0
+            self._free.put(replica)
+
+    def stats(self) -> dict:
+        uptime = max(time.monotonic() - self._started, 1e-9)
+        with self._stats_lock:
+            return {
+                "size": len(self._replicas),
+                "free": self._free.qsize(),
+                "threads_per_replica": self.threads_per_replica,
+                "total_wait_s": round(self.wait_s, 4),
+                "memory_estimate": self.memory_estimate,
+                "replicas": [
+                    {
+                        "index": r.index,
+                        "backend": r.backend.name,
+                        "calls": r.calls,
+                        "items": r.items,
+                        "busy_s": round(r.busy_s, 4),
+                        "utilization": round(r.busy_s / uptime, 4),
+                    }
+                    for r in self._replicas
+                ],
+            }
+
+
+def host_memory_bytes() -> int | None:
+    try:
+        return os.sysconf("SC_PAGE_SIZE") * os.sysconf("SC_PHYS_PAGES")
+    except (AttributeError, ValueError, OSError):
+        return None
+
+
+def estimate_pool_memory(per_replica_bytes: int, replicas: int, shared_weights: bool) -> dict:
+    """Weights footprint of ``replicas`` copies (one copy when weights are shared) vs host RAM."""
+    total = per_replica_bytes * (1 if shared_weights else replicas)
+    host = host_memory_bytes()
+    return {
+        "per_replica_mb": round(per_replica_bytes / (1024 * 1024), 1),
+        "replicas": replicas,
+        "shared_weights": shared_weights,
+        "total_weights_mb": round(total / (1024 * 1024), 1),
+        "host_mb": round(host / (1024 * 1024), 1) if host else None,
+        "fraction_of_host": round(total / host, 3) if host else None,
+    }
@@ -0,0 +1,300 @@
+"""Classification result caches: exact (upload hash, LRU + disk tier) and near-duplicate (dHash)."""
+
+from __future__ import annotations
+
+import json
+import os
+import tempfile
+import threading
+import time
+from collections import OrderedDict
+from pathlib import Path
+
+import numpy as np
+
+from fashion_ml.config import (
+    COLOR_MODE,
+    PHASH_INDEX_ENABLED,
+    PHASH_INDEX_SIZE,
+    PHASH_MAX_COLOR_DELTA,
+    PHASH_MAX_DISTANCE,
+    RESULT_CACHE_DIR,
+    RESULT_CACHE_DISK_MAX_BYTES,
+    RESULT_CACHE_SIZE,
+    RESULT_CACHE_TTL_S,
+    VIT_MODEL_PATH,
+)
+from fashion_ml.uploads import SpooledUpload, content_hasher
+
+# Disk tier is pruned every N writes rather than on every put.
+_DISK_PRUNE_EVERY = 256
+
+
+def model_identity(path: Path) -> str:
+    """``<name>:<mtime_ns>:<size>`` so a replaced weights file never serves stale results."""
+    try:
+        st = path.stat()
+        return f"{path.name}:{st.st_mtime_ns}:{st.st_size}"
+    except OSError:
+        return f"{path.name}:missing"
+
+
+class ResultCache:
+    """LRU + TTL cache of response bodies, keyed by SHA-256 of the raw upload and model identity.
+
+    Bodies are stored as their JSON text and parsed on every hit, so callers always get a
+    fresh dict that serializes to exactly the same bytes as the original response.
+    """
+
+    def __init__(
+        self,
+        max_entries: int = RESULT_CACHE_SIZE,
+        ttl_s: float = RESULT_CACHE_TTL_S,
+        disk_dir: str | Path | None = RESULT_CACHE_DIR or None,
+        disk_max_bytes: int = RESULT_CACHE_DISK_MAX_BYTES,
+    ) -> None:
+        self.max_entries = max_entries
+        self.ttl_s = ttl_s
+        self.disk_dir = Path(disk_dir) if disk_dir else None
+        self.disk_max_bytes = disk_max_bytes
+        self._entries: OrderedDict[str, tuple[float, str]] = OrderedDict()
+        self._lock = threading.Lock()
+        self._disk_writes = 0
+        self.hits = 0
+        self.disk_hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.expirations = 0
+
+    @property
+    def enabled(self) -> bool:
+        return self.max_entries > 0 or self.disk_dir is not None
+
+    def key_for(self, raw: bytes | SpooledUpload, model_path: Path = VIT_MODEL_PATH) -> str:
+        h = content_hasher(raw)
+        h.update(b"\0")
+        h.update(model_identity(Path(model_path)).encode("utf-8"))
+        h.update(b"\0")
+        h.update(COLOR_MODE.encode("utf-8"))
+        return h.hexdigest()
+
+    def _expired(self, stored_at: float, now: float) -> bool:
+        return self.ttl_s > 0 and now - stored_at > self.ttl_s
+
+    def get(self, key: str) -> dict | None:
+        now = time.time()
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                stored_at, text = entry
+                if self._expired(stored_at, now):
+                    del self._entries[key]
+                    self.expirations += 1
+                else:
+                    self._entries.move_to_end(key)
+                    self.hits += 1
+                    return json.loads(text)
+        disk = self._disk_get(key, now)
+        if disk is not None:
+            stored_at, text = disk
+            self._remember(key, stored_at, text)
+            with self._lock:
+                self.disk_hits += 1
+            return json.loads(text)
+        with self._lock:
+            self.misses += 1
+        return None
+
+    def put(self, key: str, body: dict) -> None:
+        text = json.dumps(body, ensure_ascii=False)
+        now = time.time()
+        self._remember(key, now, text)
+        self._disk_put(key, text)
+
+    def _remember(self, key: str, stored_at: float, text: str) -> None:
+        if self.max_entries <= 0:
+            return
+        with self._lock:
+            self._entries[key] = (stored_at, text)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+
+    def _disk_path(self, key: str) -> Path:
+        assert self.disk_dir is not None
+        return self.disk_dir / key[:2] / f"{key}.json"
+
+    def _disk_get(self, key: str, now: float) -> tuple[float, str] | None:
+        if self.disk_dir is None:
+            return None
+        path = self._disk_path(key)
+        try:
+            stored_at = path.stat().st_mtime
+            if self._expired(stored_at, now):
+                path.unlink(missing_ok=True)
+                with self._lock:
+                    self.expirations += 1
+                return None
+            return stored_at, path.read_text(encoding="utf-8")
+        except OSError:
+            return None
+
+    def _disk_put(self, key: str, text: str) -> None:
+        if self.disk_dir is None:
+            return
+        path = self._disk_path(key)
+        try:
+            path.parent.mkdir(parents=True, exist_ok=True)
+            fd, tmp = tempfile.mkstemp(dir=str(path.parent), suffix=".tmp")
+            with os.fdopen(fd, "w", encoding="utf-8") as f:
+                f.write(text)
+            os.replace(tmp, path)
+        except OSError as e:
+            print(f"[cache] disk write failed: {e}", flush=True)
+            return
+        with self._lock:
+            self._disk_writes += 1
+            prune = self._disk_writes % _DISK_PRUNE_EVERY == 0
+        if prune:
+            self.prune_disk()
+
+    def prune_disk(self) -> None:
+        """Drop expired files, then oldest files until the tier fits ``disk_max_bytes``."""
+        if self.disk_dir is None or not self.disk_dir.is_dir():
+            return
+        now = time.time()
+        files = []
+        for p in self.disk_dir.glob("*/*.json"):
+            try:
+                st = p.stat()
+            except OSError:
+                continue
+            if self._expired(st.st_mtime, now):
+                p.unlink(missing_ok=True)
+                continue
+            files.append((st.st_mtime, st.st_size, p))
+        total = sum(size for _, size, _ in files)
+        for _, size, p in sorted(files):
+            if total <= self.disk_max_bytes:
+                break
+            p.unlink(missing_ok=True)
+            total -= size
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self) -> dict:
+        with self._lock:
+            lookups = self.hits + self.disk_hits + self.misses
+            return {
+                "enabled": self.enabled,
+                "entries": len(self._entries),
+                "max_entries": self.max_entries,
+                "ttl_s": self.ttl_s,
+                "disk_dir": str(self.disk_dir) if self.disk_dir else None,
+                "hits": self.hits,
+                "disk_hits": self.disk_hits,
+                "misses": self.misses,
+                "hit_rate": ((self.hits + self.disk_hits) / lookups) if lookups else 0.0,
+                "evictions": self.evictions,
+                "expirations": self.expirations,
+            }
+
+
+def _popcount64(x: np.ndarray) -> np.ndarray:
+    if hasattr(np, "bitwise_count"):
+        return np.bitwise_count(x)
+    return np.unpackbits(x.view(np.uint8).reshape(-1, 8), axis=1).sum(axis=1)
+
+
+class NearDuplicateIndex:
+    """Fixed-capacity table of perceptual signature -> response, answered within a Hamming distance.
+
+    A signature is ``(dhash, mean_rgb)`` from ``image_ops.perceptual_signature``; a match needs
+    the hash within ``max_distance`` bits and every mean channel within ``max_color_delta``.
+    Hashes live in one preallocated ``uint64`` array, so a lookup is a single vectorized XOR +
+    popcount over at most ``capacity`` entries. When full, the least recently used slot is
+    overwritten. Entries are scoped to one model identity; a new identity clears the table.
+    """
+
+    def __init__(
+        self,
+        capacity: int = PHASH_INDEX_SIZE,
+        max_distance: int = PHASH_MAX_DISTANCE,
+        max_color_delta: int = PHASH_MAX_COLOR_DELTA,
+        enabled: bool = PHASH_INDEX_ENABLED,
+    ) -> None:
+        self.enabled = enabled
+        self.capacity = capacity
+        self.max_distance = max_distance
+        self.max_color_delta = max_color_delta
+        self._hashes = np.zeros(capacity, dtype=np.uint64)
+        self._colors = np.zeros((capacity, 3), dtype=np.int16)
+        self._used = np.zeros(capacity, dtype=np.int64)  # 0 = empty slot, else LRU tick
+        self._bodies: list[str | None] = [None] * capacity
+        self._identity: str | None = None
+        self._tick = 0
+        self._lock = threading.Lock()
+        self.lookups = 0
+        self.short_circuits = 0
+        self.evictions = 0
+
+    def _scope(self, identity: str) -> None:
+        if identity != self._identity:
+            self._used[:] = 0
+            self._bodies = [None] * self.capacity
+            self._identity = identity
+
+    def lookup(self, signature: tuple[int, tuple[int, int, int]], identity: str) -> dict | None:
+        phash, mean_rgb = signature
+        with self._lock:
+            self._scope(identity)
+            self.lookups += 1
+            color_delta = np.abs(self._colors - np.asarray(mean_rgb, dtype=np.int16)).max(axis=1)
+            live = (self._used > 0) & (color_delta <= self.max_color_delta)
+            if not live.any():
+                return None
+            dist = _popcount64(self._hashes ^ np.uint64(phash))
+            dist = np.where(live, dist, 65)
+            slot = int(np.argmin(dist))
+            if int(dist[slot]) > self.max_distance:
+                return None
+            self._tick += 1
+            self._used[slot] = self._tick
+            self.short_circuits += 1
+            return json.loads(self._bodies[slot])
+
+    def add(self, signature: tuple[int, tuple[int, int, int]], identity: str, body: dict) -> None:
+        phash, mean_rgb = signature
+        text = json.dumps(body, ensure_ascii=False)
+        with self._lock:
+            self._scope(identity)
+            slot = int(np.argmin(self._used))
+            if self._used[slot] > 0:
+                self.evictions += 1
+            self._tick += 1
+            self._hashes[slot] = np.uint64(phash)
+            self._colors[slot] = mean_rgb
+            self._used[slot] = self._tick
+            self._bodies[slot] = text
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                "enabled": self.enabled,
+                "entries": int(np.count_nonzero(self._used)),
+                "capacity": self.capacity,
+                "max_distance": self.max_distance,
+                "max_color_delta": self.max_color_delta,
+                "lookups": self.lookups,
+                "short_circuits": self.short_circuits,
+                "short_circuit_rate": (self.short_circuits / self.lookups) if self.lookups else 0.0,
+                "evictions": self.evictions,
+            }
+
+
+# Process-wide caches used by fashion_ml.pipeline
+result_cache = ResultCache()
+near_duplicates = NearDuplicateIndex()
@@ -0,0 +1,120 @@
+"""Graph-compiled ViT serving path: one traced inference function per fixed batch size."""
+
+from __future__ import annotations
+
+import time
+from typing import Any
+
+import numpy as np
+
+# Max abs logit difference accepted between the compiled path and model.predict at warmup.
+PARITY_TOLERANCE = 1e-3
+
+
+def inference_fn(model: Any):
+    """Plain-Python forward used for tracing (serving) and export: preprocessor, call, first output."""
+    preprocessor = getattr(model, "preprocessor", None)
+
+    def infer(x):
+        if preprocessor is not None:
+            x = preprocessor(x)
+        out = model(x, training=False)
+        if isinstance(out, dict):
+            out = next(iter(out.values()))
+        if isinstance(out, (list, tuple)):
+            out = out[0]
+        return out
+
+    return infer
+
+
+def embedding_fn(model: Any):
+    """Forward up to the input of the classification head (the last top-level ``Dense``).
+
+    Returns ``None`` when the model has no such layer. The keras-hub ``preprocessor`` runs first,
+    as in ``inference_fn``; the feature model shares the loaded weights.
+    """
+    import keras
+
+    head = next((layer for layer in reversed(model.layers) if type(layer).__name__ == "Dense"), None)
+    if head is None:
+        return None
+    inputs = model.inputs[0] if len(model.inputs) == 1 else model.inputs
+    features = keras.Model(inputs, head.input)
+    preprocessor = getattr(model, "preprocessor", None)
+
+    def embed(x):
+        if preprocessor is not None:
+            x = preprocessor(x)
+        return features(x, training=False)
+
+    return embed
+
+
+class CompiledPredictor:
+    """Wraps a loaded Keras model in ``tf.function`` concrete functions for ``batch_sizes``.
+
+    Inputs are padded up to the nearest traced batch size (and split when larger than the
+    biggest one), so serving never retraces and skips ``Model.predict``'s per-call data adapter
+    and predict loop. If the model carries a keras-hub ``preprocessor`` it runs inside the trace,
+    matching what ``predict`` applies.
+    """
+
+    def __init__(self, model: Any, input_size: int, batch_sizes: tuple[int, ...] = (1, 2, 4, 8)) -> None:
+        import tensorflow as tf
+
+        self._tf = tf
+        self.input_size = int(input_size)
+        self.batch_sizes = tuple(sorted(set(batch_sizes)))
+        infer = tf.function(inference_fn(model), autograph=False)
+        self._concrete = {
+            b: infer.get_concrete_function(tf.TensorSpec([b, self.input_size, self.input_size, 3], tf.float32))
+            for b in self.batch_sizes
+        }
+        self.warmup_seconds: float | None = None
+        self.warmup_by_batch: dict[int, float] = {}
+
+    def _bucket(self, n: int) -> int:
+        for b in self.batch_sizes:
+            if b >= n:
+                return b
+        return self.batch_sizes[-1]
+
+    def _run(self, batch: np.ndarray) -> np.ndarray:
+        n = batch.shape[0]
+        b = self._bucket(n)
+        if b != n:
+            padded = np.zeros((b,) + batch.shape[1:], dtype=np.float32)
+            padded[:n] = batch
+            batch = padded
+        out = self._concrete[b](self._tf.constant(batch, dtype=self._tf.float32))
+        return np.asarray(out)[:n]
+
+    def predict(self, batch: np.ndarray) -> np.ndarray:
+        step = self.batch_sizes[-1]
+        if batch.shape[0] <= step:
+            return self._run(batch)
+        return np.concatenate([self._run(batch[i : i + step]) for i in range(0, batch.shape[0], step)], axis=0)
+
+    def warmup(self) -> float:
+        """Run every traced signature once; returns total seconds (also kept on the instance)."""
+        t0 = time.perf_counter()
+        for b in self.batch_sizes:
+            t = time.perf_counter()
+            self._run(np.zeros((b, self.input_size, self.input_size, 3), dtype=np.float32))
+            self.warmup_by_batch[b] = round(time.perf_counter() - t, 4)
+        self.warmup_seconds = time.perf_counter() - t0
+        return self.warmup_seconds
+
+    def max_abs_diff(self, model: Any) -> float:
+        """Compare against ``model.predict`` on one random image (values in [0, 255])."""
+        rng = np.random.default_rng(0)
+        x = rng.uniform(0, 255, size=(1, self.input_size, self.input_size, 3)).astype(np.float32)
+        ref = model.predict(x, verbose=0)
+        if isinstance(ref, (list, tuple)):
+            ref = ref[0]
+        ref = np.asarray(ref).reshape(1, -1)
+        got = self._run(x).reshape(1, -1)
+        if ref.shape != got.shape:
+            return float("inf")
+        return float(np.max(np.abs(ref - got)))
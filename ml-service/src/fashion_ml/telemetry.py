@@ -0,0 +1,197 @@
+"""Per-stage latency histograms and request counters, rendered in Prometheus text format.
+
+Stages timed along the classify pipeline: ``upload_read``, ``decode``, ``color``,
+``preprocess``, ``lock_wait`` (model lock or replica checkout), ``forward`` and
+``response_build``. Exposed on ``GET /metrics/prom`` by the Flask and FastAPI apps;
+dependency-free so it also runs where ``prometheus_client`` is not installed.
+"""
+
+from __future__ import annotations
+
+import bisect
+import threading
+import time
+from collections import defaultdict
+from contextlib import contextmanager
+
+PROMETHEUS_CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+# Seconds; covers sub-millisecond cache paths up to multi-second cold forward passes.
+LATENCY_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+_PREFIX = "fashion_ml"
+
+
+def _labels(names: tuple[str, ...], values: tuple[str, ...], extra: str = "") -> str:
+    parts = [f'{n}="{_escape(v)}"' for n, v in zip(names, values)]
+    if extra:
+        parts.append(extra)
+    return "{" + ",".join(parts) + "}" if parts else ""
+
+
+def _escape(value: str) -> str:
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def _fmt(value: float) -> str:
+    if value == float("inf"):
+        return "+Inf"
+    return repr(float(value)) if not float(value).is_integer() else str(int(value))
+
+
+class Histogram:
+    """Cumulative-bucket histogram keyed by a tuple of label values."""
+
+    def __init__(self, name: str, help_text: str, labelnames: tuple[str, ...], buckets=LATENCY_BUCKETS) -> None:
+        self.name = name
+        self.help = help_text
+        self.labelnames = labelnames
+        self.buckets = tuple(sorted(buckets))
+        self._lock = threading.Lock()
+        self._series: dict[tuple[str, ...], list] = {}
+
+    def observe(self, value: float, *labels: str) -> None:
+        i = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            series = self._series.get(labels)
+            if series is None:
+                series = self._series[labels] = [[0] * (len(self.buckets) + 1), 0.0, 0]
+            series[0][i] += 1
+            series[1] += value
+            series[2] += 1
+
+    def snapshot(self) -> dict[tuple[str, ...], dict]:
+        with self._lock:
+            out = {}
+            for labels, (counts, total, n) in self._series.items():
+                out[labels] = {"counts": list(counts), "sum": total, "count": n}
+            return out
+
+    def render(self) -> list[str]:
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} histogram"]
+        for labels, s in sorted(self.snapshot().items()):
+            cumulative = 0
+            for bound, c in zip(self.buckets + (float("inf"),), s["counts"]):
+                cumulative += c
+                le = _labels(self.labelnames, labels, f'le="{_fmt(bound)}"')
+                lines.append(f"{self.name}_bucket{le} {cumulative}")
+            base = _labels(self.labelnames, labels)
+            lines.append(f"{self.name}_sum{base} {_fmt(s['sum'])}")
+            lines.append(f"{self.name}_count{base} {s['count']}")
+        return lines
+
+
+class Counter:
+    def __init__(self, name: str, help_text: str, labelnames: tuple[str, ...]) -> None:
+        self.name = name
+        self.help = help_text
+        self.labelnames = labelnames
+        self._lock = threading.Lock()
+        self._values: dict[tuple[str, ...], float] = defaultdict(float)
+
+    def inc(self, *labels: str, amount: float = 1.0) -> None:
+        with self._lock:
+            self._values[labels] += amount
+
+    def value(self, *labels: str) -> float:
+        with self._lock:
+            return self._values.get(labels, 0.0)
+
+    def render(self) -> list[str]:
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} counter"]
+        with self._lock:
+            items = sorted(self._values.items())
+        for labels, v in items:
+            lines.append(f"{self.name}{_labels(self.labelnames, labels)} {_fmt(v)}")
+        return lines
+
+
+stage_seconds = Histogram(
+    f"{_PREFIX}_stage_seconds", "Latency of one classify pipeline stage.", ("stage",)
+)
+request_seconds = Histogram(
+    f"{_PREFIX}_request_seconds", "End-to-end request latency by endpoint.", ("endpoint",)
+)
+requests_total = Counter(f"{_PREFIX}_requests_total", "HTTP requests by endpoint.", ("endpoint",))
+responses_total = Counter(
+    f"{_PREFIX}_responses_total", "HTTP responses by endpoint and status code (413/503 included).", ("endpoint", "code")
+)
+errors_total = Counter(f"{_PREFIX}_errors_total", "Requests answered with a 5xx status.", ("endpoint",))
+coalesced_total = Counter(
+    f"{_PREFIX}_coalesced_total",
+    "Classify requests answered by an identical in-flight request, by that request's outcome.",
+    ("outcome",),
+)
+
+_REGISTRY = (requests_total, responses_total, errors_total, coalesced_total, request_seconds, stage_seconds)
+
+
+def observe_stage(stage: str, seconds: float) -> None:
+    stage_seconds.observe(seconds, stage)
+
+
+@contextmanager
+def stage_timer(stage: str):
+    """``with stage_timer("decode"): ...`` records the block's wall time under ``stage``."""
+    t0 = time.perf_counter()
+    try:
+        yield
+    finally:
+        stage_seconds.observe(time.perf_counter() - t0, stage)
+
+
+def record_request(endpoint: str, status: int, seconds: float) -> None:
+    requests_total.inc(endpoint)
+    responses_total.inc(endpoint, str(status))
+    if status >= 500:
+        errors_total.inc(endpoint)
+    request_seconds.observe(seconds, endpoint)
+
+
+def render_prometheus() -> str:
+    lines: list[str] = []
+    for metric in _REGISTRY:
+        lines.extend(metric.render())
+    return "\n".join(lines) + "\n"
+
+
+class MetricsMiddleware:
+    """ASGI middleware: request counters / latency per route and the ``upload_read`` stage.
+
+    ``upload_read`` is the time between the first and the last body chunk Starlette pulls
+    from the client. Paths that matched no route (404 without an endpoint) are counted as
+    ``other`` to keep label cardinality bounded.
+    """
+
+    def __init__(self, app) -> None:
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        t0 = time.perf_counter()
+        status = 500
+        body_started: float | None = None
+
+        async def timed_receive():
+            nonlocal body_started
+            message = await receive()
+            if message["type"] == "http.request":
+                if body_started is None:
+                    body_started = time.perf_counter()
+                if not message.get("more_body", False):
+                    observe_stage("upload_read", time.perf_counter() - body_started)
+            return message
+
+        async def capture_send(message):
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = int(message["status"])
+            await send(message)
+
+        try:
+            await self.app(scope, timed_receive, capture_send)
+        finally:
+            matched = scope.get("endpoint") is not None or status != 404
+            record_request(scope.get("path", "") if matched else "other", status, time.perf_counter() - t0)
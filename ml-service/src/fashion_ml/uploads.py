@@ -0,0 +1,164 @@
+"""Upload ingestion: body-size limits without buffering, spooled bodies, image-header guard.
+
+Flask (werkzeug) and FastAPI (Starlette) already spool multipart file parts to memory or a
+temp file. ``SpooledUpload`` wraps that spooled file instead of copying it into ``bytes``;
+the pipeline hashes and decodes it by streaming. ``check_image_header`` rejects unsupported
+formats and decompression bombs from the header alone, before any pixel is decoded.
+"""
+
+from __future__ import annotations
+
+import hashlib
+import io
+from typing import BinaryIO
+
+from PIL import Image
+
+from fashion_ml.config import MAX_IMAGE_PIXELS, MAX_UPLOAD_BYTES
+from fashion_ml.fast_json import dumps as json_dumps
+
+# Multipart boundaries + part headers on top of the file bytes when checking Content-Length.
+MULTIPART_SLACK = 64 * 1024
+_CHUNK = 1024 * 1024
+
+# Pillow format names accepted for classification (MPO: multi-picture JPEGs from phone cameras).
+ALLOWED_IMAGE_FORMATS = frozenset({"JPEG", "MPO", "PNG", "GIF", "WEBP", "BMP", "TIFF", "HEIF", "AVIF"})
+
+
+class UploadTooLarge(ValueError):
+    """Body, file or pixel count over the configured limit; apps answer 413."""
+
+
+class UnsupportedImage(ValueError):
+    """Not an image Pillow can identify, or a format outside ``ALLOWED_IMAGE_FORMATS``; apps answer 400."""
+
+
+class SpooledUpload:
+    """A received file part read in place from the framework's spooled file.
+
+    ``len()`` is the body size; ``hasher()`` returns a SHA-256 of the content computed once by
+    streaming; ``open()`` rewinds and returns the file for decoding. The underlying file is
+    owned (and closed) by the web framework at the end of the request.
+    """
+
+    __slots__ = ("filename", "_file", "size", "_sha256")
+
+    def __init__(self, file: BinaryIO, size: int, filename: str = "") -> None:
+        self.filename = filename
+        self._file = file
+        self.size = size
+        self._sha256 = None
+
+    @classmethod
+    def from_file(cls, file: BinaryIO, filename: str = "", limit: int | None = MAX_UPLOAD_BYTES) -> SpooledUpload:
+        """Wrap a seekable spooled file; raises ``UploadTooLarge`` above ``limit`` bytes."""
+        file.seek(0, io.SEEK_END)
+        size = file.tell()
+        file.seek(0)
+        if limit is not None and size > limit:
+            raise UploadTooLarge("File too large")
+        return cls(file, size, filename)
+
+    def __len__(self) -> int:
+        return self.size
+
+    def open(self) -> BinaryIO:
+        self._file.seek(0)
+        return self._file
+
+    def hasher(self):
+        """Copy of the SHA-256 state over the whole body (callers may keep updating it)."""
+        if self._sha256 is None:
+            h = hashlib.sha256()
+            f = self.open()
+            for chunk in iter(lambda: f.read(_CHUNK), b""):
+                h.update(chunk)
+            self._sha256 = h
+        return self._sha256.copy()
+
+
+def content_hasher(raw: bytes | SpooledUpload):
+    """SHA-256 state of an upload body, whether it is ``bytes`` or a ``SpooledUpload``."""
+    return raw.hasher() if isinstance(raw, SpooledUpload) else hashlib.sha256(raw)
+
+
+def open_upload(raw: bytes | SpooledUpload) -> BinaryIO:
+    return raw.open() if isinstance(raw, SpooledUpload) else io.BytesIO(raw)
+
+
+def check_image_header(image: Image.Image) -> None:
+    """Reject by format and pixel count using only what ``Image.open`` parsed from the header."""
+    if image.format not in ALLOWED_IMAGE_FORMATS:
+        raise UnsupportedImage(f"Unsupported image format: {image.format}")
+    width, height = image.size
+    if width <= 0 or height <= 0:
+        raise UnsupportedImage("Invalid image dimensions")
+    if width * height > MAX_IMAGE_PIXELS:
+        raise UploadTooLarge(f"Image dimensions too large ({width}x{height})")
+
+
+def open_image(raw: bytes | SpooledUpload) -> Image.Image:
+    """``Image.open`` + header checks; pixels are not decoded yet."""
+    try:
+        image = Image.open(open_upload(raw))
+    except Image.DecompressionBombError as e:
+        raise UploadTooLarge(str(e)) from e
+    except Exception as e:
+        raise UnsupportedImage("Unsupported or corrupt image") from e
+    check_image_header(image)
+    return image
+
+
+class UploadLimitMiddleware:
+    """ASGI middleware: 413 on ``Content-Length`` over the route limit, and stop reading there.
+
+    Bodies without a ``Content-Length`` (chunked) are counted as they arrive; once over the
+    limit the next ``receive`` raises a 413 ``HTTPException`` so Starlette stops parsing.
+    """
+
+    def __init__(self, app, default_limit: int, limits: dict[str, int] | None = None) -> None:
+        from starlette.exceptions import HTTPException
+
+        self.app = app
+        self.default_limit = default_limit
+        self.limits = limits or {}
+        self._http_exception = HTTPException
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or scope.get("method") not in ("POST", "PUT"):
+            await self.app(scope, receive, send)
+            return
+        limit = self.limits.get(scope.get("path", ""), self.default_limit)
+        for name, value in scope.get("headers") or ():
+            if name == b"content-length":
+                try:
+                    too_large = int(value) > limit
+                except ValueError:
+                    too_large = False
+                if too_large:
+                    await self._reject(send)
+                    return
+        received = 0
+
+        async def limited_receive():
+            nonlocal received
+            message = await receive()
+            if message["type"] == "http.request":
+                received += len(message.get("body", b""))
+                if received > limit:
+                    raise self._http_exception(status_code=413, detail="File too large")
+            return message
+
+        await self.app(scope, limited_receive, send)
+
+    @staticmethod
+    async def _reject(send) -> None:
+        body = json_dumps({"detail": "File too large"})
+        await send(
+            {
+                "type": "http.response.start",
+                "status": 413,
+                "headers": [(b"content-type", b"application/json"), (b"content-length", str(len(body)).encode())],
+            }
+        )
+        await send({"type": "http.response.body", "body": body})
@@ -0,0 +1,470 @@
+"""Wardrobe similarity index: per-user nearest neighbours over ViT embeddings, without a forward pass.
+
+Vectors are the L2-normalized embeddings from ``MLModels.embed_batch`` (cosine = dot product),
+stored as float16 rows. With ``ML_EMBED_INDEX_DIR`` set, each model gets its own directory
+(embeddings from different weights are not comparable)::
+
+    <dir>/<model stem>/
+        meta.json      {"version": 1, "dim": 768, "capacity": 1024, "model_file": ...}
+        vectors.f16    np.memmap, capacity x dim float16
+        items.jsonl    append-only log: {"put": [row, user_id, item_id]} / {"del": row}
+
+The log is replayed at open and rewritten once dead lines outnumber live items. Search is exact
+(a float32 matmul over the user's rows plus ``argpartition``); a user with at least
+``ML_EMBED_IVF_MIN_ITEMS`` items gets an IVF coarse quantizer (spherical k-means with about
+``sqrt(n)`` lists, trained on a sample) so only the ``ML_EMBED_IVF_NPROBE`` closest lists are
+scanned. Training starts in a background thread at the first search past the threshold (and
+again when the user's item count doubles) and runs outside the index lock; searches stay exact,
+or keep using the previous quantizer, until the new one is swapped in.
+"""
+
+from __future__ import annotations
+
+import json
+import math
+import os
+import threading
+import time
+from pathlib import Path
+
+import numpy as np
+
+from fashion_ml.config import EMBED_INDEX_DIR, EMBED_IVF_MIN_ITEMS, EMBED_IVF_NPROBE
+
+INDEX_VERSION = 1
+_MIN_CAPACITY = 1024
+_SCORE_BLOCK = 2048
+_TRAIN_PER_LIST = 64
+
+
+class UnknownItem(LookupError):
+    """Query by an ``item_id`` that is not indexed for that user; apps answer 404."""
+
+
+def _spherical_kmeans(x: np.ndarray, k: int, iters: int = 10, seed: int = 0) -> tuple[np.ndarray, np.ndarray]:
+    """Unit-norm centroids ``(k, D)`` and each row's assignment, for unit-norm ``x``."""
+    rng = np.random.default_rng(seed)
+    centroids = x[rng.choice(len(x), size=k, replace=False)].copy()
+    for _ in range(iters):
+        assign = np.argmax(x @ centroids.T, axis=1)
+        onehot = np.zeros((k, len(x)), dtype=x.dtype)
+        onehot[assign, np.arange(len(x))] = 1.0
+        sums = onehot @ x  # per-list sums through BLAS
+        norms = np.linalg.norm(sums, axis=1)
+        empty = norms == 0
+        if empty.any():  # re-seed empty lists from random points
+            sums[empty] = x[rng.integers(len(x), size=int(empty.sum()))]
+            norms[empty] = np.linalg.norm(sums[empty], axis=1)
+        centroids = sums / np.maximum(norms, 1e-12)[:, None]
+    return centroids, np.argmax(x @ centroids.T, axis=1)
+
+
+class _IVF:
+    """Coarse quantizer for one user: centroid -> set of rows."""
+
+    __slots__ = ("centroids", "lists", "row_list", "trained_on")
+
+    def __init__(self, vectors: np.ndarray, rows: np.ndarray) -> None:
+        k = max(1, int(math.sqrt(len(rows))))
+        sample = vectors
+        if len(rows) > _TRAIN_PER_LIST * k:  # k-means on a sample; every row is still assigned below
+            sample = vectors[np.random.default_rng(0).choice(len(rows), _TRAIN_PER_LIST * k, replace=False)]
+        self.centroids, _ = _spherical_kmeans(sample, k)
+        assign = np.argmax(vectors @ self.centroids.T, axis=1)
+        self.lists: list[set[int]] = [set() for _ in range(k)]
+        self.row_list: dict[int, int] = {}
+        for row, j in zip(rows.tolist(), assign.tolist()):
+            self.lists[j].add(row)
+            self.row_list[row] = j
+        self.trained_on = len(rows)
+
+    def add(self, row: int, vector: np.ndarray) -> None:
+        self.remove(row)
+        j = int(np.argmax(self.centroids @ vector))
+        self.lists[j].add(row)
+        self.row_list[row] = j
+
+    def remove(self, row: int) -> None:
+        j = self.row_list.pop(row, None)
+        if j is not None:
+            self.lists[j].discard(row)
+
+    def candidates(self, query: np.ndarray, nprobe: int) -> np.ndarray:
+        scores = self.centroids @ query
+        nprobe = min(nprobe, len(scores))
+        probe = np.argpartition(scores, len(scores) - nprobe)[len(scores) - nprobe :]
+        rows: list[int] = []
+        for j in probe.tolist():
+            rows.extend(self.lists[j])
+        return np.asarray(rows, dtype=np.int64)
+
+
+class _Space:
+    """Rows of one model's embeddings: storage, ownership, per-user item maps and IVF lists."""
+
+    def __init__(self, model_file: str, dim: int, path: Path | None) -> None:
+        self.model_file = model_file
+        self.dim = dim
+        self.path = path
+        self.owner: list[tuple[str, str] | None] = []
+        self.free: list[int] = []
+        self.users: dict[str, dict[str, int]] = {}
+        self.ivf: dict[str, _IVF] = {}
+        self.training: dict[str, set[int]] = {}  # user -> rows put / deleted while its IVF trains
+        self._log = None
+        self._log_lines = 0
+        capacity = _MIN_CAPACITY
+        if path is not None:
+            path.mkdir(parents=True, exist_ok=True)
+            meta = self._read_meta()
+            if meta is not None and meta.get("dim") == dim:
+                capacity = int(meta["capacity"])
+                self._replay()
+            else:
+                for name in ("vectors.f16", "items.jsonl"):
+                    (path / name).unlink(missing_ok=True)
+            self.vectors = self._map(capacity, create=meta is None or meta.get("dim") != dim)
+            self._write_meta(capacity)
+            self._log = open(path / "items.jsonl", "a", encoding="utf-8")
+        else:
+            self.vectors = np.zeros((capacity, dim), dtype=np.float16)
+
+    # -- persistence -------------------------------------------------------------------------
+
+    def _read_meta(self) -> dict | None:
+        try:
+            meta = json.loads((self.path / "meta.json").read_text(encoding="utf-8"))
+        except (OSError, ValueError):
+            return None
+        return meta if meta.get("version") == INDEX_VERSION else None
+
+    def _write_meta(self, capacity: int) -> None:
+        meta = {"version": INDEX_VERSION, "dim": self.dim, "capacity": capacity, "model_file": self.model_file}
+        tmp = self.path / "meta.json.tmp"
+        tmp.write_text(json.dumps(meta), encoding="utf-8")
+        os.replace(tmp, self.path / "meta.json")
+
+    def _map(self, capacity: int, create: bool) -> np.memmap:
+        file = self.path / "vectors.f16"
+        if create or not file.is_file():
+            mm = np.memmap(file, dtype=np.float16, mode="w+", shape=(capacity, self.dim))
+        else:
+            mm = np.memmap(file, dtype=np.float16, mode="r+", shape=(capacity, self.dim))
+        return mm
+
+    def _replay(self) -> None:
+        try:
+            lines = (self.path / "items.jsonl").read_text(encoding="utf-8").splitlines()
+        except OSError:
+            lines = []
+        for line in lines:
+            try:
+                entry = json.loads(line)
+            except ValueError:
+                continue  # torn last line after a crash
+            if "put" in entry:
+                row, user_id, item_id = entry["put"]
+                self._set_owner(int(row), (str(user_id), str(item_id)))
+            elif "del" in entry:
+                self._set_owner(int(entry["del"]), None)
+        self._log_lines = len(lines)
+        for row, owner in enumerate(self.owner):
+            if owner is None:
+                self.free.append(row)
+            else:
+                self.users.setdefault(owner[0], {})[owner[1]] = row
+
+    def _set_owner(self, row: int, owner: tuple[str, str] | None) -> None:
+        if row >= len(self.owner):
+            self.owner.extend([None] * (row + 1 - len(self.owner)))
+        self.owner[row] = owner
+
+    def _append(self, entry: dict) -> None:
+        if self._log is None:
+            return
+        self._log.write(json.dumps(entry, separators=(",", ":")) + "\n")
+        self._log.flush()
+        self._log_lines += 1
+        live = len(self.owner) - len(self.free)
+        if self._log_lines > 2 * live + 1024:
+            self._compact()
+
+    def _compact(self) -> None:
+        tmp = self.path / "items.jsonl.tmp"
+        with open(tmp, "w", encoding="utf-8") as f:
+            for row, owner in enumerate(self.owner):
+                if owner is not None:
+                    f.write(json.dumps({"put": [row, owner[0], owner[1]]}, separators=(",", ":")) + "\n")
+        self._log.close()
+        os.replace(tmp, self.path / "items.jsonl")
+        self._log = open(self.path / "items.jsonl", "a", encoding="utf-8")
+        self._log_lines = len(self.owner) - len(self.free)
+
+    def _grow(self) -> None:
+        capacity = 2 * self.vectors.shape[0]
+        if self.path is None:
+            grown = np.zeros((capacity, self.dim), dtype=np.float16)
+            grown[: self.vectors.shape[0]] = self.vectors
+            self.vectors = grown
+            return
+        old = self.vectors
+        old.flush()
+        tmp = self.path / "vectors.f16.tmp"
+        grown = np.memmap(tmp, dtype=np.float16, mode="w+", shape=(capacity, self.dim))
+        grown[: old.shape[0]] = old
+        grown.flush()
+        del grown, old
+        os.replace(tmp, self.path / "vectors.f16")
+        self.vectors = self._map(capacity, create=False)
+        self._write_meta(capacity)
+
+    def close(self) -> None:
+        if self.path is not None:
+            self.vectors.flush()
+            if self._log is not None:
+                self._log.close()
+                self._log = None
+
+    # -- items ----------------------------------------------------------------------------------
+
+    def put(self, user_id: str, item_id: str, vector: np.ndarray) -> None:
+        items = self.users.setdefault(user_id, {})
+        row = items.get(item_id)
+        if row is None:
+            if self.free:
+                row = self.free.pop()
+            else:
+                row = len(self.owner)
+                if row >= self.vectors.shape[0]:
+                    self._grow()
+            self._set_owner(row, (user_id, item_id))
+            items[item_id] = row
+        self.vectors[row] = vector
+        self._append({"put": [row, user_id, item_id]})
+        ivf = self.ivf.get(user_id)
+        if ivf is not None:
+            ivf.add(row, vector)
+        if user_id in self.training:
+            self.training[user_id].add(row)
+
+    def delete(self, user_id: str, item_id: str | None) -> int:
+        items = self.users.get(user_id)
+        if not items:
+            return 0
+        targets = list(items) if item_id is None else ([item_id] if item_id in items else [])
+        ivf = self.ivf.get(user_id)
+        touched = self.training.get(user_id)
+        for item in targets:
+            row = items.pop(item)
+            self._set_owner(row, None)
+            self.free.append(row)
+            self._append({"del": row})
+            if ivf is not None:
+                ivf.remove(row)
+            if touched is not None:
+                touched.add(row)
+        if not items:
+            self.users.pop(user_id, None)
+            self.ivf.pop(user_id, None)
+        return len(targets)
+
+    def row_of(self, user_id: str, item_id: str) -> int:
+        row = self.users.get(user_id, {}).get(item_id)
+        if row is None:
+            raise UnknownItem(f"item {item_id!r} is not indexed for user {user_id!r}")
+        return row
+
+    def _ivf_for(self, user_id: str, count: int, min_items: int) -> tuple[_IVF | None, bool]:
+        """The user's current quantizer (if any) and whether a (re)training should start."""
+        if not min_items or count < min_items:
+            self.ivf.pop(user_id, None)
+            return None, False
+        ivf = self.ivf.get(user_id)
+        stale = ivf is None or count >= 2 * ivf.trained_on
+        return ivf, stale and user_id not in self.training
+
+    def training_input(self, user_id: str) -> tuple[np.ndarray, np.ndarray]:
+        """Rows and float16 vectors to train the user's IVF on; changes from now on are tracked."""
+        rows = np.fromiter(self.users[user_id].values(), dtype=np.int64, count=len(self.users[user_id]))
+        self.training[user_id] = set()
+        return rows, self.vectors[rows]
+
+    def install_ivf(self, user_id: str, ivf: _IVF | None) -> None:
+        """Swap in a quantizer trained on ``training_input``, replaying the rows changed meanwhile."""
+        touched = self.training.pop(user_id, None)
+        if ivf is None or touched is None or not self.users.get(user_id):
+            return
+        for row in touched:
+            ivf.remove(row)
+            owner = self.owner[row] if row < len(self.owner) else None
+            if owner is not None and owner[0] == user_id:
+                ivf.add(row, self.vectors[row].astype(np.float32))
+        self.ivf[user_id] = ivf
+
+    def score(self, rows: np.ndarray, query: np.ndarray) -> np.ndarray:
+        """Dot products of ``rows`` with ``query``, widened to float32 one cache-sized block at a time."""
+        scores = np.empty(rows.size, dtype=np.float32)
+        for start in range(0, rows.size, _SCORE_BLOCK):
+            block = rows[start : start + _SCORE_BLOCK]
+            np.matmul(self.vectors[block].astype(np.float32), query, out=scores[start : start + block.size])
+        return scores
+
+    def search(
+        self, user_id: str, query: np.ndarray, k: int, exclude_row: int | None, min_items: int, nprobe: int
+    ) -> tuple[list[dict], str, int, bool]:
+        """``(results, method, scanned, train)``; ``train`` asks the caller to start IVF training."""
+        items = self.users.get(user_id)
+        if not items:
+            return [], "exact", 0, False
+        ivf, train = self._ivf_for(user_id, len(items), min_items)
+        method = "exact"
+        if ivf is not None:
+            rows, method = ivf.candidates(query, nprobe), "ivf"
+        else:
+            rows = np.fromiter(items.values(), dtype=np.int64, count=len(items))
+        if exclude_row is not None:
+            rows = rows[rows != exclude_row]
+        if rows.size == 0:
+            return [], method, 0, train
+        scores = self.score(rows, query)
+        k = min(k, rows.size)
+        top = np.argpartition(scores, rows.size - k)[rows.size - k :]
+        top = top[np.argsort(-scores[top], kind="stable")]
+        results = [
+            {"item_id": self.owner[row][1], "score": score}
+            for row, score in zip(rows[top].tolist(), scores[top].astype(np.float64).tolist())
+        ]
+        return results, method, int(rows.size), train
+
+
+class VectorIndex:
+    """Thread-safe front for the ``_Space`` of the model being served (reopened after a model swap)."""
+
+    def __init__(
+        self,
+        root: str | Path | None = EMBED_INDEX_DIR or None,
+        ivf_min_items: int = EMBED_IVF_MIN_ITEMS,
+        nprobe: int = EMBED_IVF_NPROBE,
+    ) -> None:
+        self.root = Path(root) if root else None
+        self.ivf_min_items = ivf_min_items
+        self.nprobe = nprobe
+        self._lock = threading.Lock()
+        self._space: _Space | None = None
+        self.queries = 0
+        self.query_s = 0.0
+
+    def _space_for(self, model_file: str, dim: int | None) -> _Space | None:
+        """Space of ``model_file``; opened from disk (or created when ``dim`` is known) on first use."""
+        space = self._space
+        if space is not None and space.model_file == model_file and (dim is None or space.dim == dim):
+            return space
+        path = self.root / Path(model_file).stem if self.root is not None else None
+        if dim is None:
+            meta = None
+            if path is not None:
+                try:
+                    meta = json.loads((path / "meta.json").read_text(encoding="utf-8"))
+                except (OSError, ValueError):
+                    meta = None
+            if not meta or meta.get("version") != INDEX_VERSION:
+                return None
+            dim = int(meta["dim"])
+        if space is not None:
+            space.close()
+        self._space = _Space(model_file, dim, path)
+        return self._space
+
+    def add(self, user_id: str, item_id: str, vector: np.ndarray, model_file: str) -> None:
+        vector = np.asarray(vector, dtype=np.float32).ravel()
+        with self._lock:
+            self._space_for(model_file, vector.shape[0]).put(str(user_id), str(item_id), vector)
+
+    def remove(self, user_id: str, item_id: str | None, model_file: str) -> int:
+        with self._lock:
+            space = self._space_for(model_file, None)
+            return space.delete(str(user_id), None if item_id is None else str(item_id)) if space else 0
+
+    def query(
+        self,
+        user_id: str,
+        model_file: str,
+        k: int = 10,
+        item_id: str | None = None,
+        vector: np.ndarray | list | None = None,
+    ) -> dict:
+        """Top-``k`` items of ``user_id`` closest to a stored item (excluded from the results) or a vector."""
+        if (item_id is None) == (vector is None):
+            raise ValueError("pass exactly one of item_id or embedding")
+        t0 = time.perf_counter()
+        with self._lock:
+            space = self._space_for(model_file, None)
+            if space is None:
+                if item_id is not None:
+                    raise UnknownItem(f"item {item_id!r} is not indexed for user {user_id!r}")
+                return {"results": [], "method": "exact", "scanned": 0, "model_file": model_file}
+            exclude = None
+            if item_id is not None:
+                exclude = space.row_of(str(user_id), str(item_id))
+                query = space.vectors[exclude].astype(np.float32)
+            else:
+                query = np.asarray(vector, dtype=np.float32).ravel()
+                if query.shape[0] != space.dim:
+                    raise ValueError(f"embedding has {query.shape[0]} values, index has {space.dim}")
+                query = query / max(float(np.linalg.norm(query)), 1e-12)
+            results, method, scanned, train = space.search(
+                str(user_id), query, max(1, int(k)), exclude, self.ivf_min_items, self.nprobe
+            )
+            if train:
+                rows, vectors = space.training_input(str(user_id))
+                threading.Thread(
+                    target=self._train, args=(space, str(user_id), rows, vectors), name="ivf-train", daemon=True
+                ).start()
+        took = time.perf_counter() - t0
+        with self._lock:
+            self.queries += 1
+            self.query_s += took
+        return {
+            "results": results,
+            "method": method,
+            "scanned": scanned,
+            "took_ms": round(took * 1000.0, 3),
+            "model_file": model_file,
+        }
+
+    def _train(self, space: _Space, user_id: str, rows: np.ndarray, vectors: np.ndarray) -> None:
+        """Background IVF training; only the install at the end holds the lock."""
+        t0 = time.perf_counter()
+        try:
+            ivf = _IVF(vectors.astype(np.float32), rows)
+        except Exception as e:
+            print(f"⚠️  IVF training for {len(rows)} items failed, search stays exact: {e}", flush=True)
+            ivf = None
+        with self._lock:
+            space.install_ivf(user_id, ivf)
+        if ivf is not None:
+            print(
+                f"[vector_index] IVF ready: {len(ivf.lists)} lists over {len(rows)} items "
+                f"({time.perf_counter() - t0:.2f}s)",
+                flush=True,
+            )
+
+    def stats(self) -> dict:
+        with self._lock:
+            space = self._space
+            return {
+                "persistent": self.root is not None,
+                "model_file": space.model_file if space else None,
+                "dim": space.dim if space else None,
+                "users": len(space.users) if space else 0,
+                "items": (len(space.owner) - len(space.free)) if space else 0,
+                "capacity": int(space.vectors.shape[0]) if space else 0,
+                "ivf_users": len(space.ivf) if space else 0,
+                "ivf_training": len(space.training) if space else 0,
+                "ivf_min_items": self.ivf_min_items,
+                "queries": self.queries,
+                "avg_query_ms": round(self.query_s / self.queries * 1000.0, 3) if self.queries else 0.0,
+            }
+
+
+embedding_index = VectorIndex()